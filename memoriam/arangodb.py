@@ -1,169 +1,223 @@
 import re
+import time
+import base64
 import logging
 import textwrap
 import asyncio
-from itertools import cycle
+from functools import lru_cache
 
 import httpx
 import ujson as json
 
 from caseconverter import snakecase
-from graphql import GraphQLError
-from graphql.utilities import ast_to_dict
+from graphql import GraphQLError, parse
+from graphql.utilities import ast_to_dict, separate_operations
 from sanic.exceptions import SanicException, BadRequest
+from sanic.request import RequestParameters
 
 from memoriam.config import (
     AUTHLY_SERVICENAME,
     STORAGE_HOST, STORAGE_PORT, STORAGE_SCHEME,
     ARANGO_CONNECT_RETRIES, ARANGO_CONNECT_BACKOFF,
     ARANGO_DB_NAME, ARANGO_DEFAULT_LIMIT,
-    REQUEST_TIMEOUT
+    ARANGO_POOL_SIZE, ARANGO_POOL_KEEPALIVE, ARANGO_POOL_KEEPALIVE_EXPIRY, ARANGO_BATCH_SIZE, ARANGO_RETRIES,
+    GRAPHQL_PARSE_CACHE_SIZE, REQUEST_TIMEOUT
 )
+from memoriam.balancer import HostBalancer, RETRY_METHODS, RETRY_STATUS_CODES
 from memoriam.constants import RESERVED_FIELDS
 
 
 logger = logging.getLogger('memoriam')
 log_aql = logging.getLogger('memoriam.aql')
 
+CURSOR_FIELD = '_cursor'
+PLAN_SLOT = '\u0000slot:'
+PLAN_FILTER_ARGS = ('filter', 'edge_filter')
+ROOT_PLAN_BOUND_ARGS = ('_key', 'skip', 'limit', 'filter', 'search')
+AQL_WRITE_OPERATIONS = re.compile(r'\b(INSERT|UPDATE|REPLACE|REMOVE|UPSERT)\b', re.IGNORECASE)
+
+
+def is_read_only(query):
+    """Whether an AQL query is read-only, containing no data modification operation keywords.
+       Keywords in names or strings count as well, erring on the side of not retrying"""
+    return not AQL_WRITE_OPERATIONS.search(query)
+
+
+def raise_for_arango_error(e):
+    """Raise an httpx.HTTPStatusError as a SanicException with ArangoDB error info"""
+    try:
+        error = e.response.json()
+    except ValueError:
+        error = {}
+    error_num = error.get('errorNum')
+    error_msg = error.get('errorMessage')
+    raise SanicException(f'Error on {e.request.method} {e.request.url}: [{error_num}] {error_msg}', e.response.status_code) from None
+
 
 class ArangoHTTPClient():
     """HTTP Client for ArangoDB using httpx"""
 
+    client_class = httpx.Client
+
     def __init__(self, hosts=None, db_name=None, auth=None):
         self.hosts = hosts or [f'{STORAGE_SCHEME}://{STORAGE_HOST}:{STORAGE_PORT}']
-        self.host = self._host_iter()
+        self.balancer = HostBalancer(self.hosts)
         self.db_name = db_name or ARANGO_DB_NAME
         self.headers = {
             'x-authly-entity-id': AUTHLY_SERVICENAME,
             'x-authly-entity-type': 'Service',
         }
-        self.client = httpx.Client(auth=auth, http2=True, verify=False, timeout=REQUEST_TIMEOUT)
+        self.limits = httpx.Limits(
+            max_connections=ARANGO_POOL_SIZE,
+            max_keepalive_connections=ARANGO_POOL_KEEPALIVE,
+            keepalive_expiry=ARANGO_POOL_KEEPALIVE_EXPIRY
+        )
+        self.client = self.client_class(auth=auth, http2=True, verify=False, timeout=REQUEST_TIMEOUT, limits=self.limits)
+
+    def _request(self, method, path, params=None, json=None, headers=None, idempotent=False):
+        """Send a request to ArangoDB, returning the decoded JSON response.
+           Idempotent requests (GET/HEAD, or if idempotent) are retried on another host
+           on connection errors or unavailability."""
+        headers = headers or self.headers
+        retries = ARANGO_RETRIES if idempotent or method.upper() in RETRY_METHODS else 0
+        tried = []
+
+        while True:
+            host = self.balancer.acquire(exclude=tried)
+            start = time.perf_counter()
+
+            try:
+                response = self.client.request(method, f'{host}/{path}', params=params, json=json, headers=headers)
+            except httpx.RequestError as e:
+                self.balancer.release(host, time.perf_counter() - start, failed=True)
+                if len(tried) < retries:
+                    tried.append(host)
+                    continue
+                raise SanicException(f'Error on {e.request.method} {e.request.url}')
 
-    def _host_iter(self):
-        """Return an iterator that cycles through the hosts in self.hosts"""
-        for host in cycle(self.hosts):
-            yield host
+            failed = response.status_code in RETRY_STATUS_CODES
+            self.balancer.release(host, time.perf_counter() - start, failed=failed)
 
-    def _request(self, method, path, params=None, json=None, headers=None, raise_for_status=True):
-        try:
-            url = f'{next(self.host)}/{path}'
-            headers = headers or self.headers
-            response = self.client.request(method, url, params=params, json=json, headers=headers)
-            if raise_for_status:
+            if failed and len(tried) < retries:
+                tried.append(host)
+                continue
+
+            try:
                 response.raise_for_status()
-            return response
-        except httpx.HTTPStatusError as e:
-            error_num = response.json().get('errorNum')
-            error_msg = response.json().get('errorMessage')
-            raise SanicException(f'Error on {e.request.method} {e.request.url}: [{error_num}] {error_msg}', e.response.status_code) from None
-        except httpx.RequestError as e:
-            raise SanicException(f'Error on {e.request.method} {e.request.url}')
+            except httpx.HTTPStatusError as e:
+                raise_for_arango_error(e)
+
+            return response.json()
+
+    def close(self):
+        """Close the underlying connection pool"""
+        self.client.close()
 
     def ping(self):
         """Ping ArangoDB by checking the _system database"""
         url = '_db/_system/_api/collection'
-        return self._request('get', url).json()
+        return self._request('get', url)
 
     def has_database(self, db_name):
         """Check if database exists"""
         url = '_db/_system/_api/database'
-        return db_name in self._request('get', url).json()['result']
+        return db_name in self._request('get', url)['result']
 
     def create_database(self, db_name):
         """Create a database"""
         data = {'name': db_name}
         url = '_db/_system/_api/database'
-        return self._request('post', url, json=data).json()
+        return self._request('post', url, json=data)
 
     def has_collection(self, collection):
         """Check if collection exists"""
         url = f'_db/{self.db_name}/_api/collection'
-        response = self._request('get', url).json()
+        response = self._request('get', url)
         return collection in [c['name'] for c in response['result']]
 
     def create_collection(self, collection, edge=False):
         """Create a collection"""
         data = {'name': collection, 'type': 3 if edge else 2}
         url = f'_db/{self.db_name}/_api/collection'
-        return self._request('post', url, json=data).json()
+        return self._request('post', url, json=data)
 
     def list_collections(self):
         """List collections"""
         url = f'_db/{self.db_name}/_api/collection'
-        return self._request('get', url).json()
+        return self._request('get', url)
 
     def truncate_collection(self, collection):
         """Truncate a collection"""
         url = f'_db/{self.db_name}/_api/collection/{collection}/truncate'
-        return self._request('put', url).json()
+        return self._request('put', url)
 
     def create_index(self, collection, data):
         """Create an index"""
         url = f'_db/{self.db_name}/_api/index?collection={collection}'
-        return self._request('post', url, json=data).json()
+        return self._request('post', url, json=data)
 
     def list_indexes(self, collection):
         """List indexes"""
         url = f'_db/{self.db_name}/_api/index?collection={collection}'
-        return self._request('get', url).json()
+        return self._request('get', url)
 
     def read_index(self, collection, id_):
         """Read an index"""
         url = f'_db/{self.db_name}/_api/index/{collection}/{id_}'
-        return self._request('get', url).json()
+        return self._request('get', url)
 
     def delete_index(self, collection, id_):
         """Delete an index"""
         url = f'_db/{self.db_name}/_api/index/{collection}/{id_}'
-        return self._request('delete', url).json()
+        return self._request('delete', url)
 
     def create_view(self, data):
         """Create a view"""
         url = f'_db/{self.db_name}/_api/view'
-        return self._request('post', url, json=data).json()
+        return self._request('post', url, json=data)
 
     def list_views(self):
         """List views"""
         url = f'_db/{self.db_name}/_api/view'
-        return self._request('get', url).json()
+        return self._request('get', url)
 
     def read_view(self, name):
         """Read properties of a view"""
         url = f'_db/{self.db_name}/_api/view/{name}/properties'
-        return self._request('get', url).json()
+        return self._request('get', url)
 
     def update_view(self, name, data):
         """Update a view"""
         url = f'_db/{self.db_name}/_api/view/{name}/properties'
-        return self._request('patch', url, json=data).json()
+        return self._request('patch', url, json=data)
 
     def delete_view(self, name):
         """Delete a view"""
         url = f'_db/{self.db_name}/_api/view/{name}'
-        return self._request('delete', url).json()
+        return self._request('delete', url)
 
     def create_analyzer(self, data):
         """Create an analyzer"""
         url = f'_db/{self.db_name}/_api/analyzer'
-        return self._request('post', url, json=data).json()
+        return self._request('post', url, json=data)
 
     def list_analyzers(self):
         """List analyzers"""
         url = f'_db/{self.db_name}/_api/analyzer'
-        return self._request('get', url).json()
+        return self._request('get', url)
 
     def read_analyzer(self, name):
         """Read definition of an analyzer"""
         url = f'_db/{self.db_name}/_api/analyzer/{name}'
-        return self._request('get', url).json()
+        return self._request('get', url)
 
     def delete_analyzer(self, name):
         """Delete an analyzer"""
         url = f'_db/{self.db_name}/_api/analyzer/{name}'
-        return self._request('delete', url).json()
+        return self._request('delete', url)
 
-    def aql(self, query, bind_vars=None, count=False, total=False, trx_id=None):
-        """Execute an AQL query"""
+    def _cursor_request(self, query, bind_vars=None, count=False, total=False, trx_id=None, batch_size=None):
+        """Prepare data and headers for creating an AQL cursor"""
         data = {
             'query': query,
             'bindVars': bind_vars or {},
@@ -172,15 +226,23 @@ class ArangoHTTPClient():
                 'fullCount': total,
             }
         }
+        if batch_size:
+            data['batchSize'] = batch_size
 
         headers = {**self.headers}
         if trx_id:
             headers['x-arango-trx-id'] = trx_id
 
-        url = f'_db/{self.db_name}/_api/cursor'
         log_aql.debug(f'AQL query: {query}\nbind_vars: {bind_vars}\n')
-        response = self._request('post', url, json=data, headers=headers)
-        results = response.json()
+        return data, headers
+
+    def aql(self, query, bind_vars=None, count=False, total=False, trx_id=None, idempotent=None):
+        """Execute an AQL query. Idempotent queries are retried on another host on failure,
+           by default read-only queries outside stream transactions (see is_read_only)"""
+        data, headers = self._cursor_request(query, bind_vars, count, total, trx_id)
+        idempotent = not trx_id and is_read_only(query) if idempotent is None else idempotent
+        url = f'_db/{self.db_name}/_api/cursor'
+        results = self._request('post', url, json=data, headers=headers, idempotent=idempotent)
 
         cid = results.get('id')
         count = results.get('count', 0)
@@ -193,8 +255,7 @@ class ArangoHTTPClient():
 
         while has_more:
             url = f'_db/{self.db_name}/_api/cursor/{cid}'
-            response = self._request('post', url)
-            results = response.json()
+            results = self._request('post', url)
 
             count += results.get('count', 0)
             result.extend(results.get('result', []))
@@ -219,7 +280,7 @@ class ArangoHTTPClient():
             headers['x-arango-trx-id'] = trx_id
 
         url = f'_db/{self.db_name}/_api/document/{collection}'
-        return self._request('post', url, params=params, json=data, headers=headers).json()
+        return self._request('post', url, params=params, json=data, headers=headers)
 
     def bulk_update(self, collection, data, sync=True, new=True, old=True, keep_null=True, merge=True, trx_id=None):
         """Bulk update multiple documents"""
@@ -236,7 +297,7 @@ class ArangoHTTPClient():
             headers['x-arango-trx-id'] = trx_id
 
         url = f'_db/{self.db_name}/_api/document/{collection}'
-        return self._request('patch', url, params=params, json=data, headers=headers).json()
+        return self._request('patch', url, params=params, json=data, headers=headers)
 
     def bulk_delete(self, collection, data, sync=True, old=True, trx_id=None):
         """Bulk delete multiple documents"""
@@ -250,16 +311,187 @@ class ArangoHTTPClient():
             headers['x-arango-trx-id'] = trx_id
 
         url = f'_db/{self.db_name}/_api/document/{collection}'
-        return self._request('delete', url, params=params, json=data, headers=headers).json()
+        return self._request('delete', url, params=params, json=data, headers=headers)
+
+    def read_transaction(self, trx_id):
+        """Read the status of a stream transaction"""
+        url = f'_db/{self.db_name}/_api/transaction/{trx_id}'
+        return self._request('get', url)
+
+
+class AsyncArangoHTTPClient(ArangoHTTPClient):
+    """Async HTTP Client for ArangoDB using httpx, all methods must be awaited"""
+
+    client_class = httpx.AsyncClient
+
+    def __init__(self, hosts=None, db_name=None, auth=None):
+        super().__init__(hosts, db_name, auth)
+        self.loop = asyncio.get_running_loop()
+
+    async def _request(self, method, path, params=None, json=None, headers=None, idempotent=False):
+        """Send a request to ArangoDB, returning the decoded JSON response.
+           Idempotent requests (GET/HEAD, or if idempotent) are retried on another host
+           on connection errors or unavailability."""
+        headers = headers or self.headers
+        retries = ARANGO_RETRIES if idempotent or method.upper() in RETRY_METHODS else 0
+        tried = []
+
+        while True:
+            host = self.balancer.acquire(exclude=tried)
+            start = time.perf_counter()
+
+            try:
+                response = await self.client.request(method, f'{host}/{path}', params=params, json=json, headers=headers)
+            except httpx.RequestError as e:
+                self.balancer.release(host, time.perf_counter() - start, failed=True)
+                if len(tried) < retries:
+                    tried.append(host)
+                    continue
+                raise SanicException(f'Error on {e.request.method} {e.request.url}')
+
+            failed = response.status_code in RETRY_STATUS_CODES
+            self.balancer.release(host, time.perf_counter() - start, failed=failed)
+
+            if failed and len(tried) < retries:
+                tried.append(host)
+                continue
+
+            try:
+                response.raise_for_status()
+            except httpx.HTTPStatusError as e:
+                raise_for_arango_error(e)
+
+            return response.json()
+
+    async def close(self):
+        """Close the underlying connection pool"""
+        await self.client.aclose()
+
+    async def has_database(self, db_name):
+        """Check if database exists"""
+        url = '_db/_system/_api/database'
+        return db_name in (await self._request('get', url))['result']
+
+    async def has_collection(self, collection):
+        """Check if collection exists"""
+        url = f'_db/{self.db_name}/_api/collection'
+        response = await self._request('get', url)
+        return collection in [c['name'] for c in response['result']]
+
+    async def aql(self, query, bind_vars=None, count=False, total=False, trx_id=None, idempotent=None):
+        """Execute an AQL query. Idempotent queries are retried on another host on failure,
+           by default read-only queries outside stream transactions (see is_read_only)"""
+        data, headers = self._cursor_request(query, bind_vars, count, total, trx_id)
+        idempotent = not trx_id and is_read_only(query) if idempotent is None else idempotent
+        url = f'_db/{self.db_name}/_api/cursor'
+        results = await self._request('post', url, json=data, headers=headers, idempotent=idempotent)
+
+        cid = results.get('id')
+        count = results.get('count', 0)
+        total = results.get('extra', {}).get('stats', {}).get('fullCount', 0)
+        result = results.get('result', [])
+        has_more = results.get('hasMore')
+
+        if len(result) > 0 and not result[0]:
+            result = []
+
+        while has_more:
+            url = f'_db/{self.db_name}/_api/cursor/{cid}'
+            results = await self._request('post', url)
+
+            count += results.get('count', 0)
+            result.extend(results.get('result', []))
+            has_more = results.get('hasMore')
+
+        return {
+            'count': count or 0,
+            'total': total or 0,
+            'result': result,
+        }
+
+    async def cursor(self, query, bind_vars=None, count=False, total=False, trx_id=None, batch_size=ARANGO_BATCH_SIZE, idempotent=None):
+        """Execute an AQL query, returning an AQLCursor to iterate results batch by batch.
+           Idempotent queries are retried like in aql()"""
+        data, headers = self._cursor_request(query, bind_vars, count, total, trx_id, batch_size)
+        idempotent = not trx_id and is_read_only(query) if idempotent is None else idempotent
+        url = f'_db/{self.db_name}/_api/cursor'
+        results = await self._request('post', url, json=data, headers=headers, idempotent=idempotent)
+        return AQLCursor(self, results)
+
+
+class AQLCursor:
+    """Async iterator over AQL query results, fetching one batch at a time.
+       Use as an async context manager to delete the server-side cursor on early exit."""
+
+    def __init__(self, client, results):
+        self.client = client
+        self.id = results.get('id')
+        self.count = results.get('count', 0) or 0
+        self.total = results.get('extra', {}).get('stats', {}).get('fullCount', 0) or 0
+        self.has_more = results.get('hasMore')
+
+        self.batch = results.get('result', [])
+        if len(self.batch) > 0 and not self.batch[0]:
+            self.batch = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def __aiter__(self):
+        async for batch in self.batches():
+            for result in batch:
+                yield result
+
+    async def batches(self):
+        """Yield lists of results as they are fetched from ArangoDB"""
+        batch, self.batch = self.batch, []
+        if batch:
+            yield batch
+
+        while self.has_more:
+            url = f'_db/{self.client.db_name}/_api/cursor/{self.id}'
+            results = await self.client._request('post', url)
+            self.has_more = results.get('hasMore')
+            yield results.get('result', [])
+
+    async def close(self):
+        """Delete the cursor in ArangoDB if results are left unfetched"""
+        if self.has_more and self.id:
+            self.has_more = False
+            url = f'_db/{self.client.db_name}/_api/cursor/{self.id}'
+            await self.client._request('delete', url)
+
+
+# per-worker registry of pooled clients, keyed by (hosts, db_name, auth)
+_clients = {}
+
+
+def _client_key(hosts=None, db_name=None, auth=None):
+    return (tuple(hosts) if hosts else None, db_name or ARANGO_DB_NAME, auth)
 
 
 async def get_arangodb(hosts=None, db_name=None, auth=None):
-    """Get a fresh ArangoDB database connection, defaults to backend database"""
-    client = ArangoHTTPClient(hosts, db_name, auth)
+    """Get a pooled async ArangoDB database connection, defaults to backend database"""
+    key = _client_key(hosts, db_name, auth)
+    client = _clients.get(key)
+
+    # httpx.AsyncClient connections are bound to the event loop they were opened in
+    if not client or client.loop is not asyncio.get_running_loop():
+        client = _clients[key] = AsyncArangoHTTPClient(hosts, db_name, auth)
+
+    return client
+
+
+async def connect_arangodb(hosts=None, db_name=None, auth=None):
+    """Get a pooled async ArangoDB database connection, waiting until ArangoDB is ready"""
+    client = await get_arangodb(hosts, db_name, auth)
 
     for retry in range(ARANGO_CONNECT_RETRIES):
         try:
-            client.ping()
+            await client.ping()
             break
         except Exception as e:
             if retry < (ARANGO_CONNECT_RETRIES - 1):
@@ -270,6 +502,14 @@ async def get_arangodb(hosts=None, db_name=None, auth=None):
     return client
 
 
+async def close_arangodb():
+    """Close and forget all pooled ArangoDB connections"""
+    for client in _clients.values():
+        if client.loop is asyncio.get_running_loop():
+            await client.close()
+    _clients.clear()
+
+
 def get_all_collections(schema):
     """Get a comma-separated list of all collections in given schema for
        cluster-compatible WITH statements in AQL traversal queries"""
@@ -291,6 +531,11 @@ def prettify_aql(query):
     return query
 
 
+def prefix_bind_vars(query, names, prefix):
+    """Prefix the given bind variable names in an AQL query, so queries can be combined"""
+    return re.sub(r'(?<![@\w])@(\w+)', lambda match: f'@{prefix}{match[1]}' if match[1] in names else match[0], query)
+
+
 def get_relation_attributes(domain_spec, class_spec, relation):
     """Resolve a dict of possible attributes for the given class_spec and relation"""
     edge_spec, _, _ = class_spec['relations'][relation]
@@ -438,16 +683,7 @@ def get_filter_strings(filter_query, attributes, bind_vars, obj_name='object', c
         if op == 'NOTLIKE':
             op = 'NOT LIKE'
 
-        try:
-            val = val.replace("'", '"')
-            val = json.loads(val)
-        except json.JSONDecodeError:
-            error = f'Invalid filter comparison value "{val}"'
-            logger.debug(error)
-            if ctx and ctx == 'GraphQL':
-                raise GraphQLError(error)
-            else:
-                raise BadRequest(error, status_code=400)
+        val = parse_filter_value(val, ctx)
 
         comp = f'{obj_name}_{field}_comp_{len(bind_vars) + 1}'
         filters += f'FILTER {obj_name}.{field} {op} @{comp}\n'
@@ -458,6 +694,84 @@ def get_filter_strings(filter_query, attributes, bind_vars, obj_name='object', c
     return filters
 
 
+def parse_filter_value(val, ctx=None):
+    """Parse the comparison value of a filter statement"""
+    try:
+        return json.loads(val.replace("'", '"'))
+    except json.JSONDecodeError:
+        error = f'Invalid filter comparison value "{val}"'
+        logger.debug(error)
+        if ctx and ctx == 'GraphQL':
+            raise GraphQLError(error)
+        else:
+            raise BadRequest(error, status_code=400)
+
+
+def get_plan_args(args, names):
+    """Split the query arguments `names` into the shape of an AQL query plan and the values bound to it.
+       Filter comparison values are replaced by numbered slot placeholders and returned in order,
+       search strings by a placeholder (bound as @search). Returns (shape, values)"""
+    shape = {}
+    values = []
+
+    for name in names:
+        items = args.getlist(name, [])
+
+        if name == 'search':
+            items = [PLAN_SLOT] if items else []
+
+        elif name in PLAN_FILTER_ARGS:
+            statements = []
+            for statement in items:
+                try:
+                    key, op, val = statement.split(' ', 2)
+                except ValueError:
+                    # left to fail in get_filter_strings
+                    statements.append(statement)
+                    continue
+                statements.append(f'{key} {op} {json.dumps(f"{PLAN_SLOT}{len(values)}")}')
+                values.append(val)
+            items = statements
+
+        if items:
+            shape[name] = items
+
+    return shape, values
+
+
+def get_root_plan_args(kwargs):
+    """Split the arguments of a GraphQL root field into the shape of an AQL query plan and the values
+       bound to it, like get_plan_args. `_key` is replaced by a slot placeholder, `skip` and `limit`
+       are left out, to be bound on execution. Returns (shape, values, args), args for bind_plan_values"""
+    args = RequestParameters({
+        name: list(kwargs[name]) if name == 'filter' else [kwargs[name]]
+        for name in ('filter', 'search') if kwargs.get(name)
+    })
+    plan_args, values = get_plan_args(args, ('filter', 'search'))
+
+    shape = {name: value for name, value in kwargs.items() if name not in ROOT_PLAN_BOUND_ARGS}
+    if '_key' in kwargs:
+        shape['_key'] = PLAN_SLOT
+    if 'filter' in plan_args:
+        shape['filter'] = plan_args['filter']
+    if 'search' in plan_args:
+        shape['search'] = PLAN_SLOT
+
+    return shape, values, args
+
+
+def bind_plan_values(plan, values, args, ctx=None):
+    """Get the bind variables of a query plan for the values returned by get_plan_args"""
+    bind_vars = dict(plan['bind_vars'])
+
+    for name, value in plan['bind_vars'].items():
+        if isinstance(value, str) and value.startswith(PLAN_SLOT):
+            slot = value[len(PLAN_SLOT):]
+            bind_vars[name] = parse_filter_value(values[int(slot)], ctx) if slot else args.get('search')
+
+    return bind_vars
+
+
 def get_parent_filters(parent_filter_query, relations, obj_name='object'):
     """Get a set of AQL filter strings for the given Domain filter query.
        Will mutate bind_vars!"""
@@ -526,18 +840,16 @@ def get_field_spec(fields_query, attributes, bind_vars, obj_name='object'):
     return fields
 
 
-def get_sort_string(sort_query, attributes, obj_name='object', ctx=None):
-    """Get an AQL sort string for the given Domain sort query."""
-    if not sort_query:
-        return ''
-
-    sorts = []
+def get_sort_fields(sort_query, attributes, ctx=None):
+    """Get database fields and directions (descending or not) for the given Domain sort query,
+       with _key appended as a tiebreaker"""
+    sort_fields = []
     for sort in sort_query:
-        direction = ''
+        descending = False
 
         if sort.startswith('-'):
             sort = sort[1:]
-            direction = ' DESC'
+            descending = True
 
         field = attributes.get(sort)
 
@@ -552,14 +864,107 @@ def get_sort_string(sort_query, attributes, obj_name='object', ctx=None):
             else:
                 raise BadRequest(error, status_code=400)
 
-        sorts.append(f'{obj_name}.{field}{direction}')
+        sort_fields.append((field, descending))
+
+    if sort_fields and '_key' not in sort_query:
+        sort_fields.append(('_key', False))
+
+    return sort_fields
+
+
+def get_sort_string(sort_query, attributes, obj_name='object', ctx=None):
+    """Get an AQL sort string for the given Domain sort query."""
+    if not sort_query:
+        return ''
 
-    if sorts and '_key' not in sort_query:
-        sorts.append(f'{obj_name}._key')
+    sorts = [
+        f'{obj_name}.{field}{" DESC" if descending else ""}'
+        for field, descending in get_sort_fields(sort_query, attributes, ctx)
+    ]
 
     return 'SORT ' + ', '.join(sorts)
 
 
+def get_keyset(sort_query, attributes, cursor=False, obj_name='object', ctx=None):
+    """Get AQL keyset pagination strings for the given Domain sort query: a filter continuing
+       after the sort values in @{obj_name}_cursor_<n> bind variables if cursor (see get_cursor_bind_vars),
+       and a list of the sort values of each result to return in CURSOR_FIELD (see with_cursor).
+       Unsorted queries can not be paginated by cursor"""
+    sort_fields = get_sort_fields(sort_query, attributes, ctx)
+    if not sort_fields:
+        return '', None
+
+    cursor_values = '[' + ', '.join(f'{obj_name}.{field}' for field, _ in sort_fields) + ']'
+    if not cursor:
+        return '', cursor_values
+
+    # the first sort field is filtered as a range as well, for ArangoDB to use a matching index
+    field, descending = sort_fields[0]
+    filters = [f'FILTER {obj_name}.{field} {"<=" if descending else ">="} @{obj_name}_cursor_0'] if len(sort_fields) > 1 else []
+
+    terms = []
+    for i, (field, descending) in enumerate(sort_fields):
+        equals = [f'{obj_name}.{previous} == @{obj_name}_cursor_{j}' for j, (previous, _) in enumerate(sort_fields[:i])]
+        after = f'{obj_name}.{field} {"<" if descending else ">"} @{obj_name}_cursor_{i}'
+        terms.append('(' + ' && '.join(equals + [after]) + ')')
+
+    filters.append('FILTER ' + ' || '.join(terms))
+
+    return '\n'.join(filters), cursor_values
+
+
+def with_cursor(return_, cursor_values):
+    """Get an AQL return spec adding the keyset cursor values of each result, if any"""
+    if not cursor_values:
+        return return_
+
+    return f'MERGE({return_}, {{{CURSOR_FIELD}: {cursor_values}}})'
+
+
+def encode_cursor(sort_query, values):
+    """Encode an opaque keyset pagination cursor from the sort values of a result"""
+    data = json.dumps({'sort': list(sort_query), 'values': values})
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def get_cursor_bind_vars(cursor, sort_query, obj_name='object', ctx=None):
+    """Decode a keyset pagination cursor to bind variables for the filter of get_keyset.
+       The cursor must have been returned for the same sort query"""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        values = data['values']
+        valid = data['sort'] == list(sort_query) and isinstance(values, list)
+    except (ValueError, TypeError, KeyError):
+        valid = False
+
+    if not valid:
+        error = 'Invalid cursor: Cursors are only valid for the sort order they were returned for'
+        logger.debug(error)
+        if ctx and ctx == 'GraphQL':
+            raise GraphQLError(error)
+        else:
+            raise BadRequest(error, status_code=400)
+
+    return {f'{obj_name}_cursor_{i}': value for i, value in enumerate(values)}
+
+
+def pop_cursor_values(results):
+    """Pop the keyset cursor values from a page of results, returning those of the last result"""
+    values = None
+    for result in results:
+        if isinstance(result, dict):
+            values = result.pop(CURSOR_FIELD, values)
+    return values
+
+
+def get_next_cursor(sort_query, values, count, limit):
+    """Get the cursor for the page after a page of count results with the given last cursor values,
+       or None if the page is not full (the last page) or results are not sorted"""
+    if not sort_query or values is None or count < limit:
+        return None
+    return encode_cursor(sort_query, values)
+
+
 def defrag_ast(ast_operations):
     """Defragment an AST operation set, replacing fragment_spreads with fragment_definitions"""
     ast = {}
@@ -622,6 +1027,35 @@ def get_ast_subtree(ast, field_name):
     return subdict
 
 
+class ParsedQuery:
+    """A parsed and defragmented GraphQL query, with an index of root field subtrees.
+       Shared between requests, the AST must not be modified."""
+
+    def __init__(self, query):
+        self.ast = defrag_ast(separate_operations(parse(query)))
+        self.subtrees = {}
+
+        for selection in self.ast.get('selection_set', {}).get('selections', []):
+            name = selection.get('name', {}).get('value')
+            alias = (selection.get('alias') or {}).get('value')
+            self.subtrees.setdefault(alias or name, selection)
+            self.subtrees.setdefault(name, selection)
+
+    def subtree(self, key, field_name=None):
+        """Get the subtree for a root field by response key (alias or name), or field name"""
+        if key in self.subtrees:
+            return self.subtrees[key]
+        if field_name in self.subtrees:
+            return self.subtrees[field_name]
+        return get_ast_subtree(self.ast, field_name or key)
+
+
+@lru_cache(maxsize=GRAPHQL_PARSE_CACHE_SIZE)
+def parse_query(query):
+    """Parse a GraphQL query to a ParsedQuery, memoized by query text"""
+    return ParsedQuery(query)
+
+
 def get_ast_fields(ast):
     """Extract a set of fields from the top level of a GraphQL AST dict"""
     selections = ast.get('selection_set', {}).get('selections', [])
@@ -676,17 +1110,53 @@ def get_ast_arguments(ast, variables):
     return arguments
 
 
-def get_return_spec(subqueries, obj_name='object', _edge=False):
-    """Get an AQL MERGE return spec for the given set of subqueries"""
-    if not subqueries and not _edge:
+def get_ast_variables(ast, variables):
+    """Get the values of the variables used in the selections of a GraphQL AST dict,
+       not counting its own arguments"""
+    names = set()
+
+    def collect(node):
+        if isinstance(node, dict):
+            if node.get('kind') == 'variable':
+                names.add(node.get('name', {}).get('value'))
+            for value in node.values():
+                collect(value)
+        elif isinstance(node, list):
+            for value in node:
+                collect(value)
+
+    collect(ast.get('selection_set', {}))
+    return {name: variables[name] for name in sorted(names) if name in variables}
+
+
+def get_projection(fields, attributes, obj_name='object'):
+    """Get an AQL KEEP projection of obj_name to the database attributes of the selected GraphQL
+       fields, or obj_name itself if the selection needs whole documents (_all or fragments)"""
+    if not fields or None in fields or '_all' in fields:
         return obj_name
 
+    keep = {'_id', '_key', '_class'}
+    for field in fields:
+        db_field = attributes.get(field, field) if isinstance(attributes, dict) else field
+        keep.add(db_field if isinstance(db_field, str) else field)
+
+    return f'KEEP({obj_name}, {json.dumps(sorted(keep))})'
+
+
+def get_return_spec(subqueries, obj_name='object', _edge=False, projection=None):
+    """Get an AQL MERGE return spec for the given set of subqueries,
+       merged into a projection of obj_name if given"""
+    projection = projection or obj_name
+
+    if not subqueries and not _edge:
+        return projection
+
     edge_line = f'{{_edge: UNSET({obj_name}_edge, "_id", "_key", "_rev", "_from", "_to")}},' if _edge else ''
     subqueries = ', '.join(subqueries)
 
     return f'''
     MERGE(
-        {obj_name},
+        {projection},
         {edge_line}
         {{
             {subqueries}
@@ -712,8 +1182,8 @@ def get_return_spec_v2(fields, relations, obj_name='object', _edge=False):
     )'''
 
 
-def get_subqueries(db_schema, domain_spec, class_spec, ast, relations, variables, bind_vars, obj_name='object', ctx=None):
-    """Extract subqueries for relations"""
+def get_subqueries(db_schema, domain_spec, class_spec, ast, relations, variables, bind_vars, obj_name='object', ctx=None, project=False):
+    """Extract subqueries for relations, projecting related objects to their selected fields if project"""
     subobj_name = 'sub' + obj_name
     subqueries = []
     for relation in relations:
@@ -744,8 +1214,9 @@ def get_subqueries(db_schema, domain_spec, class_spec, ast, relations, variables
             }
             subfields = get_ast_fields(subast)
             subrelations = [rel for rel in subfields if rel in subclass_spec['relations']]
-            subsubqueries = get_subqueries(db_schema, domain_spec, subclass_spec, subast, subrelations, variables, bind_vars, obj_name=subobj_name, ctx=ctx)
-            return_ = get_return_spec(subsubqueries, obj_name=subobj_name, _edge=True)
+            subsubqueries = get_subqueries(db_schema, domain_spec, subclass_spec, subast, subrelations, variables, bind_vars, obj_name=subobj_name, ctx=ctx, project=project)
+            projection = get_projection(subfields, attributes, obj_name=subobj_name) if project else None
+            return_ = get_return_spec(subsubqueries, obj_name=subobj_name, _edge=True, projection=projection)
 
             subquery = f'''
             {relation}: (
@@ -896,72 +1367,135 @@ def set_defaults(data, resolver, db_schema):
     return data
 
 
-def translate_input(input_, klass):
-    """Translate domain data input to backend database input"""
-    data = {}
+class Translator:
+    """Translation between domain data and backend data of a domain class, compiled once
+       from its class spec (and the db schema, for write-only fields) to be reused per row"""
 
-    for domain_field_name, field_name in klass.get('attributes', {}).items():
-        if input_ and domain_field_name in input_:
-            data[field_name] = input_[domain_field_name]
+    def __init__(self, klass, db_schema=None):
+        attributes = klass.get('attributes', {})
+        permissive = klass.get('permissive')
 
-    if klass.get('permissive') in ('input', 'both'):
-        for field_name in input_:
-            if (field_name not in RESERVED_FIELDS and
-                field_name not in data and
-                field_name not in klass.get('attributes', {})):
-                data[field_name] = input_[field_name]
+        write_only = set()
+        if db_schema:
+            properties = db_schema['collections'].get(klass.get('resolver'), {}).get('properties', {})
+            write_only = {field_name for field_name, db_attr in properties.items() if db_attr.get('writeOnly')}
 
-    return data
+        self.constants = dict(klass.get('constants', {}))
+        self.input_attributes = tuple(attributes.items())
+        self.output_attributes = tuple(
+            (domain_field_name, field_name) for domain_field_name, field_name in attributes.items()
+            if field_name not in write_only
+        )
+        self.permissive_input = permissive in ('input', 'both')
+        self.permissive_output = permissive in ('output', 'both')
+        self.write_only = frozenset(write_only)
 
+        # fields not passed through as they are by permissive classes
+        self.input_excluded = frozenset(RESERVED_FIELDS) | frozenset(attributes)
+        self.output_excluded = frozenset(RESERVED_FIELDS) | frozenset(attributes.values())
 
-def translate_output(output, klass, db_schema=None, relations=[]):
-    """Translate backend database output to domain data output"""
-    data = {}
+    def input(self, input_):
+        """Translate domain data input to backend database input"""
+        data = {}
 
-    if _key := output.get('_key'):
-        data['_key'] = _key
-    if _class := output.get('_class'):
-        data['_class'] = _class
+        if input_:
+            for domain_field_name, field_name in self.input_attributes:
+                if domain_field_name in input_:
+                    data[field_name] = input_[domain_field_name]
 
-    for field, value in klass.get('constants', {}).items():
-        data[field] = value
+        if self.permissive_input:
+            for field_name in input_:
+                if field_name not in self.input_excluded and field_name not in data:
+                    data[field_name] = input_[field_name]
 
-    for domain_field_name, field_name in klass.get('attributes', {}).items():
-        if output and field_name in output:
+        return data
 
-            if db_schema:
-                db_attr = db_schema['collections'][klass['resolver']]['properties'].get(field_name, {})
-                if db_attr.get('writeOnly'):
-                    continue
+    def output(self, output, relations=()):
+        """Translate backend database output to domain data output"""
+        data = {}
+
+        if _key := output.get('_key'):
+            data['_key'] = _key
+        if _class := output.get('_class'):
+            data['_class'] = _class
 
-            data[domain_field_name] = output[field_name]
+        data.update(self.constants)
 
-    if klass.get('permissive') in ('output', 'both'):
-        for field_name in output:
+        for domain_field_name, field_name in self.output_attributes:
+            if field_name in output:
+                data[domain_field_name] = output[field_name]
 
-            if db_schema:
-                db_attr = db_schema['collections'][klass['resolver']]['properties'].get(field_name, {})
-                if db_attr.get('writeOnly'):
+        if self.permissive_output:
+            for field_name, value in output.items():
+                if field_name in self.write_only:
                     continue
 
-            if (field_name not in RESERVED_FIELDS and
-                field_name not in data and
-                field_name not in klass.get('attributes', {}).values()):
-                data[field_name] = output[field_name]
+                if field_name not in self.output_excluded and field_name not in data:
+                    data[field_name] = value
 
-            if field_name == '_edge':
-                data['_edge'] = output['_edge']
+                if field_name == '_edge':
+                    data['_edge'] = value
 
-    for relation in relations:
-        if relation in output:
-            data[relation] = output[relation]
+        for relation in relations:
+            if relation in output:
+                data[relation] = output[relation]
 
-    return data
+        return data
 
 
-def translate_relations(results, db_schema, domain_spec, kwargs, relations, level=0):
-    for result in results:
-        for relation in relations:
+def get_translators(domain_spec, db_schema=None):
+    """Compile translators for all classes of a domain spec, by class name"""
+    return {class_name: Translator(class_spec, db_schema) for class_name, class_spec in domain_spec.items()}
+
+
+def translate_input(input_, translator):
+    """Translate domain data input to backend database input, by a compiled class Translator"""
+    return translator.input(input_)
+
+
+def translate_output(output, translator, relations=[]):
+    """Translate backend database output to domain data output, by a compiled class Translator"""
+    return translator.output(output, relations)
+
+
+class RelationNode:
+    """A relation in a relation tree, with the fields selected on and relations nested in it"""
+
+    def __init__(self):
+        self.fields = []
+        self.relations = {}
+
+
+def get_relation_tree(kwargs, relations):
+    """Parse dotted `relation` and `field` arguments once into a tree of RelationNodes
+       by relation name, rooted at the (validated) top level relations"""
+    tree = {relation: RelationNode() for relation in relations}
+    nodes = {(relation,): node for relation, node in tree.items()}
+
+    # parents before children, by depth
+    relation_paths = [tuple(item.split(' ', 1)[0].split('.')) for item in kwargs.getlist('relation', [])]
+    for path in sorted(relation_paths, key=len):
+        parent = nodes.get(path[:-1])
+        if len(path) > 1 and parent is not None and path not in nodes:
+            parent.relations[path[-1]] = nodes[path] = RelationNode()
+
+    for item in kwargs.getlist('field', []):
+        first_term, *rest = item.split(' ', 1)
+        *path, field = first_term.split('.')
+        node = nodes.get(tuple(path))
+        if node is not None:
+            node.fields.append(' '.join([field, *rest]).strip())
+
+    return tree
+
+
+def translate_relations(results, translators, relation_tree):
+    """Translate related objects of results in place along a relation tree (see get_relation_tree),
+       by the translators of their classes, one relation level at a time"""
+    for relation, node in relation_tree.items():
+        related = []
+
+        for result in results:
             relation_results = result.get(relation, [])
 
             # TODO: make a note and reverse
@@ -970,21 +1504,19 @@ def translate_relations(results, db_schema, domain_spec, kwargs, relations, leve
 
             if relation_results:
                 _class = relation_results[0].get('_class', '')
+                translator = translators.get(_class) or Translator({})
 
-                subclass_spec = domain_spec.get(_class, {})
-                subrelations = get_dotted_queries(kwargs.getlist('relation', []), relation, level + 1)
-                subfields = get_dotted_queries(kwargs.getlist('field', []), relation, level + 1)
-
-                if not subfields:
-                    relation_results = [translate_output(subresult, subclass_spec, db_schema, subrelations) for subresult in relation_results]
-                elif '_class' not in subfields:
+                if not node.fields:
+                    relation_results = [translator.output(subresult, node.relations) for subresult in relation_results]
+                elif '_class' not in node.fields:
                     for r in relation_results:
                         del r['_class']
 
-                if subrelations:
-                    relation_results = translate_relations(relation_results, db_schema, domain_spec, kwargs, subrelations, level + 1)
-
                 result[relation] = relation_results
+                related.extend(relation_results)
+
+        if node.relations and related:
+            translate_relations(related, translators, node.relations)
 
     return results
 
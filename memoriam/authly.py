@@ -1,22 +1,32 @@
+import time
+import asyncio
 import logging
+from collections import OrderedDict
 
 import httpx
+import ujson as json
 from graphql import GraphQLError
 from sanic.exceptions import SanicException
+from sanic.response import empty
 
 from memoriam.utils import scrub_headers
 from memoriam.config import (
     CA_FILE, REQUEST_TIMEOUT, NO_AUTH, NO_AC,
     AUTHLY_HOST, AUTHLY_PORT, AUTHLY_SERVICENAME, AUTHLY_SERVICESECRET,
-    STORAGE_SCHEME, STORAGE_HOST, STORAGE_PORT
+    STORAGE_SCHEME, STORAGE_HOST, STORAGE_PORT,
+    AUTH_CACHE_TTL, AUTH_CACHE_SIZE
 )
 
 
 AUTHLY_URL = f'https://{AUTHLY_HOST}:{AUTHLY_PORT}/api'
 STORAGE_URL = f'{STORAGE_SCHEME}://{STORAGE_HOST}:{STORAGE_PORT}'
+AUTH_CACHE_PREFIX = 'memoriam_authz'
+AUTH_EVENTS_CHANNEL = 'memoriam_authz_events'
+RESUBSCRIBE_DELAY = 1
 
 
 logger = logging.getLogger('memoriam')
+log_perf = logging.getLogger('memoriam.perf')
 
 
 class AuthlyClient:
@@ -26,8 +36,20 @@ class AuthlyClient:
         self.app = app
         self.app.ctx.authorize = self.authorize
         self.app.ctx.service_request = self.service_request
+        self.app.ctx.invalidate_authorization = self.invalidate_authorization
         self.headers = {}
 
+        self.client = None
+        self.listener = None
+        self.decisions = OrderedDict()
+        self.decision_stats = {'hits': 0, 'misses': 0}
+
+        app.register_listener(self.close_client, 'after_server_stop')
+
+        if AUTH_CACHE_TTL > 0 and not (NO_AUTH or NO_AC):
+            app.register_listener(self.subscribe, 'after_server_start')
+            app.register_listener(self.unsubscribe, 'before_server_stop')
+
     def _request(self, method, url, data=None, headers=None):
         """Send a request"""
         return httpx.request(
@@ -39,6 +61,24 @@ class AuthlyClient:
             timeout=REQUEST_TIMEOUT
         )
 
+    async def _async_request(self, method, url, data=None, headers=None):
+        """Send a request using the pooled async client"""
+        if not self.client:
+            self.client = httpx.AsyncClient(verify=CA_FILE, timeout=REQUEST_TIMEOUT)
+
+        return await self.client.request(
+            method=method,
+            url=url,
+            json=data,
+            headers=headers or self.headers
+        )
+
+    async def close_client(self, app):
+        """Close the pooled async client"""
+        if self.client:
+            await self.client.aclose()
+            self.client = None
+
     def service_request(self, method, url, data=None, headers=None):
         """Send a request, re-authenticating on expired session"""
         headers = headers or {}
@@ -52,6 +92,19 @@ class AuthlyClient:
 
         return response
 
+    async def async_service_request(self, method, url, data=None, headers=None):
+        """Send a request without blocking, re-authenticating on expired session"""
+        headers = headers or {}
+        response = await self._async_request(method, url, data, {**headers, **self.headers})
+
+        if response.status_code == 401:
+            self.headers.update(
+                await self.async_service_session()
+            )
+            response = await self._async_request(method, url, data, {**headers, **self.headers})
+
+        return response
+
     def service_session(self):
         """Authenticate Memoriam service with Authly"""
         data = {
@@ -62,6 +115,24 @@ class AuthlyClient:
 
         response = httpx.post(url=url, json=data, verify=CA_FILE, timeout=REQUEST_TIMEOUT)
 
+        return self.session_headers(response)
+
+    async def async_service_session(self):
+        """Authenticate Memoriam service with Authly without blocking"""
+        data = {
+            'serviceName': AUTHLY_SERVICENAME,
+            'serviceSecret': AUTHLY_SERVICESECRET,
+        }
+        url = f'{AUTHLY_URL}/auth/authenticate'
+
+        # explicit headers, self.headers holds the expired session
+        response = await self._async_request('POST', url, data, headers={'Content-Type': 'application/json'})
+
+        return self.session_headers(response)
+
+    @staticmethod
+    def session_headers(response):
+        """Authorization headers from an Authly authentication response"""
         if response.status_code > 400:
             raise SanicException(response.text, status_code=response.status_code)
 
@@ -70,20 +141,167 @@ class AuthlyClient:
             'Authorization': f'Bearer {token}'
         }
 
-    def authorize(self, request, resource='', action='', graphql=False):
+    def decision_key(self, request, resource, action):
+        """Cache key for an authorization decision, by entity, resource and action"""
+        eid = request.headers.get('x-authly-eid', '')
+        entity_type = request.headers.get('x-authly-entity-type', '')
+        entity_id = request.headers.get('x-authly-entity-id', '')
+        return f'{AUTH_CACHE_PREFIX}:{eid}:{entity_type}:{entity_id}:{resource}:{action}'
+
+    async def cached_decision(self, key, resolve):
+        """Get an authorization decision from the local or shared (Redis) cache,
+           falling back to awaiting resolve(); only definite decisions are cached"""
+        if AUTH_CACHE_TTL <= 0:
+            allowed = await resolve()
+            return bool(allowed)
+
+        now = time.monotonic()
+
+        if key in self.decisions:
+            expires, allowed = self.decisions[key]
+            if expires > now:
+                self.decisions.move_to_end(key)
+                self.decision_stats['hits'] += 1
+                return allowed
+            del self.decisions[key]
+
+        redis = getattr(self.app.ctx, 'redis', None)
+        allowed = None
+
+        if redis:
+            try:
+                cached = await redis.get(key)
+                if cached is not None:
+                    allowed = cached == b'1'
+            except Exception as e:
+                logger.warning(f'Authorization cache unavailable: {e}')
+
+        if allowed is None:
+            self.decision_stats['misses'] += 1
+            allowed = await resolve()
+
+            if allowed is None:
+                return False
+
+            if redis:
+                try:
+                    await redis.set(key, b'1' if allowed else b'0', ex=AUTH_CACHE_TTL)
+                except Exception as e:
+                    logger.warning(f'Authorization cache unavailable: {e}')
+        else:
+            self.decision_stats['hits'] += 1
+
+        self.decisions[key] = (now + AUTH_CACHE_TTL, allowed)
+        if len(self.decisions) > AUTH_CACHE_SIZE:
+            self.decisions.popitem(last=False)
+
+        return allowed
+
+    async def invalidate_authorization(self, entity_id=None):
+        """Invalidate cached authorization decisions, for a given entity (eid) or all entities.
+           The shared cache is cleared immediately, and an event is published for all workers
+           to clear their local caches"""
+        self.clear_decisions(entity_id)
+
+        redis = getattr(self.app.ctx, 'redis', None)
+        if redis:
+            prefix = self.decision_prefix(entity_id)
+            keys = [key async for key in redis.scan_iter(match=f'{prefix}*')]
+            if keys:
+                await redis.delete(*keys)
+
+            event = {'eid': entity_id, 'time': time.time()}
+            await redis.publish(AUTH_EVENTS_CHANNEL, json.dumps(event))
+
+    @staticmethod
+    def decision_prefix(entity_id=None):
+        """Cache key prefix of authorization decisions, for a given entity (eid) or all entities"""
+        return f'{AUTH_CACHE_PREFIX}:{entity_id}:' if entity_id else f'{AUTH_CACHE_PREFIX}:'
+
+    def clear_decisions(self, entity_id=None):
+        """Clear locally cached authorization decisions, for a given entity (eid) or all entities"""
+        prefix = self.decision_prefix(entity_id)
+
+        for key in [key for key in self.decisions if key.startswith(prefix)]:
+            del self.decisions[key]
+
+    async def subscribe(self, app):
+        """Start listening for authorization invalidation events"""
+        self.listener = asyncio.create_task(self.listen())
+
+    async def unsubscribe(self, app):
+        """Stop listening for authorization invalidation events"""
+        if self.listener and not self.listener.done():
+            self.listener.cancel()
+
+    async def listen(self):
+        """Listen for authorization invalidation events, resubscribing if the subscription ends or fails"""
+        resubscribed = False
+
+        while True:
+            try:
+                async with self.app.ctx.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(AUTH_EVENTS_CHANNEL)
+
+                    # events may have been missed while not subscribed
+                    if resubscribed:
+                        self.clear_decisions()
+
+                    async for message in pubsub.listen():
+                        if message['type'] == 'message':
+                            event = json.loads(message['data'])
+                            logger.debug(f'Authorization invalidation event for entity {event.get("eid")}')
+                            self.clear_decisions(event.get('eid'))
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f'Authorization events subscription failed, resubscribing: {e}')
+
+            resubscribed = True
+            await asyncio.sleep(RESUBSCRIBE_DELAY)
+
+    async def authorize(self, request, resource='', action='', graphql=False):
         """Authorize action on resource for given request against Access Control"""
         if NO_AUTH or NO_AC:
             return
 
-        headers = {
-            **scrub_headers(request.headers),
-            'x-authly-resource': resource,
-            'x-authly-action': action,
-        }
-        response = self._request('GET', f'{STORAGE_URL}/system/api/resolve', headers=headers)
+        start = time.perf_counter() * 1000
 
-        if response.status_code > 400:
+        async def resolve():
+            headers = {
+                **scrub_headers(request.headers),
+                'x-authly-resource': resource,
+                'x-authly-action': action,
+            }
+            response = await self._async_request('GET', f'{STORAGE_URL}/system/api/resolve', headers=headers)
+
+            if response.status_code in (401, 403):
+                return False
+            if response.status_code > 400:
+                return None
+            return True
+
+        key = self.decision_key(request, resource, action)
+        allowed = await self.cached_decision(key, resolve)
+
+        log_perf.debug(
+            f'Authorization time: {(time.perf_counter() * 1000 - start):.2f} ms '
+            f'(cache hits: {self.decision_stats["hits"]}, misses: {self.decision_stats["misses"]})'
+        )
+
+        if not allowed:
             if graphql:
                 raise GraphQLError('Unauthorized')
             else:
                 raise SanicException('Unauthorized', status_code=401)
+
+
+async def invalidate_authorization(request):
+    """Invalidate cached access control decisions, for a given entity (eid) or all entities"""
+    await request.app.ctx.authorize(request, 'authorization', 'invalidate')
+
+    data = request.json or {}
+    await request.app.ctx.invalidate_authorization(data.get('eid'))
+
+    return empty(204)
@@ -0,0 +1,96 @@
+import time
+import logging
+
+from memoriam.config import ARANGO_EJECT_FAILURES, ARANGO_EJECT_BACKOFF, ARANGO_EJECT_MAX_BACKOFF
+
+
+logger = logging.getLogger('memoriam')
+
+RETRY_METHODS = ('GET', 'HEAD')
+RETRY_STATUS_CODES = (502, 503, 504)
+
+# weight of the latest request in the latency moving average
+LATENCY_WEIGHT = .2
+
+
+class HostBalancer:
+    """Health-aware load balancer for a list of hosts, selecting the host with the
+       least outstanding requests (round-robin on ties) and ejecting failing hosts
+       with exponential backoff"""
+
+    def __init__(self, hosts):
+        self.hosts = list(hosts)
+        self.next_index = 0
+        self.state = {
+            host: {
+                'outstanding': 0,
+                'requests': 0,
+                'errors': 0,
+                'failures': 0,
+                'ejections': 0,
+                'ejected_until': 0.,
+                'latency': None,
+            }
+            for host in self.hosts
+        }
+
+    def available(self, exclude=()):
+        """Get hosts that are not ejected or excluded, falling back to all hosts if none are"""
+        now = time.monotonic()
+        hosts = [host for host in self.hosts if host not in exclude]
+        return [host for host in hosts if self.state[host]['ejected_until'] <= now] or hosts or self.hosts
+
+    def acquire(self, exclude=()):
+        """Select a host for a request, excluding hosts already tried, and count it as outstanding"""
+        hosts = self.available(exclude)
+
+        # rotate the starting point, so ties are resolved round-robin
+        start = self.next_index % len(self.hosts)
+        ordered = self.hosts[start:] + self.hosts[:start]
+        host = min((host for host in ordered if host in hosts), key=lambda host: self.state[host]['outstanding'])
+        self.next_index = self.hosts.index(host) + 1
+
+        self.state[host]['outstanding'] += 1
+        return host
+
+    def release(self, host, latency, failed=False):
+        """Record the outcome of a request to host, ejecting it on repeated failures"""
+        state = self.state[host]
+        state['outstanding'] -= 1
+        state['requests'] += 1
+
+        latency = latency * 1000
+        if state['latency'] is None:
+            state['latency'] = latency
+        else:
+            state['latency'] += LATENCY_WEIGHT * (latency - state['latency'])
+
+        if not failed:
+            state['failures'] = 0
+            state['ejections'] = 0
+            return
+
+        state['errors'] += 1
+        state['failures'] += 1
+
+        if state['failures'] >= ARANGO_EJECT_FAILURES:
+            backoff = min(ARANGO_EJECT_BACKOFF * 2 ** state['ejections'], ARANGO_EJECT_MAX_BACKOFF)
+            state['ejections'] += 1
+            state['failures'] = 0
+            state['ejected_until'] = time.monotonic() + backoff
+            logger.warning(f'Ejected {host} for {backoff:.1f} s after {ARANGO_EJECT_FAILURES} consecutive failures')
+
+    def status(self):
+        """Get the balancer state for each host"""
+        now = time.monotonic()
+        return {
+            host: {
+                'ejected': state['ejected_until'] > now,
+                'outstanding': state['outstanding'],
+                'requests': state['requests'],
+                'errors': state['errors'],
+                'error_rate': round(state['errors'] / state['requests'], 4) if state['requests'] else 0.,
+                'latency_ms': round(state['latency'], 2) if state['latency'] is not None else None,
+            }
+            for host, state in self.state.items()
+        }
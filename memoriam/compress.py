@@ -1,11 +1,109 @@
 import gzip
+import zlib
+import asyncio
 import brotli
+import zstandard
 
-from memoriam.config import COMPRESS_LEVEL, COMPRESS_MIN_SIZE, COMPRESS_MIMETYPES
+from memoriam.config import COMPRESS_LEVEL, COMPRESS_MIN_SIZE, COMPRESS_EXECUTOR_MIN_SIZE, COMPRESS_MIMETYPES
+
+
+# in order of preference
+ENCODINGS = ['zstd', 'br', 'gzip']
+
+# signatures of payloads that are already compressed (gzip, zstd, zip, bzip2, xz, 7z, png, jpeg, gif, webp/riff, mp4)
+COMPRESSED_SIGNATURES = (
+    b'\x1f\x8b', b'\x28\xb5\x2f\xfd', b'PK\x03\x04', b'BZh', b'\xfd7zXZ\x00', b'7z\xbc\xaf\x27\x1c',
+    b'\x89PNG', b'\xff\xd8\xff', b'GIF8', b'RIFF', b'\x00\x00\x00\x18ftyp', b'\x00\x00\x00\x20ftyp',
+)
+
+
+def select_encoding(request):
+    """Select a supported encoding accepted by the request, if any"""
+    accept_encoding = request.headers.get('accept-encoding', '')
+    accepted = [item.split(';')[0].strip() for item in accept_encoding.split(',')]
+
+    for encoding in ENCODINGS:
+        if encoding in accepted:
+            return encoding
+
+
+def compressible(status, headers, content_type, body=None, content_length=None):
+    """Whether a response should be compressed, given its status, headers and (start of) body"""
+    content_type = (content_type or '').split(';')[0]
+    if content_length is None:
+        content_length = len(body or b'')
+
+    return (
+        200 <= status < 300 and
+        content_length >= COMPRESS_MIN_SIZE and
+        content_type in COMPRESS_MIMETYPES and
+        'content-encoding' not in headers and
+        not (body or b'').startswith(COMPRESSED_SIGNATURES)
+    )
+
+
+def compress(body, encoding):
+    """Compress body with the given encoding"""
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=COMPRESS_LEVEL).compress(body)
+    if encoding == 'br':
+        return brotli.compress(body, quality=COMPRESS_LEVEL)
+    return gzip.compress(body, compresslevel=COMPRESS_LEVEL)
+
+
+class StreamCompressor:
+    """Incremental compressor for streamed responses"""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+
+        if encoding == 'zstd':
+            self.compressor = zstandard.ZstdCompressor(level=COMPRESS_LEVEL).compressobj()
+        elif encoding == 'br':
+            self.compressor = brotli.Compressor(quality=COMPRESS_LEVEL)
+        else:
+            self.compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 31)  # gzip container
+
+    def compress(self, chunk):
+        """Compress a chunk, returning any compressed data ready to be sent"""
+        if self.encoding == 'br':
+            return self.compressor.process(chunk)
+        return self.compressor.compress(chunk)
+
+    def flush(self):
+        """Finish the compressed stream, returning remaining data"""
+        if self.encoding == 'br':
+            return self.compressor.finish()
+        return self.compressor.flush()
+
+
+def set_vary(headers):
+    """Add accept-encoding to the vary header"""
+    if vary := headers.get('vary'):
+        if 'accept-encoding' not in vary.lower():
+            headers['vary'] = f'{vary}, Accept-Encoding'
+    else:
+        headers['vary'] = 'Accept-Encoding'
+
+
+def get_stream_compressor(request, status, headers, first_chunk=b''):
+    """Get a StreamCompressor for a streamed response, updating its headers,
+       or None if the response should not be compressed"""
+    encoding = select_encoding(request)
+    content_length = headers.get('content-length')
+    content_length = int(content_length) if content_length else COMPRESS_MIN_SIZE
+
+    if not encoding or not compressible(status, headers, headers.get('content-type'), first_chunk, content_length):
+        return None
+
+    headers.pop('content-length', None)
+    headers['content-encoding'] = encoding
+    set_vary(headers)
+    return StreamCompressor(encoding)
 
 
 class Compress:
-    """Brotli/Gzip compression middleware"""
+    """Zstandard/Brotli/Gzip compression middleware"""
 
     def __init__(self, app):
         self.app = app
@@ -13,34 +111,19 @@ class Compress:
         app.register_middleware(self.compression_middleware, 'response')
 
     async def compression_middleware(self, request, response):
-        accept_encoding = request.headers.get('accept-encoding', '')
-        accepted = [item.strip() for item in accept_encoding.split(',')]
-
-        content_length = len(response.body)
-        content_type = response.content_type or ''
-
-        if ';' in content_type:
-            content_type = content_type.split(';')[0]
-
-        if (200 <= response.status < 300 and
-            content_length >= COMPRESS_MIN_SIZE and
-            content_type in COMPRESS_MIMETYPES and
-            ('br' in accepted or 'gzip' in accepted)):
+        encoding = select_encoding(request)
 
-            if 'br' in accepted:
-                response.body = brotli.compress(response.body, quality=COMPRESS_LEVEL)
-                response.headers['content-encoding'] = 'br'
+        if encoding and compressible(response.status, response.headers, response.content_type, response.body):
 
-            elif 'gzip' in accepted:
-                response.body = gzip.compress(response.body, compresslevel=COMPRESS_LEVEL)
-                response.headers['content-encoding'] = 'gzip'
+            # large bodies are compressed in a thread, not blocking the event loop
+            if len(response.body) >= COMPRESS_EXECUTOR_MIN_SIZE:
+                loop = asyncio.get_running_loop()
+                response.body = await loop.run_in_executor(None, compress, response.body, encoding)
+            else:
+                response.body = compress(response.body, encoding)
 
+            response.headers['content-encoding'] = encoding
             response.headers['content-length'] = len(response.body)
-
-            if vary := response.headers.get('vary'):
-                if 'accept-encoding' not in vary.lower():
-                    response.headers['vary'] = f'{vary}, Accept-Encoding'
-            else:
-                response.headers['vary'] = 'Accept-Encoding'
+            set_vary(response.headers)
 
         return response
@@ -80,6 +80,23 @@ ARANGO_DOMAIN_DB_NAME = os.getenv('ARANGO_DOMAIN_DB_NAME', 'memoriam')
 ARANGO_CONNECT_RETRIES = int(os.getenv('ARANGO_CONNECT_RETRIES', 60))
 ARANGO_CONNECT_BACKOFF = float(os.getenv('ARANGO_CONNECT_BACKOFF', .5))
 ARANGO_DEFAULT_LIMIT = int(os.getenv('ARANGO_DEFAULT_LIMIT', 100))
+RESULTS_COUNT_DEFAULT = os.getenv('RESULTS_COUNT_DEFAULT', 'exact')
+RESULTS_COUNT_CACHE_TTL = int(os.getenv('RESULTS_COUNT_CACHE_TTL', 60))
+ARANGO_POOL_SIZE = int(os.getenv('ARANGO_POOL_SIZE', 100))
+ARANGO_POOL_KEEPALIVE = int(os.getenv('ARANGO_POOL_KEEPALIVE', 20))
+ARANGO_POOL_KEEPALIVE_EXPIRY = float(os.getenv('ARANGO_POOL_KEEPALIVE_EXPIRY', 30))
+ARANGO_BATCH_SIZE = int(os.getenv('ARANGO_BATCH_SIZE', 1000))
+ARANGO_RETRIES = int(os.getenv('ARANGO_RETRIES', 2))
+ARANGO_EJECT_FAILURES = int(os.getenv('ARANGO_EJECT_FAILURES', 3))
+ARANGO_EJECT_BACKOFF = float(os.getenv('ARANGO_EJECT_BACKOFF', 1))
+ARANGO_EJECT_MAX_BACKOFF = float(os.getenv('ARANGO_EJECT_MAX_BACKOFF', 60))
+GRAPHQL_PARSE_CACHE_SIZE = int(os.getenv('GRAPHQL_PARSE_CACHE_SIZE', 1000))
+GRAPHQL_OPERATION_CACHE_SIZE = int(os.getenv('GRAPHQL_OPERATION_CACHE_SIZE', 1000))
+GRAPHQL_PLAN_CACHE_SIZE = int(os.getenv('GRAPHQL_PLAN_CACHE_SIZE', 100))
+PERSISTED_QUERY_TTL = int(os.getenv('PERSISTED_QUERY_TTL', 86400))
+REST_PLAN_CACHE_SIZE = int(os.getenv('REST_PLAN_CACHE_SIZE', 1000))
+SCHEMA_BUILD_TIMEOUT = int(os.getenv('SCHEMA_BUILD_TIMEOUT', 30))
+SCHEMA_ARTIFACT_TTL = int(os.getenv('SCHEMA_ARTIFACT_TTL', 86400))
 
 ARANGO_SCHEMA_PATH = os.getenv('ARANGO_SCHEMA_PATH', Path(ROOT_PATH, 'data', 'db_schema.yml'))
 ARANGO_DOMAIN_SCHEMA_PATH = os.getenv('ARANGO_DOMAIN_SCHEMA_PATH', Path(ROOT_PATH, 'data', 'db_schema_domain.yml'))
@@ -114,6 +131,10 @@ if DOMAIN_WORKERS > 1:
         'prefix': 'memoriam'
     }
 
+AUTH_CACHE_TTL = int(os.getenv('AUTH_CACHE_TTL', 10))
+AUTH_CACHE_SIZE = int(os.getenv('AUTH_CACHE_SIZE', 10000))
+SESSION_CACHE_TTL = int(os.getenv('SESSION_CACHE_TTL', 30))
+
 REQUEST_MAX_SIZE = int(os.getenv('REQUEST_MAX_SIZE', 20000000000))
 REQUEST_TIMEOUT = int(os.getenv('REQUEST_TIMEOUT', 60))
 RESPONSE_TIMEOUT = int(os.getenv('RESPONSE_TIMEOUT', 60))
@@ -138,6 +159,7 @@ CORS_VARY_HEADER = trueish(os.getenv('CORS_VARY_HEADER', True))
 
 COMPRESS_LEVEL = max(0, min(int(os.getenv('COMPRESS_LEVEL', 6)), 9))
 COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 256))
+COMPRESS_EXECUTOR_MIN_SIZE = int(os.getenv('COMPRESS_EXECUTOR_MIN_SIZE', 65536))
 COMPRESS_MIMETYPES = [
     'text/html',
     'text/css',
@@ -9,10 +9,11 @@ from cashews import Cache
 
 import memoriam.config
 from memoriam.config import (
-    SENTRY_DSN, CA_FILE, ARANGO_DOMAIN_SCHEMA_PATH,
+    SENTRY_DSN, CA_FILE, ARANGO_DOMAIN_SCHEMA_PATH, ARANGO_DOMAIN_DB_NAME,
     DOMAIN_HOST, MINIO_HOST, CACHE_CONFIG, ARANGO_DEFAULT_LIMIT,
     REDIS_HOST, REDIS_PORT, REDIS_TLS, REDIS_DATABASE, REDIS_PASSWORD
 )
+from memoriam.arangodb import get_arangodb, connect_arangodb, close_arangodb
 from memoriam.authly import AuthlyClient
 from memoriam.openapi import OpenAPI
 from memoriam.domain.audit import AuditLog
@@ -20,6 +21,7 @@ from memoriam.domain.domain_init import DomainInit
 from memoriam.domain.search import ArangoSearch
 from memoriam.domain.rest import RESTResolverEngine
 from memoriam.domain.graphql import GraphQLResolverEngine
+from memoriam.domain.schema_events import SchemaEvents
 from memoriam.domain.services import ServiceInterface
 from memoriam.utils import LoggingErrorHandler, load_yaml
 from memoriam.domain.jinja import env as jinja_env
@@ -69,6 +71,9 @@ def init_app():
 
     app.ctx.init = True
 
+    app.register_listener(connect_arangodb_clients, 'before_server_start')
+    app.register_listener(close_arangodb_clients, 'after_server_stop')
+
     openapi_template = jinja_env.get_template('openapi_spec_system.yml')
     yaml_spec = openapi_template.render(
         include_storage_api=bool(MINIO_HOST),
@@ -91,6 +96,7 @@ def init_app():
 
     RESTResolverEngine(app)
     GraphQLResolverEngine(app)
+    SchemaEvents(app)
     ArangoSearch(app)
 
     return app
@@ -98,10 +104,24 @@ def init_app():
 
 async def clear_caches(app):
     await app.ctx.redis.delete('memoriam_domain_cache')
-    await app.ctx.redis.delete('memoriam_graphql_schemas')
-    await app.ctx.redis.delete('memoriam_rest_schemas')
+
+
+async def connect_arangodb_clients(app):
+    await connect_arangodb()
+    await connect_arangodb(db_name=ARANGO_DOMAIN_DB_NAME)
+
+
+async def close_arangodb_clients(app):
+    await close_arangodb()
 
 
 @api.get('/health')
 async def health(request):
+    try:
+        db = await get_arangodb()
+        await db.ping()
+    except Exception as e:
+        logger.exception(e)
+        return json({'error': str(e)}, 500)
+
     return json('Ok')
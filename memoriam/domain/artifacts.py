@@ -0,0 +1,73 @@
+import os
+import time
+import asyncio
+import logging
+
+import ujson as json
+
+from memoriam.config import SCHEMA_BUILD_TIMEOUT, SCHEMA_ARTIFACT_TTL
+from memoriam.utils import fingerprint, get_version
+
+
+logger = logging.getLogger('memoriam')
+
+ARTIFACT_PREFIX = 'memoriam_schema_artifact'
+POLL_INTERVAL = .05
+
+
+class SchemaArtifacts:
+    """Compiled domain schema artifacts shared between workers through Redis, by kind and
+       domain fingerprint. The first worker to acquire a build lock builds and stores an
+       artifact, other workers wait for and load it instead of building it themselves"""
+
+    def __init__(self, app, kind, *salt):
+        self.app = app
+        self.kind = kind
+
+        # artifacts are only shared between workers running the same version and configuration
+        self.version = fingerprint(get_version(), *salt)
+
+    def key(self, domain_fingerprint):
+        return f'{ARTIFACT_PREFIX}:{self.kind}:{self.version}:{domain_fingerprint}'
+
+    async def load(self, key):
+        """Load an artifact by key, if it exists"""
+        artifact = await self.app.ctx.redis.get(key)
+        return json.loads(artifact) if artifact else None
+
+    async def acquire(self, domain_fingerprint):
+        """Get a built artifact for a domain fingerprint, waiting for it if another worker is
+           building it, or None if this worker should build (and store) it"""
+        key = self.key(domain_fingerprint)
+
+        try:
+            artifact = await self.load(key)
+            if artifact is not None:
+                return artifact
+
+            if await self.app.ctx.redis.set(f'{key}:lock', os.getpid(), nx=True, ex=SCHEMA_BUILD_TIMEOUT):
+                return None
+
+            deadline = time.monotonic() + SCHEMA_BUILD_TIMEOUT
+            while time.monotonic() < deadline:
+                await asyncio.sleep(POLL_INTERVAL)
+                artifact = await self.load(key)
+                if artifact is not None:
+                    return artifact
+
+            logger.warning(f'Timed out waiting for {self.kind} schema artifact, building it')
+
+        except Exception as e:
+            logger.warning(f'Could not load {self.kind} schema artifact, building it: {e}')
+
+        return None
+
+    async def store(self, domain_fingerprint, artifact):
+        """Store a built artifact for other workers, releasing the build lock"""
+        key = self.key(domain_fingerprint)
+
+        try:
+            await self.app.ctx.redis.set(key, json.dumps(artifact), ex=SCHEMA_ARTIFACT_TTL)
+            await self.app.ctx.redis.delete(f'{key}:lock')
+        except Exception as e:
+            logger.warning(f'Could not store {self.kind} schema artifact: {e}')
@@ -38,7 +38,7 @@ class AuditLog:
 
     async def post_audit_log(self, request):
         """Handler for manual audit logging"""
-        request.app.ctx.authorize(request, 'audit', 'create')
+        await request.app.ctx.authorize(request, 'audit', 'create')
 
         db = await get_arangodb()
 
@@ -62,7 +62,7 @@ class AuditLog:
                 if AUDIT_LOG:
                     log_audit.info(f'Audit: {audit_log}')
 
-        results = db.bulk_create('audit_log', audit_logs, trx_id=trx_id)
+        results = await db.bulk_create('audit_log', audit_logs, trx_id=trx_id)
 
         audit_logs = []
         audits_by_changed_collection = {}
@@ -85,13 +85,13 @@ class AuditLog:
                 })
 
         for coll, audits in audits_by_changed_collection.items():
-            results = db.bulk_update(coll, audits, trx_id=trx_id)
+            results = await db.bulk_update(coll, audits, trx_id=trx_id)
 
         return response.json(audit_logs, 201)
 
     async def get_audit_log(self, request, collection, _key):
         """Handler for audit logs for specific _id"""
-        request.app.ctx.authorize(request, 'audit', 'read')
+        await request.app.ctx.authorize(request, 'audit', 'read')
 
         db = await get_arangodb()
 
@@ -116,7 +116,7 @@ class AuditLog:
             RETURN audit
         ''')
         bind_vars = {'_id': f'{collection}/{_key}'}
-        results = db.aql(query, bind_vars=bind_vars, total=True)
+        results = await db.aql(query, bind_vars=bind_vars, total=True)
         total = results['total']
         results = results['result']
 
@@ -14,6 +14,7 @@ from memoriam.config import ARANGO_DOMAIN_DB_NAME, ARANGO_SCHEMA_PATH, NO_DELETE
 from memoriam.constants import OPERATIONS
 from memoriam.arangodb import get_arangodb, prettify_aql
 
+from memoriam.domain.schema_events import publish_schema_change
 from memoriam.utils import iso8601_now, load_raw, load_yaml
 
 
@@ -34,7 +35,7 @@ TRIGGER_FUNCS = [
 
 async def list_domains(request):
     """Handler for domain listing"""
-    request.app.ctx.authorize(request, 'domain', 'read')
+    await request.app.ctx.authorize(request, 'domain', 'read')
 
     db = await get_arangodb(db_name=ARANGO_DOMAIN_DB_NAME)
 
@@ -42,7 +43,7 @@ async def list_domains(request):
     FOR object IN domain
         RETURN object
     ''')
-    data = db.aql(query)
+    data = await db.aql(query)
 
     for result in data.get('result', []):
         result.pop('_resources', None)
@@ -79,7 +80,7 @@ async def validate_domain(request, _key=None):
 
 async def post_domain(request):
     """Handler for domain creation"""
-    request.app.ctx.authorize(request, 'domain', 'create')
+    await request.app.ctx.authorize(request, 'domain', 'create')
 
     sub_response = await validate_domain(request)
     if sub_response.status > 200:
@@ -98,14 +99,12 @@ async def post_domain(request):
     IN domain
     RETURN {{ new: NEW }}
     ''')
-    result = db.aql(query)
+    result = await db.aql(query)
     result = result['result'][0] if result['result'] else {}
 
     # domain schema cache invalidation
     if RELOAD_SCHEMAS:
-        redis = request.app.ctx.redis
-        await redis.delete('memoriam_graphql_schemas')
-        await redis.delete('memoriam_rest_schemas')
+        await publish_schema_change(request.app.ctx.redis, domain['_key'])
 
     result['new'].pop('_resources', None)
 
@@ -114,7 +113,7 @@ async def post_domain(request):
 
 async def get_domain(request, _key):
     """Handler for domain access"""
-    request.app.ctx.authorize(request, 'domain', 'read')
+    await request.app.ctx.authorize(request, 'domain', 'read')
 
     db = await get_arangodb(db_name=ARANGO_DOMAIN_DB_NAME)
 
@@ -122,7 +121,7 @@ async def get_domain(request, _key):
     RETURN DOCUMENT(@_id)
     ''')
     bind_vars = {'_id': f'domain/{_key}'}
-    result = db.aql(query, bind_vars=bind_vars)
+    result = await db.aql(query, bind_vars=bind_vars)
     result = result['result'][0] if result['result'] else {}
 
     if not result:
@@ -135,7 +134,7 @@ async def get_domain(request, _key):
 
 async def patch_domain(request, _key):
     """Handler for domain update"""
-    request.app.ctx.authorize(request, 'domain', 'update')
+    await request.app.ctx.authorize(request, 'domain', 'update')
 
     sub_response = await validate_domain(request, _key)
     if sub_response.status > 200:
@@ -152,14 +151,12 @@ async def patch_domain(request, _key):
     RETURN {{ new: NEW }}
     ''')
     bind_vars = {'_key': _key}
-    result = db.aql(query, bind_vars=bind_vars)
+    result = await db.aql(query, bind_vars=bind_vars)
     result = result['result'][0] if result['result'] else {}
 
     # domain schema cache invalidation
     if RELOAD_SCHEMAS:
-        redis = request.app.ctx.redis
-        await redis.delete('memoriam_graphql_schemas')
-        await redis.delete('memoriam_rest_schemas')
+        await publish_schema_change(request.app.ctx.redis, _key)
 
     result['new'].pop('_resources', None)
 
@@ -168,7 +165,7 @@ async def patch_domain(request, _key):
 
 async def delete_domain(request, _key):
     """Handler for domain deletion"""
-    request.app.ctx.authorize(request, 'domain', 'delete')
+    await request.app.ctx.authorize(request, 'domain', 'delete')
 
     if NO_DELETE:
         raise SanicException('Object deletions are disabled', 405)
@@ -179,13 +176,11 @@ async def delete_domain(request, _key):
     REMOVE @_key IN domain
     ''')
     bind_vars = {'_key': _key}
-    db.aql(query, bind_vars=bind_vars)
+    await db.aql(query, bind_vars=bind_vars)
 
     # domain schema cache invalidation
     if RELOAD_SCHEMAS:
-        redis = request.app.ctx.redis
-        await redis.delete('memoriam_graphql_schemas')
-        await redis.delete('memoriam_rest_schemas')
+        await publish_schema_change(request.app.ctx.redis, _key)
 
     return response.empty()
 
@@ -357,7 +352,7 @@ async def domain_label_collisions(label, exclude_key=None):
     FOR object IN domain
         RETURN object
     ''')
-    result = db.aql(query)
+    result = await db.aql(query)
 
     collisions = set()
     for domain in result['result']:
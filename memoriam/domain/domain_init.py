@@ -5,12 +5,13 @@ import yaml
 
 from caseconverter import snakecase
 
-from memoriam.arangodb import get_arangodb, prettify_aql
+from memoriam.arangodb import connect_arangodb, prettify_aql
 from memoriam.config import (
     DOMAIN_SCHEMA_PATH, ARANGO_DOMAIN_DB_NAME
 )
 from memoriam.utils import Dumper, Request, load_yaml, iso8601_now
 from memoriam.domain.domain import validate_domain
+from memoriam.domain.schema_events import publish_schema_change
 
 
 logger = logging.getLogger('memoriam')
@@ -42,7 +43,7 @@ class DomainInit:
         self.domain_schema['_key'] = _key
         self.domain_schema['updated'] = iso8601_now()
 
-        db = await get_arangodb(db_name=ARANGO_DOMAIN_DB_NAME)
+        db = await connect_arangodb(db_name=ARANGO_DOMAIN_DB_NAME)
         query = prettify_aql(f'''
         UPSERT {{ _key: @_key }}
         INSERT {json.dumps(self.domain_schema)}
@@ -52,7 +53,7 @@ class DomainInit:
         ''')
         bind_vars = {'_key': _key}
 
-        result = db.aql(query, bind_vars=bind_vars)
+        result = await db.aql(query, bind_vars=bind_vars)
         result = result['result'][0] if result['result'] else {}
 
         if result.get('type') == 'insert':
@@ -61,6 +62,4 @@ class DomainInit:
             logger.info(f'Updated root domain {label}')
 
         # domain schema cache invalidation
-        redis = app.ctx.redis
-        await redis.delete('memoriam_graphql_schemas')
-        await redis.delete('memoriam_rest_schemas')
+        await publish_schema_change(app.ctx.redis, _key)
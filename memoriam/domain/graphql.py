@@ -1,7 +1,9 @@
+import copy
 import time
+import hashlib
 import logging
 
-import os
+from collections import OrderedDict
 from functools import partial
 from inspect import isawaitable
 from pathlib import Path
@@ -9,10 +11,9 @@ from pathlib import Path
 import ujson as json
 from ariadne import ObjectType, UnionType, ScalarType, make_executable_schema, graphql
 from ariadne.types import Extension
-from benedict import benedict
+from graphql import GraphQLError, FieldNode, parse, validate
+from graphql.execution.values import get_argument_values
 from caseconverter import pascalcase, snakecase
-from graphql import parse
-from graphql.utilities import separate_operations
 from sanic import response
 from sanic.exceptions import NotFound
 
@@ -20,18 +21,22 @@ from memoriam.arangodb import (
     get_arangodb, prettify_aql, get_edge_attributes, get_relation_attributes,
     get_class_filters, get_type_filters, get_search_filter, get_filter_strings,
     get_sort_string, get_all_collections,
-    defrag_ast, get_ast_subtree, get_ast_fields, get_subqueries, get_return_spec,
-    set_defaults, translate_input, translate_output, add_constants
+    get_keyset, get_cursor_bind_vars, with_cursor, pop_cursor_values, get_next_cursor,
+    parse_query, get_ast_fields, get_ast_variables, get_subqueries, get_projection, get_return_spec, prefix_bind_vars,
+    get_root_plan_args, bind_plan_values, set_defaults, add_constants, Translator
 )
 from memoriam.config import (
     ARANGO_DOMAIN_DB_NAME, ARANGO_SCHEMA_PATH, ARANGO_DEFAULT_LIMIT,
-    NO_DELETE, ROOT_PATH, KEYPATH_SEPARATOR, AUDIT_VERSIONING, RELOAD_SCHEMAS
+    NO_DELETE, ROOT_PATH, AUDIT_VERSIONING, GRAPHQL_OPERATION_CACHE_SIZE, GRAPHQL_PLAN_CACHE_SIZE,
+    PERSISTED_QUERY_TTL
 )
 from memoriam.constants import OPERATIONS, RESERVED_FIELDS
+from memoriam.domain.artifacts import SchemaArtifacts
 from memoriam.domain.jinja import env as jinja_env
 from memoriam.domain.rpc import pre_rpc, post_rpc, get_listeners
-from memoriam.domain.triggers import set_creator, set_created, set_updated, audit
-from memoriam.utils import load_raw, load_yaml, class_to_typename, validate_iso8601, task_handler
+from memoriam.domain.triggers import set_creator, set_created, set_updated, audit, audit_batch
+from memoriam.domain.totals import ResultsTotal
+from memoriam.utils import load_raw, load_yaml, class_to_typename, validate_iso8601, task_handler, fingerprint, BatchLoader
 
 
 logging.getLogger('asyncio').setLevel(logging.ERROR)
@@ -48,6 +53,11 @@ GRAPHQL_TYPES = {
 }
 
 
+def skip_validation(*args, **kwargs):
+    """Query validator for cached operations, which are already validated"""
+    return []
+
+
 class AllFieldsExtension(Extension):
     """GraphQL Extension allowing the use of the `_all` meta-field
        to return all fields on an object, even ones not part of the schema"""
@@ -74,33 +84,42 @@ class AllFieldsExtension(Extension):
     @staticmethod
     def post_process(result, domain_name, domain_cache):
         """Post processing should be called on full result.
-           Resolves stored all_fields paths, translates output,
-           and returns merged result."""
+           Resolves stored all_fields paths in place, replacing each `_all`
+           with the translated output of the object it was resolved from."""
         if 'extensions' in result:
             extensions = result.pop('extensions')
             all_fields = extensions.get('all_fields', [])
+            translators = {}
+
+            for path in all_fields:
+                obj = result.get('data')
+                for key in path[:-1]:
+                    try:
+                        obj = obj[key]
+                    except (KeyError, IndexError, TypeError):
+                        obj = None
+                        break
+
+                if not isinstance(obj, dict) or not isinstance(obj.get('_all'), dict):
+                    logger.debug(f'{path} not found in AllFields post_process')
+                    continue
 
-            if all_fields:
-                result_bdict = benedict(result, keypath_separator=KEYPATH_SEPARATOR)
-                for path in reversed(all_fields):
-                    raw_obj = result_bdict['data'][path]
-                    if not isinstance(raw_obj, benedict):
-                        logging.debug(f'{path} not found in AllFields post_process:\n {result_bdict}')
-                        continue
-                    raw_obj['_class'] = raw_obj.pop('__typename')
-                    class_name = raw_obj['_class']
-                    class_spec = domain_cache[domain_name][class_name]
-                    class_spec['permissive'] = 'output'
-                    obj = translate_output(raw_obj, class_spec)
-                    obj = class_to_typename(obj)
-                    relations = result_bdict['data'][path[:-1]]
-                    if not isinstance(relations, benedict):
-                        logging.debug(f'{path} not found in AllFields post_process:\n {result_bdict}')
-                        continue
-                    relations.pop('_all')
-                    result_bdict['data'][path[:-1]] = {**obj, **relations}
+                raw_obj = obj.pop('_all')
+                class_name = raw_obj.get('__typename')
+
+                # cached class specs are shared, output is made permissive on a copy
+                if class_name not in translators:
+                    translators[class_name] = Translator({**domain_cache[domain_name][class_name], 'permissive': 'output'})
 
-                result = dict(result_bdict)
+                all_obj = translators[class_name].output(raw_obj)
+                all_obj.pop('__typename', None)
+                all_obj['__typename'] = class_name
+
+                # selected fields take precedence, and keep their place after all fields
+                selected = dict(obj)
+                obj.clear()
+                obj.update(all_obj)
+                obj.update(selected)
 
         return result
 
@@ -116,32 +135,33 @@ class GraphQLResolverEngine:
         self.schemas = {}
         self.db_schema = load_yaml(path=ARANGO_SCHEMA_PATH)
         self.domain_cache = {}
+        self.operations = OrderedDict()
+        self.fingerprints = {}
+        self.rebuild_stats = {}
+        self.artifacts = SchemaArtifacts(app, 'graphql', self.db_schema, ARANGO_DEFAULT_LIMIT)
         self.template = jinja_env.get_template('graphql_schema.graphql')
         self.type_resolver = {}
 
         app.register_listener(self.rebuild_schema, 'before_server_start')
 
-        if RELOAD_SCHEMAS:
-            app.register_middleware(self.schema_middleware, 'request')
-
         html_path = Path(ROOT_PATH, 'templates', 'graphiql.html').resolve()
         self.graphiql_html = load_raw(html_path)
 
         app.add_route(self.graphql_graphiql, '/<domain>/graphql', methods=['GET'])
         app.add_route(self.graphql_server, '/<domain>/graphql', methods=['POST'])
 
-    async def schema_middleware(self, request):
-        """Middleware to trigger a schema rebuild if necessary"""
-        pid = os.getpid()
-        built = await self.app.ctx.redis.sismember('memoriam_graphql_schemas', pid)
-        if not built:
-            await self.rebuild_schema(self.app)
+    def invalidate_domain(self, domain_pathname):
+        """Remove the schema of a domain, with cached operations validated against it"""
+        self.schemas.pop(domain_pathname, None)
+        self.fingerprints.pop(domain_pathname, None)
+        self.domain_cache.pop(domain_pathname, None)
 
-    async def rebuild_schema(self, app):
-        """Rebuild GraphQL SDL schema from currently stored domain schemas"""
-        pid = os.getpid()
-        await app.ctx.redis.sadd('memoriam_graphql_schemas', pid)
+        for key in [key for key in self.operations if key[0] == domain_pathname]:
+            del self.operations[key]
 
+    async def rebuild_schema(self, app):
+        """Rebuild GraphQL SDL schemas of changed domains from currently stored domain schemas,
+           reusing the schemas of unchanged domains"""
         start = time.perf_counter() * 1000
         logger.debug('Rebuilding GraphQL engine schemas...')
 
@@ -152,19 +172,40 @@ class GraphQLResolverEngine:
             FILTER object.active == true && object.graphql == true
             RETURN object
         ''')
-        result = db.aql(query)
+        result = await db.aql(query)
         domains = result['result']
 
         datetime_scalar = ScalarType('DateTime', value_parser=validate_iso8601)
         allfields_scalar = ScalarType('AllFields')
 
+        fingerprints = {}
+        rebuilt = []
+        shared = []
+
         for domain in domains:
 
             domain.pop('_resources', None)
 
             domain_pathname = snakecase(domain['label'])
+
+            # schemas of unchanged domains are reused
+            fingerprints[domain_pathname] = fingerprint({k: v for k, v in domain.items() if k != '_rev'})
+            if domain_pathname in self.schemas and self.fingerprints.get(domain_pathname) == fingerprints[domain_pathname]:
+                continue
+
+            # the parsed domain schema and SDL are built by one worker and shared with the others
+            artifact = await self.artifacts.acquire(fingerprints[domain_pathname])
+
+            self.invalidate_domain(domain_pathname)
+            rebuilt.append(domain_pathname)
+
             domain_typename = pascalcase(domain['label'])
-            domain_schema = load_yaml(domain['schema'])
+            if artifact:
+                domain_schema = artifact['domain_schema']
+                shared.append(domain_pathname)
+            else:
+                domain_schema = load_yaml(domain['schema'])
+                artifact_schema = copy.deepcopy(domain_schema)
 
             query = ObjectType('Query')
             mutation = ObjectType('Mutation')
@@ -262,14 +303,17 @@ class GraphQLResolverEngine:
                 resolver = self.get_field_resolver('results')
                 domain_class_results.set_field('results', resolver)
 
+                resolver = self.get_field_resolver('next_cursor')
+                domain_class_results.set_field('next_cursor', resolver)
+
                 # add three base mutations per object
                 if 'create' in operations:
-                    resolver = self.get_mutation_resolver(class_name, class_spec, 'create', domain_pathname)
+                    resolver = self.get_mutation_resolver(class_name, class_spec, 'create', domain_pathname, coalesce=True)
                     mutation.set_field(f'create{class_typename}', resolver)
                     mutations = True
 
                 if 'update' in operations:
-                    resolver = self.get_mutation_resolver(class_name, class_spec, 'update')
+                    resolver = self.get_mutation_resolver(class_name, class_spec, 'update', coalesce=True)
                     mutation.set_field(f'update{class_typename}', resolver)
                     mutations = True
 
@@ -323,6 +367,14 @@ class GraphQLResolverEngine:
                     # add types for document substructures
                     domain_data[domain_typename]['types'] = self.get_types_recursive(domain_data[domain_typename]['types'], type_name, db_attr)
 
+                # add bulk mutations for classes with writable attributes
+                attributes = domain_data[domain_typename]['classes'][class_typename]['attributes']
+                if not all(attribute['is_readonly'] for attribute in attributes.values()):
+                    for mutation_type in ('create', 'update'):
+                        if mutation_type in operations:
+                            resolver = self.get_batch_mutation_resolver(class_name, class_spec, mutation_type)
+                            mutation.set_field(f'{mutation_type}{class_typename}Batch', resolver)
+
                 # add relation fields
                 for field_name, relation_spec in class_spec.get('relations', {}).items():
 
@@ -423,15 +475,29 @@ class GraphQLResolverEngine:
             if domains and mutations:
                 object_types.append(mutation)
 
-            schema = self.template.render(
-                domain=domain_data[domain_typename],
-                mutations=mutations,
-                graphql_types=list(GRAPHQL_TYPES.values()) + ['ID', 'DateTime'],
-                default_limit=ARANGO_DEFAULT_LIMIT
-            )
+            if artifact:
+                schema = artifact['sdl']
+            else:
+                schema = self.template.render(
+                    domain=domain_data[domain_typename],
+                    mutations=mutations,
+                    graphql_types=list(GRAPHQL_TYPES.values()) + ['ID', 'DateTime'],
+                    default_limit=ARANGO_DEFAULT_LIMIT
+                )
             self.schemas[domain_pathname] = make_executable_schema(schema, *object_types)
+            self.fingerprints[domain_pathname] = fingerprints[domain_pathname]
+
+            if not artifact:
+                await self.artifacts.store(fingerprints[domain_pathname], {'domain_schema': artifact_schema, 'sdl': schema})
+
+        # remove domains no longer active
+        for domain_pathname in set(self.schemas) - set(fingerprints):
+            self.invalidate_domain(domain_pathname)
 
-        log_perf.debug(f'Rebuild GraphQL engine schemas time: {(time.perf_counter() * 1000 - start):.2f} ms')
+        duration = time.perf_counter() * 1000 - start
+        self.rebuild_stats = {'duration_ms': round(duration, 2), 'rebuilt': rebuilt, 'shared': shared, 'reused': len(fingerprints) - len(rebuilt)}
+
+        log_perf.debug(f'Rebuild GraphQL engine schemas time: {duration:.2f} ms ({len(rebuilt)} of {len(fingerprints)} domains rebuilt)')
         logger.debug('Rebuilt GraphQL engine schemas')
 
     def check_invalid_recursive(self, db_attr):
@@ -557,9 +623,7 @@ class GraphQLResolverEngine:
             start = time.perf_counter() * 1000
 
             request = info.context
-            request.app.ctx.authorize(request, class_name, 'read', graphql=True)
-
-            db = await get_arangodb()
+            await request.app.ctx.authorize(request, class_name, 'read', graphql=True)
 
             channel = f'pre_access_obj_{class_name}'
             listeners = await get_listeners(channel, request)
@@ -571,25 +635,32 @@ class GraphQLResolverEngine:
                 query = info.context.json.get('query')
                 variables = info.context.json.get('variables', {})
                 if query:
-                    document = parse(query)
-                    operations = separate_operations(document)
-                    ast = defrag_ast(operations)
-                    ast = get_ast_subtree(ast, info.field_name)
+                    ast = parse_query(query).subtree(info.path.key, info.field_name)
 
-            if '_key' in kwargs:
-                bind_vars = {'_id': f'{class_spec["resolver"]}/{kwargs["_key"]}'}
+            project = await self.projectable(request)
 
-                fields = get_ast_fields(ast)
-                relations = [rel for rel in fields if rel in class_spec.get('relations', {})]
-                subqueries = get_subqueries(self.db_schema, domain_spec, class_spec, ast, relations, variables, bind_vars, ctx='GraphQL')
-                return_ = get_return_spec(subqueries)
+            # AQL plans are cached with the operation, by root field and the shape of its arguments
+            # (see get_root_plan_args) and of variables used by relations, argument values are bound on execution
+            cursor = kwargs.pop('cursor', None)
+            count = kwargs.pop('count', None)
+            shape, values, args = get_root_plan_args(kwargs)
+            plans = request.ctx.aql_plans if ast and hasattr(request.ctx, 'aql_plans') else {}
+            plan_key = (info.path.key, json.dumps(shape, sort_keys=True),
+                        json.dumps(get_ast_variables(ast, variables), sort_keys=True), project, bool(cursor))
+            plan = plans.get(plan_key)
+            if plan is None:
+                plan = self.get_root_plan(domain_spec, class_name, class_spec, ast, variables, shape, project, bool(cursor))
+                plans[plan_key] = plan
+                if len(plans) > GRAPHQL_PLAN_CACHE_SIZE:
+                    del plans[next(iter(plans))]
 
-                query = prettify_aql(f'''
-                WITH {get_all_collections(self.db_schema)}
-                LET object = DOCUMENT(@_id)
-                RETURN {return_}
-                ''')
-                results = db.aql(query, bind_vars=bind_vars)
+            bind_vars = bind_plan_values(plan, values, args, ctx='GraphQL')
+
+            batched = bool(ast) and not listeners and plan['batched']
+
+            if '_key' in kwargs:
+                bind_vars['_id'] = f'{class_spec["resolver"]}/{kwargs["_key"]}'
+                results = await self.execute_root(request, info.path.key, plan['query'], bind_vars, batched=batched)
                 result = results['result']
 
                 if result:
@@ -605,33 +676,20 @@ class GraphQLResolverEngine:
 
             else:
 
-                bind_vars = {}
-                search_subset = self.app.ctx.search.get_search_subset(kwargs.get('search'), class_spec, bind_vars)
-                attributes = class_spec.get('attributes', {})
-                class_filters = get_class_filters([class_spec.get('class', class_name)])
-                filters = get_filter_strings(kwargs.get('filter', []), attributes, bind_vars, ctx='GraphQL')
-                sort = get_sort_string(kwargs.get('sort', []), attributes, ctx='GraphQL')
-                skip = int(kwargs.get('skip', 0))
-                limit = int(kwargs.get('limit', ARANGO_DEFAULT_LIMIT))
-
-                fields = get_ast_fields(ast)
-                relations = [rel for rel in fields if rel in class_spec.get('relations', {})]
-                subqueries = get_subqueries(self.db_schema, domain_spec, class_spec, ast, relations, variables, bind_vars, ctx='GraphQL')
-                return_ = get_return_spec(subqueries)
-
-                query = prettify_aql(f'''
-                WITH {get_all_collections(self.db_schema)}
-                {search_subset}
-                FOR object IN {class_spec["resolver"]}
-                    {class_filters}
-                    {filters}
-                    {sort}
-                    LIMIT {skip}, {limit}
-                    RETURN {return_}
-                ''')
-                results = db.aql(query, bind_vars=bind_vars, total=True)
-                total = results['total']
+                if cursor:
+                    bind_vars.update(get_cursor_bind_vars(cursor, kwargs.get('sort', []), ctx='GraphQL'))
+
+                # total is only counted if selected (or selections are unknown), and not cached
+                selected = bool(plan['count']) or not ast
+                total = ResultsTotal(request, count, plan['count'], kwargs.get('search'), bind_vars, ctx='GraphQL')
+                bind_vars.update(skip=int(kwargs.get('skip', 0)), limit=int(kwargs.get('limit', ARANGO_DEFAULT_LIMIT)))
+                counted = selected and await total.full_count()
+                results = await self.execute_root(request, info.path.key, plan['query'], bind_vars,
+                                                  count=plan['count'] if counted else None, total=counted, batched=batched)
+                results_total = await total.get(results['total']) if selected else None
                 results = results['result']
+                next_cursor = get_next_cursor(kwargs.get('sort', []), pop_cursor_values(results),
+                                              len(results), int(kwargs.get('limit', ARANGO_DEFAULT_LIMIT)))
 
                 if listeners:
                     results, _ = await pre_rpc(channel, listeners, results, request)
@@ -642,10 +700,128 @@ class GraphQLResolverEngine:
 
                 log_perf.debug(f'GraphQL get object list resolver time: {(time.perf_counter() * 1000 - start):.2f} ms')
 
-                return {'results_total': total, 'results': results}
+                return {'results_total': results_total, 'results': results, 'next_cursor': next_cursor}
 
         return object_resolver
 
+    async def projectable(self, request):
+        """Whether objects can be projected to their selected fields, which is not the case
+           if any pre_access_obj RPC listeners, which may read any field, are registered"""
+        service_rpcs = await request.app.ctx.cache.get('service_rpcs', {})
+        return not any(channel.startswith('pre_access_obj_') for channel in service_rpcs)
+
+    def get_root_plan(self, domain_spec, class_name, class_spec, ast, variables, kwargs, project=False, cursor=False):
+        """Build the AQL query of a root field with its bind variables, and whether it can be
+           combined with other root fields (see execute_root), for the shape of its arguments
+           (see get_root_plan_args). Objects are projected to their selected fields if project.
+           Listings continue after cursor bind variables if cursor, and are paged by @skip and @limit"""
+        fields = get_ast_fields(ast)
+        relations = [rel for rel in fields if rel in class_spec.get('relations', {})]
+        projection = get_projection(fields, class_spec.get('attributes', {})) if project and ast else None
+
+        if '_key' in kwargs:
+            bind_vars = {'_id': f'{class_spec["resolver"]}/{kwargs["_key"]}'}
+
+            subqueries = get_subqueries(self.db_schema, domain_spec, class_spec, ast, relations, variables, bind_vars, ctx='GraphQL', project=project)
+            return_ = get_return_spec(subqueries, projection=projection)
+
+            query = prettify_aql(f'''
+            LET object = DOCUMENT(@_id)
+            FILTER object != null
+            RETURN {return_}
+            ''')
+
+            return {
+                'query': query,
+                'bind_vars': bind_vars,
+                'count': None,
+                'batched': '_all' not in fields,
+            }
+
+        bind_vars = {}
+        search_subset = self.app.ctx.search.get_search_subset(kwargs.get('search'), class_spec, bind_vars)
+        attributes = class_spec.get('attributes', {})
+        class_filters = get_class_filters([class_spec.get('class', class_name)])
+        filters = get_filter_strings(kwargs.get('filter', []), attributes, bind_vars, ctx='GraphQL')
+        sort = get_sort_string(kwargs.get('sort', []), attributes, ctx='GraphQL')
+        cursor_filter, cursor_values = get_keyset(kwargs.get('sort', []), attributes, cursor, ctx='GraphQL')
+
+        subqueries = get_subqueries(self.db_schema, domain_spec, class_spec, ast, relations, variables, bind_vars, ctx='GraphQL', project=project)
+        return_ = with_cursor(get_return_spec(subqueries, projection=projection), cursor_values)
+
+        query = prettify_aql(f'''
+        {search_subset}
+        FOR object IN {class_spec["resolver"]}
+            {class_filters}
+            {filters}
+            {cursor_filter}
+            {sort}
+            LIMIT @skip, @limit
+            RETURN {return_}
+        ''')
+
+        # total is counted in the combined query only if selected
+        count = None
+        if 'results_total' in [selection.get('name', {}).get('value') for selection in ast.get('selection_set', {}).get('selections', [])]:
+            count = prettify_aql(f'''
+            FOR object IN {class_spec["resolver"]}
+                {class_filters}
+                {filters}
+                {cursor_filter}
+                COLLECT WITH COUNT INTO total
+                RETURN total
+            ''')
+
+        return {
+            'query': query,
+            'bind_vars': bind_vars,
+            'count': count,
+            'batched': '_all' not in fields and not search_subset,
+        }
+
+    async def execute_root(self, request, key, query, bind_vars, count=None, total=False, batched=False):
+        """Execute the query of a root field, combined with the other root fields of the
+           operation reaching this point in the same event loop iteration if batched"""
+        if batched and hasattr(request.ctx, 'root_queries'):
+            request.ctx.root_queries[key] = (query, bind_vars, count)
+            return await request.ctx.root_loader.load(key)
+
+        db = await get_arangodb()
+        query = f'WITH {get_all_collections(self.db_schema)}\n{query}'
+        return await db.aql(query, bind_vars=bind_vars, total=total)
+
+    async def load_roots(self, root_queries, keys):
+        """Execute the queries of several root fields as one AQL query, with a subquery per
+           root field and prefixed bind variables, returning results by root field key"""
+        start = time.perf_counter() * 1000
+
+        bind_vars = {}
+        subqueries = []
+        returns = []
+
+        for i, key in enumerate(keys):
+            query, root_bind_vars, count = root_queries.pop(key)
+            prefix = f'root{i}_'
+            bind_vars.update({f'{prefix}{name}': value for name, value in root_bind_vars.items()})
+
+            subqueries.append(f'LET root{i} = (\n{prefix_bind_vars(query, root_bind_vars, prefix)})')
+            if count:
+                subqueries.append(f'LET root{i}_total = FIRST(\n{prefix_bind_vars(count, root_bind_vars, prefix)})')
+                returns.append(f'{{result: root{i}, total: root{i}_total}}')
+            else:
+                returns.append(f'{{result: root{i}, total: null}}')
+
+        subqueries = '\n'.join(subqueries)
+        query = f'WITH {get_all_collections(self.db_schema)}\n{subqueries}\nRETURN [{", ".join(returns)}]'
+
+        db = await get_arangodb()
+        results = await db.aql(query, bind_vars=bind_vars)
+        results = results['result'][0]
+
+        log_perf.debug(f'GraphQL combined root query time ({len(keys)} fields): {(time.perf_counter() * 1000 - start):.2f} ms')
+
+        return dict(zip(keys, results))
+
     def get_edge_resolver(self, domain_spec, class_spec, relation):
         """Generate a coroutine to resolve domain object edges"""
         async def edge_resolver(obj, info, **kwargs):
@@ -663,52 +839,27 @@ class GraphQLResolverEngine:
                 query = info.context.json.get('query')
                 variables = info.context.json.get('variables', {})
                 if query:
-                    document = parse(query)
-                    operations = separate_operations(document)
-                    ast = defrag_ast(operations)
-                    ast = get_ast_subtree(ast, info.field_name)
+                    ast = parse_query(query).subtree(info.path.key, info.field_name)
 
             if obj and obj.get(relation) is not None:
                 results = obj.get(relation)
                 total = len(results)  # TODO: get actual count
 
             else:
-                request.app.ctx.authorize(request, obj.get('_class'), 'read', graphql=True)
-                db = await get_arangodb()
-                bind_vars = {
-                    '_id': obj['_id'],
-                    'edge_collection': edge_collection
-                }
-                edge_attributes = get_edge_attributes(self.db_schema, class_spec, relation)
-                edge_filters = get_filter_strings(kwargs.get('edge_filter', []), edge_attributes, bind_vars, obj_name='edge', ctx='GraphQL')
-                attributes = get_relation_attributes(domain_spec, class_spec, relation)
-                type_filters = get_type_filters(domain_spec, edge_spec)
-                search_filter = get_search_filter(kwargs.get('search'), bind_vars)
-                filters = get_filter_strings(kwargs.get('filter', []), attributes, bind_vars, ctx='GraphQL')
-                sort = get_sort_string(kwargs.get('sort', []), attributes, ctx='GraphQL')
-                skip = int(kwargs.get('skip', 0))
-                limit = int(kwargs.get('limit', ARANGO_DEFAULT_LIMIT))
-
-                fields = get_ast_fields(ast)
-                relations = [rel for rel in fields if rel in class_spec.get('relations', {})]
-                subqueries = get_subqueries(self.db_schema, domain_spec, class_spec, ast, relations, variables, bind_vars, ctx='GraphQL')
-                return_ = get_return_spec(subqueries, _edge=True)
+                await request.app.ctx.authorize(request, obj.get('_class'), 'read', graphql=True)
 
-                query = prettify_aql(f'''
-                WITH {get_all_collections(self.db_schema)}
-                LET doc = DOCUMENT(@_id)
-                FOR object, object_edge IN {depth_direction} doc @edge_collection
-                    {edge_filters}
-                    {type_filters}
-                    {search_filter}
-                    {filters}
-                    {sort}
-                    LIMIT {skip}, {limit}
-                    RETURN DISTINCT {return_}
-                ''')
-                results = db.aql(query, bind_vars=bind_vars, total=True)
-                total = results['total']
-                results = results['result']
+                # relations of sibling objects are loaded in one batch per request, relation and arguments
+                loaders = getattr(request.ctx, 'edge_loaders', None)
+                project = await self.projectable(request) if loaders is not None else False
+                load_edges = partial(self.load_edges, domain_spec, class_spec, relation, ast, variables, kwargs, project)
+
+                if loaders is None:
+                    results, total = (await load_edges([obj['_id']])).get(obj['_id'], ([], 0))
+                else:
+                    loader_key = (id(class_spec), relation, json.dumps(kwargs, sort_keys=True))
+                    if loader_key not in loaders:
+                        loaders[loader_key] = BatchLoader(load_edges, default=([], 0))
+                    results, total = await loaders[loader_key].load(obj['_id'])
 
             service_rpcs = await request.app.ctx.cache.get('service_rpcs', {})
 
@@ -744,6 +895,9 @@ class GraphQLResolverEngine:
 
             else:
 
+                if not results:
+                    return None
+
                 result = results[0]
 
                 _class = result.get('_class')
@@ -762,11 +916,90 @@ class GraphQLResolverEngine:
 
         return edge_resolver
 
-    def get_mutation_resolver(self, class_name, class_spec, mutation_type, domain_pathname=None):
+    async def load_edges(self, domain_spec, class_spec, relation, ast, variables, kwargs, project, ids):
+        """Traverse a relation from a batch of objects by _id in one query, projecting
+           related objects to their selected fields if project, returning a dict of (results, total) by _id"""
+        edge_spec, edge_collection, depth_direction = class_spec['relations'][relation]
+
+        db = await get_arangodb()
+        bind_vars = {
+            '_ids': ids,
+            'edge_collection': edge_collection
+        }
+        edge_attributes = get_edge_attributes(self.db_schema, class_spec, relation)
+        edge_filters = get_filter_strings(kwargs.get('edge_filter', []), edge_attributes, bind_vars, obj_name='object_edge', ctx='GraphQL')
+        attributes = get_relation_attributes(domain_spec, class_spec, relation)
+        type_filters = get_type_filters(domain_spec, edge_spec)
+        search_filter = get_search_filter(kwargs.get('search'), bind_vars)
+        filters = get_filter_strings(kwargs.get('filter', []), attributes, bind_vars, ctx='GraphQL')
+        sort = get_sort_string(kwargs.get('sort', []), attributes, ctx='GraphQL')
+        skip = int(kwargs.get('skip', 0))
+        limit = int(kwargs.get('limit', ARANGO_DEFAULT_LIMIT))
+
+        fields = get_ast_fields(ast)
+        relations = [rel for rel in fields if rel in class_spec.get('relations', {})]
+        subqueries = get_subqueries(self.db_schema, domain_spec, class_spec, ast, relations, variables, bind_vars, ctx='GraphQL', project=project)
+        projection = get_projection(fields, attributes) if project and ast else None
+        return_ = get_return_spec(subqueries, _edge=True, projection=projection)
+
+        query = prettify_aql(f'''
+        WITH {get_all_collections(self.db_schema)}
+        FOR _id IN @_ids
+            LET doc = DOCUMENT(_id)
+            LET total = COUNT(
+                FOR object, object_edge IN {depth_direction} doc @edge_collection
+                    {edge_filters}
+                    {type_filters}
+                    {search_filter}
+                    {filters}
+                    RETURN 1
+            )
+            LET results = (
+                FOR object, object_edge IN {depth_direction} doc @edge_collection
+                    {edge_filters}
+                    {type_filters}
+                    {search_filter}
+                    {filters}
+                    {sort}
+                    LIMIT {skip}, {limit}
+                    RETURN DISTINCT {return_}
+            )
+            RETURN {{_id, total, results}}
+        ''')
+        results = await db.aql(query, bind_vars=bind_vars)
+
+        return {result['_id']: (result['results'], result['total']) for result in results['result']}
+
+    def get_mutation_resolver(self, class_name, class_spec, mutation_type, domain_pathname=None, coalesce=False):
         """Generate a coroutine to resolve domain object data to backend object data,
-           and create, update or delete them according to mutation type"""
+           and create, update or delete them according to mutation type.
+           With coalesce, runs of sibling create or update mutations of the same type are
+           executed as one bulk write by the first of them"""
+        translator = Translator(class_spec)
+
         async def mutation_resolver(obj, info, **kwargs):
 
+            if coalesce and mutation_type in ('create', 'update'):
+                results = info.context.ctx.mutation_results
+
+                if info.path.key not in results:
+                    siblings = self.get_sibling_mutations(info, kwargs)
+                    if len(siblings) > 1:
+                        keys, items = zip(*siblings)
+                        merge_objects = kwargs.get('mergeObjects', False)
+                        try:
+                            bulk_results = await self.bulk_mutate(info.context, class_name, class_spec,
+                                                                  mutation_type, items, merge_objects)
+                        except Exception as e:
+                            bulk_results = [e] * len(keys)
+                        results.update(zip(keys, bulk_results))
+
+                if info.path.key in results:
+                    result = results.pop(info.path.key)
+                    if isinstance(result, Exception):
+                        raise result
+                    return result
+
             start = time.perf_counter() * 1000
 
             db = await get_arangodb()
@@ -777,14 +1010,14 @@ class GraphQLResolverEngine:
             trx_id = request.headers.get('x-arango-trx-id')
             input_ = kwargs.pop('input', {})
             _meta = input_.pop('_meta', {})
-            data = translate_input(input_, class_spec)
+            data = translator.input(input_)
 
             if '_key' in kwargs:
                 data['_key'] = kwargs['_key']
 
             if mutation_type == 'create':
 
-                request.app.ctx.authorize(request, class_name, 'create', graphql=True)
+                await request.app.ctx.authorize(request, class_name, 'create', graphql=True)
 
                 data = set_defaults(data, class_spec['resolver'], self.db_schema)
                 data['_class'] = class_spec.get('class', class_name)
@@ -820,7 +1053,7 @@ class GraphQLResolverEngine:
                 bind_vars = {
                     '@collection': class_spec['resolver'],
                 }
-                result = db.aql(query, bind_vars=bind_vars, trx_id=trx_id)
+                result = await db.aql(query, bind_vars=bind_vars, trx_id=trx_id)
                 result = result['result'][0] if result['result'] else {}
 
                 channel = f'post_create_obj_{class_name}'
@@ -850,7 +1083,7 @@ class GraphQLResolverEngine:
 
             if mutation_type == 'update':
 
-                request.app.ctx.authorize(request, class_name, 'update', graphql=True)
+                await request.app.ctx.authorize(request, class_name, 'update', graphql=True)
 
                 if 'set_updated' in triggers:
                     data = set_updated(data)
@@ -862,7 +1095,7 @@ class GraphQLResolverEngine:
                     data, trx_id = await pre_rpc(channel, listeners, data, request)
                     _meta = data.pop('_meta', _meta)
 
-                merge = 'true' if bool(kwargs.get('merge_objects', False)) else 'false'
+                merge = 'true' if bool(kwargs.get('mergeObjects', False)) else 'false'
                 query = prettify_aql(f'''
                 UPDATE {json.dumps(data)}
                 IN @@collection
@@ -872,7 +1105,7 @@ class GraphQLResolverEngine:
                 bind_vars = {
                     '@collection': class_spec['resolver'],
                 }
-                result = db.aql(query, bind_vars=bind_vars, trx_id=trx_id)
+                result = await db.aql(query, bind_vars=bind_vars, trx_id=trx_id)
                 result = result['result'][0] if result['result'] else {}
 
                 channel = f'post_update_obj_{class_name}'
@@ -904,7 +1137,7 @@ class GraphQLResolverEngine:
                     UPDATE {json.dumps(update)}
                     IN @@collection
                     ''')
-                    db.aql(query, bind_vars=bind_vars, trx_id=trx_id)
+                    await db.aql(query, bind_vars=bind_vars, trx_id=trx_id)
 
                 result = class_to_typename(result['new'])
 
@@ -917,7 +1150,7 @@ class GraphQLResolverEngine:
                 if NO_DELETE:
                     return False
 
-                request.app.ctx.authorize(request, class_name, 'delete', graphql=True)
+                await request.app.ctx.authorize(request, class_name, 'delete', graphql=True)
 
                 query = prettify_aql('''
                 REMOVE @_key IN @@collection
@@ -927,7 +1160,7 @@ class GraphQLResolverEngine:
                     '@collection': class_spec['resolver'],
                     '_key': kwargs['_key']
                 }
-                result = db.aql(query, bind_vars=bind_vars)
+                result = await db.aql(query, bind_vars=bind_vars)
                 result = result['result'][0] if result['result'] else {}
 
                 channel = f'post_delete_obj_{class_name}'
@@ -949,6 +1182,162 @@ class GraphQLResolverEngine:
 
         return mutation_resolver
 
+    def get_batch_mutation_resolver(self, class_name, class_spec, mutation_type):
+        """Generate a coroutine to create or update a list of domain objects in one bulk write"""
+        async def batch_mutation_resolver(obj, info, inputs, mergeObjects=False):
+            if mutation_type == 'create':
+                items = [{'input': input_} for input_ in inputs]
+            else:
+                items = inputs
+
+            return await self.bulk_mutate(info.context, class_name, class_spec, mutation_type, items, mergeObjects)
+
+        return batch_mutation_resolver
+
+    def get_sibling_mutations(self, info, kwargs):
+        """Get response keys and arguments of the run of identical sibling mutation fields starting
+           at the current one, which may be executed together without reordering any writes"""
+        siblings = [(info.path.key, kwargs)]
+        field_node = info.field_nodes[0]
+        selections = info.operation.selection_set.selections
+        index = next((i for i, node in enumerate(selections) if node is field_node), None)
+
+        if index is None or len(info.field_nodes) > 1:
+            return siblings
+
+        field_def = info.parent_type.fields[info.field_name]
+        keys = {info.path.key}
+
+        for node in selections[index + 1:]:
+            if not isinstance(node, FieldNode) or node.name.value != info.field_name or node.directives:
+                break
+
+            key = node.alias.value if node.alias else node.name.value
+            if key in keys:
+                break
+
+            try:
+                args = get_argument_values(field_def, node, info.variable_values)
+            except GraphQLError:
+                break
+
+            # merging is a per-write option
+            if args.get('mergeObjects', False) != kwargs.get('mergeObjects', False):
+                break
+
+            siblings.append((key, args))
+            keys.add(key)
+
+        return siblings
+
+    async def bulk_mutate(self, request, class_name, class_spec, mutation_type, items, merge_objects=False):
+        """Create or update domain objects from a list of mutation arguments in one bulk write,
+           returning results in order, with errors in place of objects that were not written"""
+        start = time.perf_counter() * 1000
+
+        await request.app.ctx.authorize(request, class_name, mutation_type, graphql=True)
+
+        db = await get_arangodb()
+        service_rpcs = await request.app.ctx.cache.get('service_rpcs', {})
+
+        translator = Translator(class_spec)
+        triggers = class_spec.get('triggers', [])
+        trx_id = request.headers.get('x-arango-trx-id')
+        data = []
+        meta = []
+
+        channel = f'pre_{mutation_type}_obj_{class_name}'
+        listeners = service_rpcs.get(channel, [])
+
+        for item in items:
+            input_ = dict(item.get('input') or {})
+            _meta = input_.pop('_meta', {})
+            item_data = translator.input(input_)
+
+            if '_key' in item:
+                item_data['_key'] = item['_key']
+
+            if mutation_type == 'create':
+                item_data = set_defaults(item_data, class_spec['resolver'], self.db_schema)
+                item_data['_class'] = class_spec.get('class', class_name)
+
+                if 'set_creator' in triggers:
+                    item_data = set_creator(item_data, request)
+
+                if 'set_created' in triggers:
+                    item_data = set_created(item_data)
+
+                if 'audit' in triggers and AUDIT_VERSIONING:
+                    item_data['_version'] = None
+
+            if 'set_updated' in triggers:
+                item_data = set_updated(item_data)
+
+            if listeners:
+                item_data, trx_id = await pre_rpc(channel, listeners, item_data, request)
+                _meta = item_data.pop('_meta', _meta)
+
+            if mutation_type == 'create':
+                _index = self.app.ctx.search.build_search_index(class_spec['resolver'], item_data)
+                if _index:
+                    item_data['_index'] = _index
+
+            data.append(item_data)
+            meta.append(_meta)
+
+        if mutation_type == 'create':
+            results = await db.bulk_create(class_spec['resolver'], data, sync=False, trx_id=trx_id)
+        else:
+            results = await db.bulk_update(class_spec['resolver'], data, sync=False,
+                                           merge=bool(merge_objects), trx_id=trx_id)
+
+        channel = f'post_{mutation_type}_obj_{class_name}'
+        listeners = service_rpcs.get(channel, [])
+
+        objects = []
+        changes = []
+        indexes = []
+
+        for result, _meta in zip(results, meta):
+            if 'new' not in result:
+                objects.append(GraphQLError(result.get('errorMessage', f'Could not {mutation_type} {class_name}')))
+                continue
+
+            old = result.get('old', {})
+
+            if listeners:
+                result['new']['_meta'] = _meta
+                coro = partial(post_rpc, channel, listeners, old, result['new'], request)
+
+                if trx_id:
+                    await coro()
+                else:
+                    task = request.app.add_task(coro)
+                    task.add_done_callback(task_handler)
+
+            if 'audit' in triggers:
+                changes.append((old, result['new'], _meta.get('note')))
+
+            if mutation_type == 'update':
+                _index = self.app.ctx.search.build_search_index(class_spec['resolver'], result['new'])
+                if _index:
+                    indexes.append({'_key': result['new']['_key'], '_index': _index})
+
+            objects.append(class_to_typename(result['new']) or None)
+
+        # one audit write for the whole batch
+        if changes:
+            coro = partial(audit_batch, changes, request, edge=False)
+            task = request.app.add_task(coro)
+            task.add_done_callback(task_handler)
+
+        if indexes:
+            await db.bulk_update(class_spec['resolver'], indexes, sync=False, new=False, old=False, trx_id=trx_id)
+
+        log_perf.debug(f'GraphQL bulk {mutation_type} object mutation time ({len(items)} objects): {(time.perf_counter() * 1000 - start):.2f} ms')
+
+        return objects
+
     def get_edge_mutation_resolver(self, class_spec, mutation_type, edge_resolver,
         this_type=None, relation_spec=None, related_type=None, related_spec=None):
         """Generate a coroutine to resolve domain object data to backend object data,
@@ -967,7 +1356,7 @@ class GraphQLResolverEngine:
 
             if mutation_type == 'create':
 
-                request.app.ctx.authorize(request, snakecase(related_type), 'create', graphql=True)
+                await request.app.ctx.authorize(request, snakecase(related_type), 'create', graphql=True)
 
                 resolver = self.get_mutation_resolver(snakecase(related_type), related_spec, mutation_type)
                 rel_result = await resolver({}, info, input=input_)
@@ -1008,7 +1397,7 @@ class GraphQLResolverEngine:
                 bind_vars = {
                     '@collection': edge_resolver
                 }
-                result = db.aql(query, bind_vars=bind_vars, trx_id=trx_id)
+                result = await db.aql(query, bind_vars=bind_vars, trx_id=trx_id)
                 result = result['result'][0] if result['result'] else {}
 
                 if 'audit' in triggers:
@@ -1030,7 +1419,7 @@ class GraphQLResolverEngine:
 
             if mutation_type == 'attach':
 
-                request.app.ctx.authorize(request, snakecase(kwargs['from']['type']), 'create', graphql=True)
+                await request.app.ctx.authorize(request, snakecase(kwargs['from']['type']), 'create', graphql=True)
 
                 input_ = set_defaults(input_, edge_resolver, self.db_schema)
 
@@ -1053,7 +1442,7 @@ class GraphQLResolverEngine:
                 bind_vars = {
                     '@collection': edge_resolver
                 }
-                result = db.aql(query, bind_vars=bind_vars, trx_id=trx_id)
+                result = await db.aql(query, bind_vars=bind_vars, trx_id=trx_id)
                 result = result['result'][0] if result['result'] else {}
 
                 if 'audit' in triggers:
@@ -1068,12 +1457,12 @@ class GraphQLResolverEngine:
 
             if mutation_type == 'update':
 
-                request.app.ctx.authorize(request, snakecase(kwargs['from']['type']), 'update', graphql=True)
+                await request.app.ctx.authorize(request, snakecase(kwargs['from']['type']), 'update', graphql=True)
 
                 if 'set_updated' in triggers:
                     input_ = set_updated(input_)
 
-                merge = 'true' if bool(kwargs.get('merge_objects', False)) else 'false'
+                merge = 'true' if bool(kwargs.get('mergeObjects', False)) else 'false'
                 query = prettify_aql(f'''
                 FOR edge IN @@collection
                     FILTER edge._from == @_from && edge._to == @_to
@@ -1087,7 +1476,7 @@ class GraphQLResolverEngine:
                     '_from': data['_from'],
                     '_to': data['_to']
                 }
-                results = db.aql(query, bind_vars=bind_vars, trx_id=trx_id)
+                results = await db.aql(query, bind_vars=bind_vars, trx_id=trx_id)
                 results = results['result']
 
                 if not results:
@@ -1110,7 +1499,7 @@ class GraphQLResolverEngine:
                 if NO_DELETE:
                     return False
 
-                request.app.ctx.authorize(request, snakecase(kwargs['from']['type']), 'delete', graphql=True)
+                await request.app.ctx.authorize(request, snakecase(kwargs['from']['type']), 'delete', graphql=True)
 
                 query = prettify_aql('''
                 FOR edge IN @@collection
@@ -1123,7 +1512,7 @@ class GraphQLResolverEngine:
                     '_from': data['_from'],
                     '_to': data['_to']
                 }
-                results = db.aql(query, bind_vars=bind_vars, trx_id=trx_id)
+                results = await db.aql(query, bind_vars=bind_vars, trx_id=trx_id)
                 results = results['result']
 
                 if not results:
@@ -1146,6 +1535,58 @@ class GraphQLResolverEngine:
         """Serves an interactive environment for exploring the GraphQL API"""
         return response.html(self.graphiql_html)
 
+    async def resolve_persisted_query(self, request, data):
+        """Resolve an automatic persisted query (APQ) by its sha256 hash, registering the
+           query text if given with its hash; returns a GraphQL error dict on failure.
+           Registered queries expire PERSISTED_QUERY_TTL after their last use"""
+        if not isinstance(data, dict):
+            return None
+
+        persisted_query = (data.get('extensions') or {}).get('persistedQuery')
+        if not persisted_query:
+            return None
+
+        query_hash = persisted_query.get('sha256Hash')
+        key = f'memoriam_graphql_query:{query_hash}'
+        query = data.get('query')
+
+        if query:
+            if hashlib.sha256(query.encode()).hexdigest() != query_hash:
+                return {'message': 'Provided sha does not match query', 'extensions': {'code': 'PERSISTED_QUERY_HASH_MISMATCH'}}
+            await self.app.ctx.redis.set(key, query, ex=PERSISTED_QUERY_TTL)
+            return None
+
+        query = await self.app.ctx.redis.getex(key, ex=PERSISTED_QUERY_TTL)
+        if not query:
+            return {'message': 'PersistedQueryNotFound', 'extensions': {'code': 'PERSISTED_QUERY_NOT_FOUND'}}
+
+        data['query'] = query.decode() if isinstance(query, bytes) else query
+        return None
+
+    def get_operation(self, domain, schema, query):
+        """Get the cached operation for a query, with its parsed and validated document and
+           AQL plans, parsing and validating it on a miss. Returns None for invalid queries,
+           leaving parse and validation errors to be reported by ariadne"""
+        key = (domain, hashlib.sha256(query.encode()).hexdigest())
+
+        if key in self.operations:
+            self.operations.move_to_end(key)
+            return self.operations[key]
+
+        try:
+            document = parse(query)
+        except GraphQLError:
+            return None
+
+        if validate(schema, document):
+            return None
+
+        self.operations[key] = {'document': document, 'aql_plans': {}}
+        if len(self.operations) > GRAPHQL_OPERATION_CACHE_SIZE:
+            self.operations.popitem(last=False)
+
+        return self.operations[key]
+
     async def graphql_server(self, request, domain):
         """Handler for actual GraphQL requests"""
         schema = self.schemas.get(domain)
@@ -1153,12 +1594,31 @@ class GraphQLResolverEngine:
             raise NotFound(f'No schema found for Domain {domain}', 404)
 
         data = request.json
+        request.ctx.edge_loaders = {}
+        request.ctx.mutation_results = {}
+        request.ctx.root_queries = {}
+        request.ctx.root_loader = BatchLoader(partial(self.load_roots, request.ctx.root_queries))
+
+        error = await self.resolve_persisted_query(request, data)
+        if error:
+            return response.json({'errors': [error]}, 400)
+
+        # validated operations skip parsing and validation, and reuse their AQL plans
+        operation = None
+        if isinstance(data, dict) and isinstance(data.get('query'), str):
+            operation = self.get_operation(domain, schema, data['query'])
+
+        if operation:
+            request.ctx.aql_plans = operation['aql_plans']
+
         success, result = await graphql(
             schema=schema,
             data=data,
             logger='memoriam.error',
             context_value=request,
             root_value={},
+            query_document=operation['document'] if operation else None,
+            query_validator=skip_validation if operation else None,
             extensions=[
                 AllFieldsExtension,
             ],
@@ -1,24 +1,27 @@
-import os
 import time
 import logging
 
 from functools import partial
+from collections import OrderedDict
 
 import ujson as json
 from caseconverter import snakecase
 from sanic import response
 from sanic.exceptions import SanicException, InvalidUsage, NotFound
+from sanic.request import RequestParameters
 
 from memoriam.config import (
     ARANGO_DOMAIN_DB_NAME, ARANGO_SCHEMA_PATH, ARANGO_DEFAULT_LIMIT,
-    NO_DELETE, AUDIT_LOG_DB, AUDIT_VERSIONING, RELOAD_SCHEMAS
+    NO_DELETE, AUDIT_LOG_DB, AUDIT_VERSIONING, REST_PLAN_CACHE_SIZE
 )
 from memoriam.arangodb import (
     get_arangodb, prettify_aql, get_edge_attributes, get_relation_attributes,
     get_type_filters, get_class_filters, get_filter_strings, get_sort_string, get_field_spec,
+    get_keyset, get_cursor_bind_vars, with_cursor, pop_cursor_values, get_next_cursor,
     get_dotted_queries, get_parent_filters, get_subqueries_v2, get_return_spec_v2,
     get_all_collections, get_all_edge_collections, set_defaults,
-    translate_input, translate_output, translate_relations, get_search_filter
+    get_translators, get_relation_tree, translate_relations, get_search_filter, Translator,
+    get_plan_args, bind_plan_values
 )
 from memoriam.constants import OPERATIONS, RESERVED_FIELDS
 from memoriam.openapi import OpenAPI
@@ -26,13 +29,19 @@ from memoriam.domain.domain import parse_all_relations
 from memoriam.domain.jinja import env as jinja_env
 from memoriam.domain.rpc import pre_rpc, post_rpc, get_listeners
 from memoriam.domain.triggers import set_creator, set_created, set_updated, audit
-from memoriam.utils import load_yaml, task_handler
+from memoriam.domain.artifacts import SchemaArtifacts
+from memoriam.domain.totals import ResultsTotal
+from memoriam.utils import load_yaml, task_handler, fingerprint
 
 
 logging.getLogger('asyncio').setLevel(logging.ERROR)
 logger = logging.getLogger('memoriam')
 log_perf = logging.getLogger('memoriam.perf')
 
+# request arguments shaping the AQL query plans of listings
+LIST_PLAN_ARGS = ('search', 'relation', 'parent_filter', 'filter', 'edge_filter', 'field', 'sort')
+RELATION_PLAN_ARGS = ('edge_filter', 'search', 'filter', 'field', 'sort')
+
 
 class RESTResolverEngine:
     """This Sanic extension transforms domain schemas to working REST APIs,
@@ -48,12 +57,16 @@ class RESTResolverEngine:
         self.db_schema = load_yaml(path=ARANGO_SCHEMA_PATH)
         self.template = jinja_env.get_template('openapi_spec_domain.yml')
         self.domain_cache = {}
+        self.translators = {}
+        self.search_translators = {}
+        self.default_translator = Translator({})
+        self.query_plans = OrderedDict()
+        self.fingerprints = {}
+        self.rebuild_stats = {}
+        self.artifacts = SchemaArtifacts(app, 'rest', self.db_schema, ARANGO_DEFAULT_LIMIT, AUDIT_LOG_DB)
 
         app.register_listener(self.rebuild_schema, 'before_server_start')
 
-        if RELOAD_SCHEMAS:
-            app.register_middleware(self.schema_middleware, 'request')
-
         app.add_route(
             handler=self.domain_search_resolver,
             uri='/<domain>/api/search',
@@ -131,18 +144,8 @@ class RESTResolverEngine:
                 methods=['GET']
             )
 
-    async def schema_middleware(self, request):
-        """Middleware to trigger a schema rebuild if necessary"""
-        pid = os.getpid()
-        built = await self.app.ctx.redis.sismember('memoriam_rest_schemas', pid)
-        if not built:
-            await self.rebuild_schema(self.app)
-
     async def rebuild_schema(self, app):
         """Rebuild REST spec from currently stored domain schemas"""
-        pid = os.getpid()
-        await app.ctx.redis.sadd('memoriam_rest_schemas', pid)
-
         start = time.perf_counter() * 1000
         logger.debug('Rebuilding REST engine cache...')
 
@@ -154,87 +157,218 @@ class RESTResolverEngine:
             FILTER object.active == true
             RETURN object
         ''')
-        result = db.aql(query)
+        result = await db.aql(query)
         domains = result['result']
 
+        # the spec depends on service RPC listeners and search view links as well as the domain
+        view_links = self.app.ctx.search.view_props.get('links', {})
+        fingerprints = {}
+        rebuilt = []
+        shared = []
+
         for domain in domains:
 
             domain.pop('_resources', None)
 
             label = snakecase(domain['label'])
-            schema = load_yaml(domain['schema'])
-            schema = {snakecase(k): v for k, v in schema.items()}
-            indexed_classes = []
-
-            for class_name, class_spec in schema.items():
-
-                # set default for class if not set
-                if 'class' not in class_spec:
-                    schema[class_name]['class'] = class_name
-
-                # set default for operations if not set
-                if 'operations' not in class_spec:
-                    schema[class_name]['operations'] = OPERATIONS
 
-                # set default for permissive if not set
-                if 'permissive' not in class_spec:
-                    schema[class_name]['permissive'] = 'no'
-
-                # search indexed and readable, add to indexed_classes (to be used in spec)
-                if (class_spec['resolver'] in self.app.ctx.search.view_props.get('links', {}) and
-                    'read' in schema[class_name]['operations']):
-                    indexed_classes.append(class_name)
-
-                # if this is an alias class, merge operations on the root class
-                alias = snakecase(class_spec.get('alias', class_name))
-                if alias != class_name:
-                    schema[class_name]['class'] = alias
-                    schema[alias]['operations'] = list(set([
-                        *schema[alias]['operations'],
-                        *class_spec['operations']
-                    ]))
-
-                # set (alias) class to be used for each operation
-                for operation in class_spec['operations']:
-                    schema[alias][f'{operation}_class'] = class_name
-
-            for service_name, service_spec in service_info.items():
-
-                service_rpcs = service_spec.get('rpc', {})
-                for class_name, class_spec in service_rpcs.items():
-                    if class_name in schema:
-
-                        if 'listeners' not in schema[class_name]:
-                            schema[class_name]['listeners'] = []
+            # specs of unchanged domains are reused
+            fingerprints[label] = fingerprint({k: v for k, v in domain.items() if k != '_rev'}, service_info, list(view_links))
+            if label in self.domain_cache and self.fingerprints.get(label) == fingerprints[label]:
+                continue
 
-                        schema[class_name]['listeners'].append({
-                            **class_spec,
-                            'name': service_name,
-                            'host': service_spec.get('host')
-                        })
+            # compiled specs are built by one worker and shared with the others
+            artifact = await self.artifacts.acquire(fingerprints[label])
+            if artifact:
+                schema, dict_spec = artifact['schema'], artifact['spec']
+                shared.append(label)
+            else:
+                schema, dict_spec = self.build_domain(domain, service_info)
 
+            self.openapi.remove_spec(label)
             self.domain_cache[label] = schema
-
-            yaml_spec = self.template.render(
-                db_schema=self.db_schema,
-                domain=domain,
-                schema=schema,
-                default_limit=ARANGO_DEFAULT_LIMIT,
-                indexed_classes=indexed_classes,
-                reserved_fields=RESERVED_FIELDS,
-                include_changes_api=AUDIT_LOG_DB
-            )
-            dict_spec = load_yaml(yaml_spec)
-
+            self.translators[label] = get_translators(schema, self.db_schema)
+            self.remove_query_plans(label)
             self.openapi.init_spec(namespace=label, spec=dict_spec)
+            self.fingerprints[label] = fingerprints[label]
+            rebuilt.append(label)
+
+            if not artifact:
+                await self.artifacts.store(fingerprints[label], {'schema': schema, 'spec': dict_spec})
+
+        # remove domains no longer active
+        for label in set(self.domain_cache) - set(fingerprints):
+            self.domain_cache.pop(label, None)
+            self.translators.pop(label, None)
+            self.remove_query_plans(label)
+            self.fingerprints.pop(label, None)
+            self.openapi.remove_spec(label)
+
+        # cross-domain search translates by class name, classes of later domains take precedence
+        self.search_translators = {
+            class_name: translator
+            for label in self.domain_cache for class_name, translator in self.get_translators(label).items()
+        }
 
         await app.ctx.cache.set('domain_cache', self.domain_cache)
 
-        log_perf.debug(f'Rebuild REST engine cache time: {(time.perf_counter() * 1000 - start):.2f} ms')
+        duration = time.perf_counter() * 1000 - start
+        self.rebuild_stats = {'duration_ms': round(duration, 2), 'rebuilt': rebuilt, 'shared': shared, 'reused': len(fingerprints) - len(rebuilt)}
+
+        log_perf.debug(f'Rebuild REST engine cache time: {duration:.2f} ms ({len(rebuilt)} of {len(fingerprints)} domains rebuilt)')
         logger.debug('Rebuilt REST engine cache')
 
         return self.domain_cache
 
+    def get_translators(self, domain):
+        """Get the translators of the classes of a domain, compiled on schema rebuild"""
+        if domain not in self.translators and domain in self.domain_cache:
+            self.translators[domain] = get_translators(self.domain_cache[domain], self.db_schema)
+        return self.translators.get(domain, {})
+
+    def get_translator(self, domain, *class_names):
+        """Get the translator of the first of class_names existing in a domain"""
+        translators = self.get_translators(domain)
+        for class_name in class_names:
+            if class_name in translators:
+                return translators[class_name]
+        return self.default_translator
+
+    def get_query_plan(self, key, args, names, build_plan):
+        """Get the cached AQL query plan for the shape of the request arguments `names`
+           (see get_plan_args) by key, building it with build_plan(shape args) on a miss.
+           Returns the plan with bind variables for the argument values"""
+        shape, values = get_plan_args(args, names)
+        key = (*key, json.dumps(shape, sort_keys=True))
+
+        plan = self.query_plans.get(key)
+        if plan is None:
+            plan = build_plan(RequestParameters(shape))
+            self.query_plans[key] = plan
+            if len(self.query_plans) > REST_PLAN_CACHE_SIZE:
+                self.query_plans.popitem(last=False)
+        else:
+            self.query_plans.move_to_end(key)
+
+        return plan, bind_plan_values(plan, values, args)
+
+    def remove_query_plans(self, domain):
+        """Remove the cached query plans of a domain"""
+        for key in [key for key in self.query_plans if key[0] == domain]:
+            del self.query_plans[key]
+
+    def build_domain(self, domain, service_info):
+        """Build the domain cache entry and OpenAPI spec of a domain"""
+        schema = load_yaml(domain['schema'])
+        schema = {snakecase(k): v for k, v in schema.items()}
+        indexed_classes = []
+
+        for class_name, class_spec in schema.items():
+
+            # set default for class if not set
+            if 'class' not in class_spec:
+                schema[class_name]['class'] = class_name
+
+            # set default for operations if not set
+            if 'operations' not in class_spec:
+                schema[class_name]['operations'] = OPERATIONS
+
+            # set default for permissive if not set
+            if 'permissive' not in class_spec:
+                schema[class_name]['permissive'] = 'no'
+
+            # search indexed and readable, add to indexed_classes (to be used in spec)
+            if (class_spec['resolver'] in self.app.ctx.search.view_props.get('links', {}) and
+                'read' in schema[class_name]['operations']):
+                indexed_classes.append(class_name)
+
+            # if this is an alias class, merge operations on the root class
+            alias = snakecase(class_spec.get('alias', class_name))
+            if alias != class_name:
+                schema[class_name]['class'] = alias
+                schema[alias]['operations'] = list(set([
+                    *schema[alias]['operations'],
+                    *class_spec['operations']
+                ]))
+
+            # set (alias) class to be used for each operation
+            for operation in class_spec['operations']:
+                schema[alias][f'{operation}_class'] = class_name
+
+        for service_name, service_spec in service_info.items():
+
+            service_rpcs = service_spec.get('rpc', {})
+            for class_name, class_spec in service_rpcs.items():
+                if class_name in schema:
+
+                    if 'listeners' not in schema[class_name]:
+                        schema[class_name]['listeners'] = []
+
+                    schema[class_name]['listeners'].append({
+                        **class_spec,
+                        'name': service_name,
+                        'host': service_spec.get('host')
+                    })
+
+        yaml_spec = self.template.render(
+            db_schema=self.db_schema,
+            domain=domain,
+            schema=schema,
+            default_limit=ARANGO_DEFAULT_LIMIT,
+            indexed_classes=indexed_classes,
+            reserved_fields=RESERVED_FIELDS,
+            include_changes_api=AUDIT_LOG_DB
+        )
+        dict_spec = load_yaml(yaml_spec)
+
+        return schema, dict_spec
+
+    def stream_results(self, request, cursor, process_results, skip, limit, total, sort_query=None):
+        """Stream results from an AQLCursor batch by batch, as NDJSON (stream=ndjson)
+           or as a chunked JSON object (stream=json) with the same shape as listings.
+           JSON streams of sorted listings (by sort_query) end with their next_cursor"""
+        ndjson = request.args.get('stream') == 'ndjson'
+
+        async def streaming_fn(stream):
+            start = time.perf_counter() * 1000
+            separator = ''
+            count = 0
+            cursor_values = None
+
+            async with cursor:
+                if not ndjson:
+                    await stream.write(f'{{"skip":{skip},"limit":{limit},"results_total":{json.dumps(total)},"results":[')
+
+                async for batch in cursor.batches():
+                    count += len(batch)
+                    batch_values = pop_cursor_values(batch)
+                    if batch_values is not None:
+                        cursor_values = batch_values
+
+                    results = await process_results(batch)
+                    if not results:
+                        continue
+
+                    if ndjson:
+                        await stream.write(''.join(f'{json.dumps(result)}\n' for result in results))
+                    else:
+                        await stream.write(separator + ','.join(json.dumps(result) for result in results))
+                        separator = ','
+
+                if not ndjson and sort_query:
+                    next_cursor = get_next_cursor(sort_query, cursor_values, count, limit)
+                    await stream.write(f'],"next_cursor":{json.dumps(next_cursor)}}}')
+                elif not ndjson:
+                    await stream.write(']}')
+
+            log_perf.debug(f'REST stream time: {(time.perf_counter() * 1000 - start):.2f} ms')
+
+        return response.ResponseStream(
+            streaming_fn,
+            headers={'x-results-total': str(total)} if total is not None else None,
+            content_type='application/x-ndjson' if ndjson else 'application/json'
+        )
+
     async def domain_search_resolver(self, request, domain):
         """Handler for domain-specific search"""
 
@@ -259,6 +393,7 @@ class RESTResolverEngine:
         filters = get_filter_strings(request.args.getlist('filter', []), attributes, bind_vars)
         skip = int(request.args.get('skip', 0))
         limit = int(request.args.get('limit', ARANGO_DEFAULT_LIMIT))
+        total = ResultsTotal(request, request.args.get('count'), domain, search_subset, class_filters, filters, bind_vars)
 
         query = prettify_aql(f'''
         WITH {get_all_collections(self.db_schema)}
@@ -270,38 +405,44 @@ class RESTResolverEngine:
             LIMIT {skip}, {limit}
             RETURN object
         ''')
-        results = db.aql(query, bind_vars=bind_vars, total=True)
-        total = results['total']
-        results = results['result']
+        async def process_results(results):
+            results_by_class = {}
+            for result in results:
+                _class = result.get('_class')
 
-        results_by_class = {}
-        for result in results:
-            _class = result.get('_class')
+                if _class not in results_by_class:
+                    results_by_class[_class] = []
+
+                results_by_class[_class].append(result)
 
-            if _class not in results_by_class:
-                results_by_class[_class] = []
+            post_results = []
+            for _class, results in results_by_class.items():
+                channel = f'pre_access_obj_{_class}'
+                listeners = service_rpcs.get(channel, [])
 
-            results_by_class[_class].append(result)
+                if listeners:
+                    rpc_results, _ = await pre_rpc(channel, listeners, results, request)
+                    post_results.extend(rpc_results)
+                else:
+                    post_results.extend(results)
 
-        post_results = []
-        for _class, results in results_by_class.items():
-            channel = f'pre_access_obj_{_class}'
-            listeners = service_rpcs.get(channel, [])
+            return [
+                self.get_translator(domain, result.get('_class')).output(result)
+                for result in post_results
+            ]
 
-            if listeners:
-                rpc_results, _ = await pre_rpc(channel, listeners, results, request)
-                post_results.extend(rpc_results)
-            else:
-                post_results.extend(results)
+        if request.args.get('stream'):
+            cursor = await db.cursor(query, bind_vars=bind_vars, total=await total.full_count())
+            return self.stream_results(request, cursor, process_results, skip, limit, await total.get(cursor.total))
+
+        results = await db.aql(query, bind_vars=bind_vars, total=await total.full_count())
+        results_total = await total.get(results['total'])
+        results = await process_results(results['result'])
 
-        results = [
-            translate_output(result, self.domain_cache[domain][result.get('_class')], self.db_schema)
-            for result in post_results
-        ]
         results_obj = {
             'skip': skip,
             'limit': limit,
-            'results_total': total,
+            'results_total': results_total,
             'results': results
         }
 
@@ -314,7 +455,7 @@ class RESTResolverEngine:
 
         start = time.perf_counter() * 1000
 
-        request.app.ctx.authorize(request, domain_class, 'read')
+        await request.app.ctx.authorize(request, domain_class, 'read')
 
         db = await get_arangodb()
 
@@ -323,6 +464,7 @@ class RESTResolverEngine:
         # get alias class_spec
         op_class = class_spec.get('read_class', domain_class)
         class_spec = domain_spec.get(op_class, class_spec)
+        translator = self.get_translator(domain, op_class, domain_class)
         operations = class_spec.get('operations', OPERATIONS)
 
         if not class_spec:
@@ -331,70 +473,107 @@ class RESTResolverEngine:
         if 'read' not in operations:
             raise SanicException("Operation 'read' is not permitted for this domain class", 405)
 
-        bind_vars = {}
-        search_subset = self.app.ctx.search.get_search_subset(request.args.get('search'), class_spec, bind_vars)
-        attributes = class_spec.get('attributes', {})
-        class_filters = get_class_filters([class_spec.get('class', domain_class)])
+        sort_args = get_dotted_queries(request.args.getlist('sort', []))
+        cursor = request.args.get('cursor')
 
-        relation_args = get_dotted_queries(request.args.getlist('relation', []))
-        relations = [rel for rel in relation_args if rel in class_spec.get('relations', {})]
+        def build_plan(args):
+            bind_vars = {}
+            search_subset = self.app.ctx.search.get_search_subset(args.get('search'), class_spec, bind_vars)
+            attributes = class_spec.get('attributes', {})
+            class_filters = get_class_filters([class_spec.get('class', domain_class)])
 
-        subqueries = get_subqueries_v2(self.db_schema, domain_spec, class_spec, request.args, relations, bind_vars)
-        subquery_defs = ''.join(subqueries)
+            relation_args = get_dotted_queries(args.getlist('relation', []))
+            relations = [rel for rel in relation_args if rel in class_spec.get('relations', {})]
 
-        parent_filter_args = get_dotted_queries(request.args.getlist('parent_filter', []))
-        parent_filters = get_parent_filters(parent_filter_args, relations)
+            subqueries = get_subqueries_v2(self.db_schema, domain_spec, class_spec, args, relations, bind_vars)
+            subquery_defs = ''.join(subqueries)
 
-        filter_args = get_dotted_queries(request.args.getlist('filter', []))
-        filters = get_filter_strings(filter_args, attributes, bind_vars)
+            parent_filter_args = get_dotted_queries(args.getlist('parent_filter', []))
+            parent_filters = get_parent_filters(parent_filter_args, relations)
 
-        field_args = get_dotted_queries(request.args.getlist('field', []))
-        fields = get_field_spec(field_args, attributes, bind_vars)
+            filter_args = get_dotted_queries(args.getlist('filter', []))
+            filters = get_filter_strings(filter_args, attributes, bind_vars)
 
-        sort_args = get_dotted_queries(request.args.getlist('sort', []))
-        sort = get_sort_string(sort_args, attributes)
+            field_args = get_dotted_queries(args.getlist('field', []))
+            fields = get_field_spec(field_args, attributes, bind_vars)
+
+            sort = get_sort_string(sort_args, attributes)
+            cursor_filter, cursor_values = get_keyset(sort_args, attributes, cursor=bool(cursor))
+            return_ = with_cursor(get_return_spec_v2(fields, relations), cursor_values)
+
+            query = prettify_aql(f'''
+            WITH {get_all_collections(self.db_schema)}
+            {search_subset}
+            FOR object IN {class_spec["resolver"]}
+                {class_filters}
+                {subquery_defs}
+                {parent_filters}
+                {filters}
+                {cursor_filter}
+                {sort}
+                LIMIT @skip, @limit
+                RETURN {return_}
+            ''')
+
+            return {
+                'query': query,
+                'bind_vars': bind_vars,
+                'fields': fields,
+                'relations': relations,
+                'relation_tree': get_relation_tree(args, relations),
+            }
+
+        plan, bind_vars = self.get_query_plan((domain, domain_class, 'list', bool(cursor)), request.args, LIST_PLAN_ARGS, build_plan)
+        fields, relations = plan['fields'], plan['relations']
+
+        if cursor:
+            bind_vars.update(get_cursor_bind_vars(cursor, sort_args))
+
+        # totals are cached per query and bind variables, before paging
+        total = ResultsTotal(request, request.args.get('count'), plan['query'], bind_vars)
 
         skip = int(request.args.get('skip', 0))
         limit = int(request.args.get('limit', ARANGO_DEFAULT_LIMIT))
-        return_ = get_return_spec_v2(fields, relations)
-
-        query = prettify_aql(f'''
-        WITH {get_all_collections(self.db_schema)}
-        {search_subset}
-        FOR object IN {class_spec["resolver"]}
-            {class_filters}
-            {subquery_defs}
-            {parent_filters}
-            {filters}
-            {sort}
-            LIMIT {skip}, {limit}
-            RETURN {return_}
-        ''')
-        results = db.aql(query, bind_vars=bind_vars, total=True)
-        total = results['total']
-        results = results['result']
+        bind_vars.update(skip=skip, limit=limit)
+        query = plan['query']
 
         channel = f'pre_access_obj_{domain_class}'
         listeners = await get_listeners(channel, request)
 
-        if listeners:
-            results, _ = await pre_rpc(channel, listeners, results, request)
+        async def process_results(results):
+            if listeners:
+                results, _ = await pre_rpc(channel, listeners, results, request)
 
-        if fields == 'object':
-            results = [translate_output(result, class_spec, self.db_schema, relations) for result in results]
-        elif '_class' not in request.args.getlist('field', []):
-            for result in results:
-                del result['_class']
+            if fields == 'object':
+                results = [translator.output(result, relations) for result in results]
+            elif '_class' not in request.args.getlist('field', []):
+                for result in results:
+                    del result['_class']
 
-        if relations:
-            results = translate_relations(results, self.db_schema, domain_spec, request.args, relations)
+            if relations:
+                results = translate_relations(results, self.get_translators(domain), plan['relation_tree'])
+
+            return results
+
+        if request.args.get('stream'):
+            cursor = await db.cursor(query, bind_vars=bind_vars, total=await total.full_count())
+            return self.stream_results(request, cursor, process_results, skip, limit, await total.get(cursor.total), sort_args)
+
+        results = await db.aql(query, bind_vars=bind_vars, total=await total.full_count())
+        results_total = await total.get(results['total'])
+        results = results['result']
+        next_cursor = get_next_cursor(sort_args, pop_cursor_values(results), len(results), limit)
+        results = await process_results(results)
 
         results_obj = {
             'skip': skip,
             'limit': limit,
-            'results_total': total,
-            'results': results
+            'results_total': results_total,
+            'results': results,
         }
+        # only sorted listings are paginated by cursor
+        if sort_args:
+            results_obj['next_cursor'] = next_cursor
 
         log_perf.debug(f'REST object list resolver time: {(time.perf_counter() * 1000 - start):.2f} ms')
 
@@ -405,7 +584,7 @@ class RESTResolverEngine:
 
         start = time.perf_counter() * 1000
 
-        request.app.ctx.authorize(request, domain_class, 'create')
+        await request.app.ctx.authorize(request, domain_class, 'create')
 
         db = await get_arangodb()
         service_rpcs = await request.app.ctx.cache.get('service_rpcs', {})
@@ -415,6 +594,7 @@ class RESTResolverEngine:
         # get alias class_spec
         op_class = class_spec.get('create_class', domain_class)
         class_spec = domain_spec.get(op_class, class_spec)
+        translator = self.get_translator(domain, op_class, domain_class)
         operations = class_spec.get('operations', OPERATIONS)
 
         if not class_spec:
@@ -428,7 +608,7 @@ class RESTResolverEngine:
         trx_id = request.headers.get('x-arango-trx-id')
         triggers = class_spec.get('triggers', [])
 
-        data = translate_input(data, class_spec)
+        data = translator.input(data)
         data = set_defaults(data, class_spec['resolver'], self.db_schema)
         data['_class'] = class_spec.get('class', domain_class)
 
@@ -465,7 +645,7 @@ class RESTResolverEngine:
         bind_vars = {
             '@collection': class_spec['resolver'],
         }
-        result = db.aql(query, bind_vars=bind_vars, trx_id=trx_id)
+        result = await db.aql(query, bind_vars=bind_vars, trx_id=trx_id)
         result = result['result'][0] if result['result'] else {}
 
         channel = f'post_create_obj_{domain_class}'
@@ -487,7 +667,7 @@ class RESTResolverEngine:
             task = request.app.add_task(coro)
             task.add_done_callback(task_handler)
 
-        result = translate_output(result['new'], class_spec, self.db_schema)
+        result = translator.output(result['new'])
 
         log_perf.debug(f'REST object post resolver time: {(time.perf_counter() * 1000 - start):.2f} ms')
 
@@ -498,7 +678,7 @@ class RESTResolverEngine:
 
         start = time.perf_counter() * 1000
 
-        request.app.ctx.authorize(request, domain_class, 'create')
+        await request.app.ctx.authorize(request, domain_class, 'create')
 
         db = await get_arangodb()
         service_rpcs = await request.app.ctx.cache.get('service_rpcs', {})
@@ -508,6 +688,7 @@ class RESTResolverEngine:
         # get alias class_spec
         op_class = class_spec.get('create_class', domain_class)
         class_spec = domain_spec.get(op_class, class_spec)
+        translator = self.get_translator(domain, op_class, domain_class)
         operations = class_spec.get('operations', OPERATIONS)
 
         if not class_spec:
@@ -521,7 +702,7 @@ class RESTResolverEngine:
         triggers = class_spec.get('triggers', [])
 
         meta = [item.pop('_meta', {}) for item in data]
-        data = [translate_input(item, class_spec) for item in data]
+        data = [translator.input(item) for item in data]
         data = [set_defaults(item, class_spec['resolver'], self.db_schema) for item in data]
 
         channel = f'pre_create_obj_{domain_class}'
@@ -555,7 +736,7 @@ class RESTResolverEngine:
         new = request.args.get('new', True)
         mode = request.args.get('mode', 'conflict')
 
-        results = db.bulk_create(class_spec['resolver'], data, sync, new, mode, trx_id)
+        results = await db.bulk_create(class_spec['resolver'], data, sync, new, mode, trx_id)
 
         channel = f'post_create_obj_{domain_class}'
         listeners = service_rpcs.get(channel, [])
@@ -581,7 +762,7 @@ class RESTResolverEngine:
                     task = request.app.add_task(coro)
                     task.add_done_callback(task_handler)
 
-            result = translate_output(item, class_spec, self.db_schema)
+            result = translator.output(item)
 
         log_perf.debug(f'REST object post resolver time: {(time.perf_counter() * 1000 - start):.2f} ms')
 
@@ -592,7 +773,7 @@ class RESTResolverEngine:
 
         start = time.perf_counter() * 1000
 
-        request.app.ctx.authorize(request, domain_class, 'update')
+        await request.app.ctx.authorize(request, domain_class, 'update')
 
         db = await get_arangodb()
         service_rpcs = await request.app.ctx.cache.get('service_rpcs', {})
@@ -602,6 +783,7 @@ class RESTResolverEngine:
         # get alias class_spec
         op_class = class_spec.get('update_class', domain_class)
         class_spec = domain_spec.get(op_class, class_spec)
+        translator = self.get_translator(domain, op_class, domain_class)
         operations = class_spec.get('operations', OPERATIONS)
 
         if not class_spec:
@@ -616,7 +798,7 @@ class RESTResolverEngine:
 
         keys = [item.get('_key') for item in data]
         meta = [item.pop('_meta', {}) for item in data]
-        data = [translate_input(item, class_spec) for item in data]
+        data = [translator.input(item) for item in data]
 
         channel = f'pre_update_obj_{domain_class}'
         listeners = service_rpcs.get(channel, [])
@@ -640,7 +822,7 @@ class RESTResolverEngine:
         keep_null = request.args.get('keep_null', True)
         merge = request.args.get('merge', False)
 
-        results = db.bulk_update(class_spec['resolver'], data, sync, new, old, keep_null, merge, trx_id)
+        results = await db.bulk_update(class_spec['resolver'], data, sync, new, old, keep_null, merge, trx_id)
 
         channel = f'post_update_obj_{domain_class}'
         listeners = service_rpcs.get(channel, [])
@@ -667,9 +849,9 @@ class RESTResolverEngine:
                 if sync:
                     _index = self.app.ctx.search.build_search_index(class_spec['resolver'], result['new'])
                     if _index:
-                        results = db.bulk_update(class_spec['resolver'], data, sync, new, old, keep_null, merge)
+                        results = await db.bulk_update(class_spec['resolver'], data, sync, new, old, keep_null, merge)
 
-            result = translate_output(item, class_spec, self.db_schema)
+            result = translator.output(item)
 
         log_perf.debug(f'REST object patch resolver time: {(time.perf_counter() * 1000 - start):.2f} ms')
 
@@ -683,7 +865,7 @@ class RESTResolverEngine:
 
         start = time.perf_counter() * 1000
 
-        request.app.ctx.authorize(request, domain_class, 'delete')
+        await request.app.ctx.authorize(request, domain_class, 'delete')
 
         db = await get_arangodb()
 
@@ -692,6 +874,7 @@ class RESTResolverEngine:
         # get alias class_spec
         op_class = class_spec.get('delete_class', domain_class)
         class_spec = domain_spec.get(op_class, class_spec)
+        translator = self.get_translator(domain, op_class, domain_class)
         operations = class_spec.get('operations', OPERATIONS)
 
         if not class_spec:
@@ -707,7 +890,7 @@ class RESTResolverEngine:
         sync = request.args.get('sync', True)
         old = request.args.get('old', True)
 
-        results = db.bulk_delete(class_spec['resolver'], data, sync, old, trx_id)
+        results = await db.bulk_delete(class_spec['resolver'], data, sync, old, trx_id)
 
         channel = f'post_delete_obj_{domain_class}'
         listeners = await get_listeners(channel, request)
@@ -728,7 +911,7 @@ class RESTResolverEngine:
                     task = request.app.add_task(coro)
                     task.add_done_callback(task_handler)
 
-            result = translate_output(item, class_spec, self.db_schema)
+            result = translator.output(item)
 
         log_perf.debug(f'REST object delete resolver time: {(time.perf_counter() * 1000 - start):.2f} ms')
 
@@ -739,7 +922,7 @@ class RESTResolverEngine:
 
         start = time.perf_counter() * 1000
 
-        request.app.ctx.authorize(request, domain_class, 'read')
+        await request.app.ctx.authorize(request, domain_class, 'read')
 
         db = await get_arangodb()
 
@@ -748,6 +931,7 @@ class RESTResolverEngine:
         # get alias class_spec
         op_class = class_spec.get('read_class', domain_class)
         class_spec = domain_spec.get(op_class, class_spec)
+        translator = self.get_translator(domain, op_class, domain_class)
         operations = class_spec.get('operations', OPERATIONS)
 
         if not class_spec:
@@ -775,7 +959,7 @@ class RESTResolverEngine:
         {subquery_defs}
         RETURN {return_}
         ''')
-        results = db.aql(query, bind_vars=bind_vars)
+        results = await db.aql(query, bind_vars=bind_vars)
         result = results['result']
 
         if not result:
@@ -790,12 +974,12 @@ class RESTResolverEngine:
         result = result[0]
 
         if fields == 'object':
-            result = translate_output(result, class_spec, self.db_schema, relations)
+            result = translator.output(result, relations)
         elif '_class' not in request.args.getlist('field', []):
             del result['_class']
 
         if relations:
-            result = translate_relations([result], self.db_schema, domain_spec, request.args, relations)
+            result = translate_relations([result], self.get_translators(domain), get_relation_tree(request.args, relations))
             result = result[0]
 
         log_perf.debug(f'REST object get resolver time: {(time.perf_counter() * 1000 - start):.2f} ms')
@@ -807,7 +991,7 @@ class RESTResolverEngine:
 
         start = time.perf_counter() * 1000
 
-        request.app.ctx.authorize(request, domain_class, 'update')
+        await request.app.ctx.authorize(request, domain_class, 'update')
 
         db = await get_arangodb()
         service_rpcs = await request.app.ctx.cache.get('service_rpcs', {})
@@ -817,6 +1001,7 @@ class RESTResolverEngine:
         # get alias class_spec
         op_class = class_spec.get('update_class', domain_class)
         class_spec = domain_spec.get(op_class, class_spec)
+        translator = self.get_translator(domain, op_class, domain_class)
         operations = class_spec.get('operations', OPERATIONS)
 
         if not class_spec:
@@ -831,7 +1016,7 @@ class RESTResolverEngine:
         _meta = data.pop('_meta', {})
         trx_id = request.headers.get('x-arango-trx-id')
 
-        data = translate_input(data, class_spec)
+        data = translator.input(data)
         data['_key'] = _key
 
         if 'set_updated' in triggers:
@@ -856,7 +1041,7 @@ class RESTResolverEngine:
         bind_vars = {
             '@collection': class_spec['resolver'],
         }
-        result = db.aql(query, bind_vars=bind_vars, trx_id=trx_id)
+        result = await db.aql(query, bind_vars=bind_vars, trx_id=trx_id)
         result = result['result'][0] if result['result'] else {}
 
         channel = f'post_update_obj_{domain_class}'
@@ -888,9 +1073,9 @@ class RESTResolverEngine:
             UPDATE {json.dumps(update)}
             IN @@collection
             ''')
-            db.aql(query, bind_vars=bind_vars)
+            await db.aql(query, bind_vars=bind_vars)
 
-        result = translate_output(result['new'], class_spec, self.db_schema)
+        result = translator.output(result['new'])
 
         log_perf.debug(f'REST object patch resolver time: {(time.perf_counter() * 1000 - start):.2f} ms')
 
@@ -904,7 +1089,7 @@ class RESTResolverEngine:
 
         start = time.perf_counter() * 1000
 
-        request.app.ctx.authorize(request, domain_class, 'delete')
+        await request.app.ctx.authorize(request, domain_class, 'delete')
 
         db = await get_arangodb()
 
@@ -932,7 +1117,7 @@ class RESTResolverEngine:
             '@collection': class_spec['resolver'],
             '_key': _key
         }
-        result = db.aql(query, bind_vars=bind_vars, trx_id=trx_id)
+        result = await db.aql(query, bind_vars=bind_vars, trx_id=trx_id)
         result = result['result'][0] if result['result'] else {}
 
         channel = f'post_delete_obj_{domain_class}'
@@ -957,7 +1142,7 @@ class RESTResolverEngine:
 
         start = time.perf_counter() * 1000
 
-        request.app.ctx.authorize(request, domain_class, 'read')
+        await request.app.ctx.authorize(request, domain_class, 'read')
 
         db = await get_arangodb()
 
@@ -971,61 +1156,96 @@ class RESTResolverEngine:
             raise NotFound(f'{domain_class} does not exist', 404)
 
         edge_spec, edge_collection, depth_direction = class_spec['relations'][relation]
+        sort_args = request.args.getlist('sort', [])
+        cursor = request.args.get('cursor')
+
+        def build_plan(args):
+            bind_vars = {'edge_collection': edge_collection}
+            edge_attributes = get_edge_attributes(self.db_schema, class_spec, relation)
+            edge_filters = get_filter_strings(args.getlist('edge_filter', []), edge_attributes, bind_vars, obj_name='edge')
+            attributes = get_relation_attributes(domain_spec, class_spec, relation)
+            type_filters = get_type_filters(domain_spec, edge_spec)
+            search_filter = get_search_filter(args.get('search'), bind_vars)
+            filters = get_filter_strings(args.getlist('filter', []), attributes, bind_vars)
+            fields = get_field_spec(args.getlist('field', []), attributes, bind_vars)
+            sort = get_sort_string(sort_args, attributes)
+            cursor_filter, cursor_values = get_keyset(sort_args, attributes, cursor=bool(cursor))
+            return_ = with_cursor(f'MERGE({fields}, {{_edge: UNSET(edge, "_id", "_key", "_rev", "_from", "_to")}})', cursor_values)
+
+            query = prettify_aql(f'''
+            WITH {get_all_collections(self.db_schema)}
+            LET doc = DOCUMENT(@_id)
+            FOR object, edge IN {depth_direction} doc @edge_collection
+                {edge_filters}
+                {type_filters}
+                {search_filter}
+                {filters}
+                {cursor_filter}
+                {sort}
+                LIMIT @skip, @limit
+                RETURN DISTINCT {return_}
+            ''')
+
+            return {
+                'query': query,
+                'bind_vars': bind_vars,
+                'fields': fields,
+            }
+
+        plan, bind_vars = self.get_query_plan((domain, domain_class, 'relation', relation, bool(cursor)), request.args, RELATION_PLAN_ARGS, build_plan)
+        fields = plan['fields']
+        bind_vars['_id'] = f'{class_spec["resolver"]}/{_key}'
+
+        if cursor:
+            bind_vars.update(get_cursor_bind_vars(cursor, sort_args))
+
+        # totals are cached per query and bind variables, before paging
+        total = ResultsTotal(request, request.args.get('count'), plan['query'], bind_vars)
 
-        bind_vars = {
-            '_id': f'{class_spec["resolver"]}/{_key}',
-            'edge_collection': edge_collection
-        }
-        edge_attributes = get_edge_attributes(self.db_schema, class_spec, relation)
-        edge_filters = get_filter_strings(request.args.getlist('edge_filter', []), edge_attributes, bind_vars, obj_name='edge')
-        attributes = get_relation_attributes(domain_spec, class_spec, relation)
-        type_filters = get_type_filters(domain_spec, edge_spec)
-        search_filter = get_search_filter(request.args.get('search'), bind_vars)
-        filters = get_filter_strings(request.args.getlist('filter', []), attributes, bind_vars)
-        fields = get_field_spec(request.args.getlist('field', []), attributes, bind_vars)
-        sort = get_sort_string(request.args.getlist('sort', []), attributes)
         skip = int(request.args.get('skip', 0))
         limit = int(request.args.get('limit', ARANGO_DEFAULT_LIMIT))
+        bind_vars.update(skip=skip, limit=limit)
+        query = plan['query']
 
-        query = prettify_aql(f'''
-        WITH {get_all_collections(self.db_schema)}
-        LET doc = DOCUMENT(@_id)
-        FOR object, edge IN {depth_direction} doc @edge_collection
-            {edge_filters}
-            {type_filters}
-            {search_filter}
-            {filters}
-            {sort}
-            LIMIT {skip}, {limit}
-            RETURN DISTINCT MERGE({fields}, {{_edge: UNSET(edge, "_id", "_key", "_rev", "_from", "_to")}})
-        ''')
-        results = db.aql(query, bind_vars=bind_vars, total=True)
-        total = results['total']
-        results = results['result']
+        async def process_results(results):
+            if results:
+                _class = results[0]['_class']
+                channel = f'pre_access_obj_{_class}'
+                listeners = await get_listeners(channel, request)
 
-        if results:
-            _class = results[0]['_class']
-            channel = f'pre_access_obj_{_class}'
-            listeners = await get_listeners(channel, request)
+                if listeners:
+                    results, _ = await pre_rpc(channel, listeners, results, request)
 
-            if listeners:
-                results, _ = await pre_rpc(channel, listeners, results, request)
+                if fields == 'object':
+                    results = [
+                        self.get_translator(domain, result['_class']).output(result)
+                        for result in results
+                    ]
+                elif '_class' not in request.args.getlist('field', []):
+                    for result in results:
+                        del result['_class']
 
-            if fields == 'object':
-                results = [
-                    translate_output(result, self.domain_cache[domain][result['_class']], self.db_schema)
-                    for result in results
-                ]
-            elif '_class' not in request.args.getlist('field', []):
-                for result in results:
-                    del result['_class']
+            return results
+
+        if request.args.get('stream'):
+            cursor = await db.cursor(query, bind_vars=bind_vars, total=await total.full_count())
+            return self.stream_results(request, cursor, process_results, skip, limit, await total.get(cursor.total), sort_args)
+
+        results = await db.aql(query, bind_vars=bind_vars, total=await total.full_count())
+        results_total = await total.get(results['total'])
+        results = results['result']
+        next_cursor = get_next_cursor(sort_args, pop_cursor_values(results), len(results), limit)
+        results = await process_results(results)
 
         results_obj = {
             'skip': skip,
             'limit': limit,
-            'results_total': total,
-            'results': results
+            'results_total': results_total,
+            'results': results,
         }
+        # only sorted listings are paginated by cursor
+        if sort_args:
+            results_obj['next_cursor'] = next_cursor
 
         log_perf.debug(f'REST relation list resolver time: {(time.perf_counter() * 1000 - start):.2f} ms')
 
@@ -1036,7 +1256,7 @@ class RESTResolverEngine:
 
         start = time.perf_counter() * 1000
 
-        request.app.ctx.authorize(request, domain_class, 'create')
+        await request.app.ctx.authorize(request, domain_class, 'create')
 
         db = await get_arangodb()
         service_rpcs = await request.app.ctx.cache.get('service_rpcs', {})
@@ -1119,7 +1339,7 @@ class RESTResolverEngine:
         bind_vars = {
             '@collection': edge_collection,
         }
-        result = db.aql(query, bind_vars=bind_vars, trx_id=trx_id)
+        result = await db.aql(query, bind_vars=bind_vars, trx_id=trx_id)
         result = result['result'][0] if result['result'] else {}
 
         channel = f'post_create_rel_{domain_class}_{relation}'
@@ -1143,7 +1363,7 @@ class RESTResolverEngine:
 
         if rel_result:
             result = {k: v for k, v in result['new'].items() if k not in RESERVED_FIELDS}
-            rel_result = translate_output(rel_result, domain_spec.get(rel_class), self.db_schema)
+            rel_result = self.get_translator(domain, rel_class).output(rel_result)
             result = {**rel_result, '_edge': result}
         else:
             result = result['new']
@@ -1157,7 +1377,7 @@ class RESTResolverEngine:
 
         start = time.perf_counter() * 1000
 
-        request.app.ctx.authorize(request, domain_class, 'update')
+        await request.app.ctx.authorize(request, domain_class, 'update')
 
         db = await get_arangodb()
         service_rpcs = await request.app.ctx.cache.get('service_rpcs', {})
@@ -1212,7 +1432,7 @@ class RESTResolverEngine:
             '_from': f'{from_spec["resolver"]}/{from_key}',
             '_to': f'{to_spec["resolver"]}/{to_key}',
         }
-        results = db.aql(query, bind_vars=bind_vars, trx_id=trx_id)
+        results = await db.aql(query, bind_vars=bind_vars, trx_id=trx_id)
         results = results['result']
 
         if not results:
@@ -1251,7 +1471,7 @@ class RESTResolverEngine:
 
         start = time.perf_counter() * 1000
 
-        request.app.ctx.authorize(request, domain_class, 'delete')
+        await request.app.ctx.authorize(request, domain_class, 'delete')
 
         db = await get_arangodb()
 
@@ -1290,7 +1510,7 @@ class RESTResolverEngine:
             '_from': f'{from_spec["resolver"]}/{from_key}',
             '_to': f'{to_spec["resolver"]}/{to_key}'
         }
-        results = db.aql(query, bind_vars=bind_vars, trx_id=trx_id)
+        results = await db.aql(query, bind_vars=bind_vars, trx_id=trx_id)
         results = results['result']
 
         if not results:
@@ -1319,7 +1539,7 @@ class RESTResolverEngine:
         """Handler for graph traversal starting at the given node, returning direct neighbors only"""
         start = time.perf_counter() * 1000
 
-        request.app.ctx.authorize(request, domain_class, 'read')
+        await request.app.ctx.authorize(request, domain_class, 'read')
 
         db = await get_arangodb()
         domain_spec = self.domain_cache.get(domain, {})
@@ -1344,7 +1564,7 @@ class RESTResolverEngine:
             RETURN {{ node, edge }}
         ''')
         bind_vars = { '_id': arango_obj_id }
-        results = db.aql(query, bind_vars=bind_vars)
+        results = await db.aql(query, bind_vars=bind_vars)
         results = results['result']
 
         nodes = []
@@ -1362,7 +1582,7 @@ class RESTResolverEngine:
             if not node_class_spec:
                 continue
 
-            translated_node = translate_output(node, node_class_spec, self.db_schema)
+            translated_node = self.get_translator(domain, node_class).output(node)
             translated_node['_id'] = node_id
             nodes.append(translated_node)
 
@@ -1397,7 +1617,7 @@ class RESTResolverEngine:
 
         start = time.perf_counter() * 1000
 
-        request.app.ctx.authorize(request, domain_class, 'read')
+        await request.app.ctx.authorize(request, domain_class, 'read')
 
         db = await get_arangodb()
 
@@ -1406,6 +1626,7 @@ class RESTResolverEngine:
         # get alias class_spec
         op_class = class_spec.get('read_class', domain_class)
         class_spec = domain_spec.get(op_class, class_spec)
+        translator = self.get_translator(domain, op_class, domain_class)
         operations = class_spec.get('operations', OPERATIONS)
         triggers = class_spec.get('triggers', [])
 
@@ -1420,41 +1641,53 @@ class RESTResolverEngine:
 
         resolver = class_spec['resolver']
         attributes = {'created': 'created'}
-        sort = get_sort_string(request.args.getlist('sort', ['-created']), attributes)
+        sort_args = request.args.getlist('sort', ['-created'])
+        sort = get_sort_string(sort_args, attributes)
         skip = int(request.args.get('skip', 0))
         limit = int(request.args.get('limit', ARANGO_DEFAULT_LIMIT))
         edges = request.args.get('edges')
+        bind_vars = {'_id': f'{resolver}/{_key}'}
+
+        cursor = request.args.get('cursor')
+        cursor_filter, cursor_values = get_keyset(sort_args, attributes, cursor=bool(cursor))
+        if cursor:
+            bind_vars.update(get_cursor_bind_vars(cursor, sort_args))
 
         edge_filters = prettify_aql('''
         OR object.from_id == @_id
         OR object.to_id == @_id
         ''') if edges else ''
+        total = ResultsTotal(request, request.args.get('count'), 'audit_log', edge_filters, cursor_filter, bind_vars)
 
         query = prettify_aql(f'''
         WITH audit_log
         FOR object IN audit_log
             FILTER object.changed_id == @_id
                 {edge_filters}
+            {cursor_filter}
             {sort}
             LIMIT {skip}, {limit}
-            RETURN object
+            RETURN {with_cursor('object', cursor_values)}
         ''')
-        bind_vars = {'_id': f'{resolver}/{_key}'}
-        results = db.aql(query, bind_vars=bind_vars, total=True)
-        total = results['total']
+        results = await db.aql(query, bind_vars=bind_vars, total=await total.full_count())
+        results_total = await total.get(results['total'])
         results = results['result']
+        next_cursor = get_next_cursor(sort_args, pop_cursor_values(results), len(results), limit)
 
         for update in results:
-            update['pre'] = translate_output(update['pre'], class_spec, self.db_schema)
-            update['post'] = translate_output(update['post'], class_spec, self.db_schema)
+            update['pre'] = translator.output(update['pre'])
+            update['post'] = translator.output(update['post'])
 
         log_perf.debug(f'REST _changes resolver time: {(time.perf_counter() * 1000 - start):.2f} ms')
 
         results_obj = {
             'skip': skip,
             'limit': limit,
-            'results_total': total,
-            'results': results
+            'results_total': results_total,
+            'results': results,
         }
+        # only sorted listings are paginated by cursor
+        if sort_args:
+            results_obj['next_cursor'] = next_cursor
 
         return response.json(results_obj, 200)
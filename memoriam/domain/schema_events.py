@@ -0,0 +1,89 @@
+import time
+import asyncio
+import logging
+
+import ujson as json
+
+from memoriam.config import RELOAD_SCHEMAS
+
+
+logger = logging.getLogger('memoriam')
+
+SCHEMA_EVENTS_CHANNEL = 'memoriam_schema_events'
+RESUBSCRIBE_DELAY = 1
+
+
+async def publish_schema_change(redis, domain=None):
+    """Publish a schema change event, for all workers to rebuild their domain schemas"""
+    event = {'domain': domain, 'time': time.time()}
+    await redis.publish(SCHEMA_EVENTS_CHANNEL, json.dumps(event))
+
+
+class SchemaEvents:
+    """Extension to rebuild GraphQL schemas and REST specs in the background on
+       schema change events published through Redis, if RELOAD_SCHEMAS is set"""
+
+    def __init__(self, app):
+        self.app = app
+        self.listener = None
+        self.rebuilding = None
+        self.pending = False
+
+        if RELOAD_SCHEMAS:
+            app.register_listener(self.subscribe, 'after_server_start')
+            app.register_listener(self.unsubscribe, 'before_server_stop')
+
+    async def subscribe(self, app):
+        """Start listening for schema change events"""
+        self.listener = asyncio.create_task(self.listen())
+
+    async def unsubscribe(self, app):
+        """Stop listening for schema change events"""
+        for task in (self.listener, self.rebuilding):
+            if task and not task.done():
+                task.cancel()
+
+    async def listen(self):
+        """Listen for schema change events, resubscribing if the subscription ends or fails"""
+        resubscribed = False
+
+        while True:
+            try:
+                async with self.app.ctx.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(SCHEMA_EVENTS_CHANNEL)
+
+                    # events may have been missed while not subscribed
+                    if resubscribed:
+                        self.rebuild()
+
+                    async for message in pubsub.listen():
+                        if message['type'] == 'message':
+                            event = json.loads(message['data'])
+                            logger.debug(f'Schema change event for domain {event.get("domain")}')
+                            self.rebuild()
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f'Schema events subscription failed, resubscribing: {e}')
+
+            resubscribed = True
+            await asyncio.sleep(RESUBSCRIBE_DELAY)
+
+    def rebuild(self):
+        """Rebuild schemas in the background; events during a rebuild trigger one more rebuild"""
+        self.pending = True
+
+        if not self.rebuilding or self.rebuilding.done():
+            self.rebuilding = asyncio.create_task(self.rebuild_schemas())
+
+    async def rebuild_schemas(self):
+        """Rebuild REST specs and GraphQL schemas until no more events are pending.
+           Each domain is swapped in without yielding to requests in between"""
+        while self.pending:
+            self.pending = False
+            try:
+                await self.app.ctx.rest_engine.rebuild_schema(self.app)
+                await self.app.ctx.graphql_engine.rebuild_schema(self.app)
+            except Exception as e:
+                logger.exception(e)
@@ -5,9 +5,10 @@ from sanic import response
 
 from memoriam.arangodb import (
     get_arangodb, prettify_aql, get_relation_attributes,
-    get_filter_strings, get_all_collections, translate_output
+    get_filter_strings, get_all_collections
 )
-from memoriam.config import SEARCH_CONFIG_PATH, ARANGO_SCHEMA_PATH, ARANGO_DEFAULT_LIMIT
+from memoriam.config import SEARCH_CONFIG_PATH, ARANGO_DEFAULT_LIMIT
+from memoriam.domain.totals import ResultsTotal
 from memoriam.utils import load_yaml, clean_str
 
 
@@ -59,10 +60,10 @@ class ArangoSearch:
 async def cross_domain_search(request):
     """Handler for cross-domain search"""
 
-    db_schema = load_yaml(path=ARANGO_SCHEMA_PATH)
+    rest_engine = request.app.ctx.rest_engine
     db = await get_arangodb()
-    domain_cache = await request.app.ctx.cache.get('domain_cache')
-    merged_spec = {key: val for domain in domain_cache.values() for key, val in domain.items()}
+    merged_spec = {key: val for domain in rest_engine.domain_cache.values() for key, val in domain.items()}
+    translators = rest_engine.search_translators
 
     class_spec = {
         'resolver': 'search',
@@ -77,9 +78,10 @@ async def cross_domain_search(request):
     filters = get_filter_strings(request.args.getlist('filter', []), attributes, bind_vars)
     skip = int(request.args.get('skip', 0))
     limit = int(request.args.get('limit', ARANGO_DEFAULT_LIMIT))
+    total = ResultsTotal(request, request.args.get('count'), 'search', search_subset, filters, bind_vars)
 
     query = prettify_aql(f'''
-    WITH {get_all_collections(db_schema)}
+    WITH {get_all_collections(rest_engine.db_schema)}
     {search_subset}
     FOR object IN search
         {filters}
@@ -87,18 +89,16 @@ async def cross_domain_search(request):
         LIMIT {skip}, {limit}
         RETURN object
     ''')
-    results = db.aql(query, bind_vars=bind_vars, total=True)
-    total = results['total']
+    results = await db.aql(query, bind_vars=bind_vars, total=await total.full_count())
+    results_total = await total.get(results['total'])
     results = results['result']
 
-    results = [
-        translate_output(result, merged_spec.get(result.get('_class'), {}), db_schema)
-        for result in results
-    ]
+    # translators are compiled on schema rebuild
+    results = [translators.get(result.get('_class'), rest_engine.default_translator).output(result) for result in results]
     results_obj = {
         'skip': skip,
         'limit': limit,
-        'results_total': total,
+        'results_total': results_total,
         'results': results
     }
 
@@ -113,7 +113,7 @@ class ServiceInterface:
 
 async def service_status(request):
     """Lists connected services and their status"""
-    request.app.ctx.authorize(request, 'service', 'status')
+    await request.app.ctx.authorize(request, 'service', 'status')
 
     cache = request.app.ctx.cache
     service_info = await cache.get('service_info', {})
@@ -156,7 +156,7 @@ async def service_status(request):
 
 async def register_service(request):
     """Handler for registering services"""
-    request.app.ctx.authorize(request, 'service', 'register')
+    await request.app.ctx.authorize(request, 'service', 'register')
 
     data = request.json
 
@@ -200,7 +200,7 @@ async def register_service(request):
 
 async def unregister_service(request, service_name):
     """Handler for unregistering services"""
-    request.app.ctx.authorize(request, 'service', 'unregister')
+    await request.app.ctx.authorize(request, 'service', 'unregister')
 
     cache = request.app.ctx.cache
     service_info = await cache.get('service_info', {})
@@ -227,7 +227,7 @@ async def unregister_service(request, service_name):
 
 async def service_api_proxy(request, service_name, path):
     """Reverse proxy for service APIs"""
-    request.app.ctx.authorize(request, 'service', 'proxy')
+    await request.app.ctx.authorize(request, 'service', 'proxy')
 
     cache = request.app.ctx.cache
     service_apis = await cache.get('service_apis', {})
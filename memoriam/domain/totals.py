@@ -0,0 +1,55 @@
+import logging
+
+from graphql import GraphQLError
+from sanic.exceptions import BadRequest
+
+from memoriam.config import RESULTS_COUNT_DEFAULT, RESULTS_COUNT_CACHE_TTL
+from memoriam.utils import fingerprint
+
+
+logger = logging.getLogger('memoriam')
+
+COUNT_MODES = ('exact', 'cached', 'none')
+CACHE_PREFIX = 'results_total'
+
+
+def get_count_mode(count, ctx=None):
+    """Validate a results count mode, defaulting to RESULTS_COUNT_DEFAULT"""
+    count = count or RESULTS_COUNT_DEFAULT
+    if count not in COUNT_MODES:
+        error = f'Invalid count: {count}, must be one of {", ".join(COUNT_MODES)}'
+        logger.debug(error)
+        if ctx and ctx == 'GraphQL':
+            raise GraphQLError(error)
+        else:
+            raise BadRequest(error, status_code=400)
+    return count
+
+
+class ResultsTotal:
+    """Results total of a listing by count mode: exact counts the full result of the listing query
+       (fullCount), cached reuses an exact count cached per listing filters and bind variables
+       for RESULTS_COUNT_CACHE_TTL, counting exactly on a miss, and none does not count at all
+       (results_total is null)"""
+
+    def __init__(self, request, count, *filters, ctx=None):
+        self.request = request
+        self.mode = get_count_mode(count, ctx)
+        self.key = f'{CACHE_PREFIX}:{fingerprint(*filters)}' if self.mode == 'cached' else None
+        self.total = None
+
+    async def full_count(self):
+        """Whether the listing query should count its full result"""
+        if self.mode == 'cached':
+            self.total = await self.request.app.ctx.cache.get(self.key)
+            return self.total is None
+        return self.mode == 'exact'
+
+    async def get(self, full_count):
+        """Get the results total, given the full count of the listing query if it was counted"""
+        if self.mode == 'exact':
+            self.total = full_count
+        elif self.mode == 'cached' and self.total is None:
+            self.total = full_count
+            await self.request.app.ctx.cache.set(self.key, full_count, expire=RESULTS_COUNT_CACHE_TTL)
+        return self.total
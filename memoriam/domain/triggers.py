@@ -2,13 +2,11 @@ import asyncio
 import logging
 from functools import partial
 
-import httpx
 import ujson as json
 
 from memoriam.config import (
-    AUTHLY_SERVICENAME, AUDIT_LOG, AUDIT_LOG_DB, AUDIT_VERSIONING,
-    ARANGO_CONNECT_RETRIES, ARANGO_CONNECT_BACKOFF, ARANGO_DB_NAME,
-    STORAGE_SCHEME, STORAGE_HOST, STORAGE_PORT, CA_FILE
+    AUDIT_LOG, AUDIT_LOG_DB, AUDIT_VERSIONING,
+    ARANGO_CONNECT_RETRIES, ARANGO_CONNECT_BACKOFF
 )
 from memoriam.arangodb import get_arangodb, get_diffs, prettify_aql
 from memoriam.utils import iso8601_now, get_user_id, task_handler
@@ -57,7 +55,7 @@ async def audit(pre, post, request, edge=False, note=None):
         IN audit_log
         RETURN NEW
         ''')
-        result = db.aql(query)
+        result = await db.aql(query)
         result = result['result'][0] if result['result'] else {}
 
         if post and AUDIT_VERSIONING:
@@ -76,6 +74,40 @@ async def audit(pre, post, request, edge=False, note=None):
     return data
 
 
+async def audit_batch(changes, request, edge=False):
+    """Generate audit log entries for a batch of (pre, post, note) changes,
+       and write them to log, database in one bulk write"""
+    await asyncio.sleep(0)
+
+    audit_logs = [generate_audit(pre, post, request, edge, note) for pre, post, note in changes]
+    audit_logs = [audit_log for audit_log in audit_logs if audit_log]
+
+    if AUDIT_LOG:
+        for audit_log in audit_logs:
+            log_audit.info(f'Audit: {audit_log}')
+
+    if not AUDIT_LOG_DB or not audit_logs:
+        return audit_logs
+
+    db = await get_arangodb()
+    results = await db.bulk_create('audit_log', audit_logs)
+    results = [result['new'] for result in results if 'new' in result]
+
+    versioned = [result for result in results if result['operation'] != 'delete']
+    if versioned and AUDIT_VERSIONING:
+        trx_id = request.headers.get('x-arango-trx-id')
+        if trx_id:
+            # defer version updates until transaction is done
+            coro = partial(defer_update_versions, versioned, trx_id)
+            task = request.app.add_task(coro)
+            task.add_done_callback(task_handler)
+        else:
+            # no transaction, update versions
+            await update_versions(versioned)
+
+    return results
+
+
 def generate_audit(pre, post, request, edge, note):
     """Generate structure for audit log"""
     pre_diff, post_diff = get_diffs(pre, post)
@@ -107,19 +139,21 @@ def generate_audit(pre, post, request, edge, note):
 
 
 async def defer_update_version(audit_log, trx_id):
-    """Audit task – wait for transaction to complete before running update_version"""
+    """Audit task – wait for transaction to complete before updating the version of one object"""
+    await defer_update_versions([audit_log], trx_id)
+
+
+async def defer_update_versions(audit_logs, trx_id):
+    """Audit task – wait for transaction to complete before running update_versions"""
+    db = await get_arangodb()
+
     for _ in range(ARANGO_CONNECT_RETRIES):
 
-        url = f'{STORAGE_SCHEME}://{STORAGE_HOST}:{STORAGE_PORT}/_db/{ARANGO_DB_NAME}/_api/transaction/{trx_id}'
-        headers = {
-            'x-authly-entity-id': AUTHLY_SERVICENAME,
-            'x-authly-entity-type': 'Service',
-        }
-        response = httpx.get(url, headers=headers, verify=CA_FILE)
-        status = response.json().get('result', {}).get('status')
+        response = await db.read_transaction(trx_id)
+        status = response.get('result', {}).get('status')
 
         if status == 'committed':
-            await update_version(audit_log)
+            await update_versions(audit_logs)
             break
 
         if status == 'aborted':
@@ -128,9 +162,10 @@ async def defer_update_version(audit_log, trx_id):
         await asyncio.sleep(ARANGO_CONNECT_BACKOFF)
 
     else:
-        obj_id = audit_log.get('changed_id')
-        audit_id = audit_log.get('_id')
-        log_error.error(f'Transaction {trx_id} did not complete while deferring update of _version of {obj_id} to "{audit_id}"')
+        for audit_log in audit_logs:
+            obj_id = audit_log.get('changed_id')
+            audit_id = audit_log.get('_id')
+            log_error.error(f'Transaction {trx_id} did not complete while deferring update of _version of {obj_id} to "{audit_id}"')
 
 
 async def update_version(audit_log):
@@ -142,4 +177,17 @@ async def update_version(audit_log):
     UPDATE "{_key}" WITH {{"_version": "{audit_log['_id']}"}}
     IN {collection}
     ''')
-    db.aql(query)
+    await db.aql(query)
+
+
+async def update_versions(audit_logs):
+    """Audit task – update version fields with audit log _ids, one bulk update per collection"""
+    db = await get_arangodb()
+    versions = {}
+
+    for audit_log in audit_logs:
+        collection, _key = audit_log['changed_id'].split('/', 1)
+        versions.setdefault(collection, []).append({'_key': _key, '_version': audit_log['_id']})
+
+    for collection, data in versions.items():
+        await db.bulk_update(collection, data, new=False, old=False)
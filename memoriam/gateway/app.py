@@ -25,7 +25,7 @@ from memoriam.config import (
 )
 from memoriam.authly import AuthlyClient
 from memoriam.compress import Compress
-from memoriam.proxy import get_reverse_proxy, get_ws_reverse_proxy
+from memoriam.proxy import get_reverse_proxy, get_ws_reverse_proxy, close_proxy_clients
 from memoriam.gateway.auth import get_session_middleware
 from memoriam.gateway.onto import get_service, get_logo, post_logo
 from memoriam.utils import LoggingErrorHandler
@@ -74,6 +74,8 @@ def init_app():
 
     AuthlyClient(app)
 
+    app.register_listener(close_proxy_clients, 'after_server_stop')
+
     app.add_route(typing.cast(RouteHandler, lambda request: redirect('/onto')), '/')
     app.add_route(lambda request: file('./onto/index.html'), '/onto')
     app.static('/onto', './onto')
@@ -94,12 +96,12 @@ def init_app():
 
     domain_url = f'{DOMAIN_SCHEME}://{DOMAIN_HOST}:{DOMAIN_PORT}'
     app.add_websocket_route(get_ws_reverse_proxy(domain_url), '/system/api/ws/<path:path>')
-    app.add_route(get_reverse_proxy(domain_url, 'Gateway'), '/<path:path>', methods=methods)
+    app.add_route(get_reverse_proxy(domain_url, 'Gateway', stream=True), '/<path:path>', methods=methods, stream=True)
 
     storage_url = f'{STORAGE_SCHEME}://{STORAGE_HOST}:{STORAGE_PORT}'
-    app.add_route(get_reverse_proxy(storage_url + '/system/api/storage', 'Gateway'), '/system/api/storage/<path:path>', methods=methods)
+    app.add_route(get_reverse_proxy(storage_url + '/system/api/storage', 'Gateway', stream=True), '/system/api/storage/<path:path>', methods=methods, stream=True)
     app.add_route(get_reverse_proxy(storage_url + '/redis', 'Gateway'), '/redis/<path:path>', methods=methods)
-    app.add_route(get_reverse_proxy(storage_url + '/minio', 'Gateway'), '/minio/<path:path>', methods=methods)
+    app.add_route(get_reverse_proxy(storage_url + '/minio', 'Gateway', stream=True), '/minio/<path:path>', methods=methods, stream=True)
     app.add_route(get_reverse_proxy(storage_url + '/_db', 'Gateway'), '/_db/<path:path>', methods=methods)
     app.add_route(get_reverse_proxy(storage_url + '/_api', 'Gateway'), '/_api/<path:path>', methods=methods)
     app.add_route(get_reverse_proxy(storage_url + '/_admin', 'Gateway'), '/_admin/<path:path>', methods=methods)
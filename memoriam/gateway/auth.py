@@ -1,12 +1,16 @@
 import logging
 import re
 import time
+import hashlib
+from base64 import urlsafe_b64decode
 
 import httpx
+import ujson as json
 
 from sanic.exceptions import SanicException, Unauthorized
 
-from memoriam.config import NO_AUTH, CA_FILE, AUTHLY_HOST, AUTHLY_PORT
+from memoriam.config import NO_AUTH, AUTHLY_HOST, AUTHLY_PORT, SESSION_CACHE_TTL
+from memoriam.proxy import get_proxy_client
 from memoriam.utils import scrub_headers
 
 
@@ -37,6 +41,52 @@ AUTH_DENYLIST = [
     r'/authly/api/docs/.*',
 ]
 
+AUTH_ALLOW_PATTERN = re.compile('|'.join(f'(?:{pattern})' for pattern in AUTH_ALLOWLIST))
+AUTH_DENY_PATTERN = re.compile('|'.join(f'(?:{pattern})' for pattern in AUTH_DENYLIST))
+
+SESSION_CACHE_PREFIX = 'memoriam_session'
+
+
+def session_cache_key(request):
+    """Cache key for a session, by hash of authorization header and session cookie"""
+    credentials = f'{request.headers.get("authorization", "")}\n{request.cookies.get("session-cookie", "")}'
+    return f'{SESSION_CACHE_PREFIX}:{hashlib.sha256(credentials.encode()).hexdigest()}'
+
+
+def session_cache_ttl(request):
+    """Cache TTL for a session, bounded by the expiry of its JWT tokens (if readable)"""
+    tokens = [
+        request.headers.get('authorization', '').removeprefix('Bearer').strip(),
+        request.cookies.get('session-cookie', ''),
+    ]
+    ttl = SESSION_CACHE_TTL
+
+    for token in tokens:
+        try:
+            payload = token.split('.')[1]
+            claims = json.loads(urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+            ttl = min(ttl, int(claims['exp'] - time.time()))
+        except (IndexError, ValueError, KeyError, TypeError):
+            pass
+
+    return ttl
+
+
+def get_session_headers(profile):
+    """Get entity request headers from an Authly session profile"""
+    headers = {
+        'x-authly-eid': str(profile.get('entityID', '')),
+        'x-authly-entity-type': profile.get('entityType', ''),
+    }
+
+    if headers['x-authly-entity-type'] == 'Service':
+        headers['x-authly-entity-id'] = profile.get('serviceName', '')
+
+    elif headers['x-authly-entity-type'] == 'User':
+        headers['x-authly-entity-id'] = profile.get('username', '')
+
+    return headers
+
 
 def get_session_middleware(auth_url):
     """Get session middleware for auth service"""
@@ -48,41 +98,53 @@ def get_session_middleware(auth_url):
         if NO_AUTH:
             return
 
-        if any([re.fullmatch(pattern, request.path) for pattern in AUTH_DENYLIST]):
+        if AUTH_DENY_PATTERN.fullmatch(request.path):
             raise Unauthorized('No authorization header or session-cookie', 401)
 
-        if any([re.fullmatch(pattern, request.path) for pattern in AUTH_ALLOWLIST]):
+        if AUTH_ALLOW_PATTERN.fullmatch(request.path):
             return
 
         if ('session-cookie' not in request.cookies and
             'authorization' not in request.headers):
             raise Unauthorized('No authorization header or session-cookie', 401)
 
-        pre_proxy = time.perf_counter() * 1000
+        redis = getattr(request.app.ctx, 'redis', None)
+        cache_key = session_cache_key(request)
 
-        async with httpx.AsyncClient(http2=True, verify=CA_FILE) as httpx_client:
+        if redis and SESSION_CACHE_TTL > 0:
             try:
-                proxy_response = await httpx_client.get(
-                    f'{auth_url}/auth/session',
-                    headers=scrub_headers(request.headers),
-                    cookies=dict(request.cookies)
-                )
-            except httpx.RequestError as e:
-                raise SanicException(f'Error while requesting {e.request.url}: {e}') from None
+                cached = await redis.get(cache_key)
+            except Exception as e:
+                logger.warning(f'Session cache unavailable: {e}')
+                cached = None
 
-            log_perf.debug(f'Authly response time: {(time.perf_counter() * 1000 - pre_proxy):.2f} ms')
+            if cached:
+                request.headers.update(json.loads(cached))
+                return
 
-            if proxy_response.status_code != 200:
-                raise Unauthorized('Invalid or outdated session', 401)
+        pre_proxy = time.perf_counter() * 1000
+
+        try:
+            proxy_response = await get_proxy_client(auth_url).get(
+                f'{auth_url}/auth/session',
+                headers=scrub_headers(request.headers)
+            )
+        except httpx.RequestError as e:
+            raise SanicException(f'Error while requesting {e.request.url}: {e}') from None
 
-        profile = proxy_response.json().get('profile', {})
-        request.headers['x-authly-eid'] = str(profile.get('entityID', ''))
-        request.headers['x-authly-entity-type'] = profile.get('entityType', '')
+        log_perf.debug(f'Authly response time: {(time.perf_counter() * 1000 - pre_proxy):.2f} ms')
 
-        if request.headers['x-authly-entity-type'] == 'Service':
-            request.headers['x-authly-entity-id'] = profile.get('serviceName', '')
+        if proxy_response.status_code != 200:
+            raise Unauthorized('Invalid or outdated session', 401)
 
-        elif request.headers['x-authly-entity-type'] == 'User':
-            request.headers['x-authly-entity-id'] = profile.get('username', '')
+        headers = get_session_headers(proxy_response.json().get('profile', {}))
+        request.headers.update(headers)
+
+        ttl = session_cache_ttl(request)
+        if redis and ttl > 0:
+            try:
+                await redis.set(cache_key, json.dumps(headers), ex=ttl)
+            except Exception as e:
+                logger.warning(f'Session cache unavailable: {e}')
 
     return session_middleware
@@ -78,7 +78,7 @@ async def list_resources(request, domain_key):
     RETURN DOCUMENT(@_id)
     ''')
     bind_vars = {'_id': f'domain/{domain_key}'}
-    result = db.aql(query, bind_vars=bind_vars)
+    result = await db.aql(query, bind_vars=bind_vars)
     result = result['result'][0] if result['result'] else {}
 
     if not result:
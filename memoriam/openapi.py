@@ -49,6 +49,7 @@ class OpenAPI:
         self.validation_schema = load_yaml(path=validation_schema_path)
 
         self.validators = {}
+        self.route_validators = {}
 
         self.init_spec(namespace)
 
@@ -77,6 +78,9 @@ class OpenAPI:
 
         jsrs.JSONSchema(self.validation_schema).validate(self.specs[namespace])
 
+        self.route_validators.clear()
+        resolved = {}
+
         for path, path_spec in self.specs[namespace]['paths'].items():
 
             full_path = self.base_url + path.replace('{', '<').replace('}', '>')
@@ -92,9 +96,9 @@ class OpenAPI:
                     operation_params = method_spec.get('parameters', [])
 
                     validator_id = f'{full_path}:{method}'
-                    self.validators[validator_id] = {}
-                    self.validators[validator_id]['request_body'] = request_body
-                    self.validators[validator_id]['parameters'] = shared_params + operation_params
+                    self.validators[validator_id] = self.compile_validator(
+                        shared_params + operation_params, request_body, namespace, resolved
+                    )
 
                     if added_spec or not operation_id:  # stop here
                         continue
@@ -112,6 +116,16 @@ class OpenAPI:
         log_perf.debug(f'Rebuild OpenAPI spec time: {(time.perf_counter() * 1000 - start):.2f} ms')
         logger.debug(f'Rebuilt OpenAPI spec {namespace}{added_info}.')
 
+    def remove_spec(self, namespace):
+        """Remove the spec of a namespace, with its compiled validators"""
+        self.specs.pop(namespace, None)
+
+        prefix = self.base_url.replace('<namespace>', namespace) + '/'
+        for validator_id in [validator_id for validator_id in self.validators if validator_id.startswith(prefix)]:
+            del self.validators[validator_id]
+
+        self.route_validators.clear()
+
     async def openapi_spec(self, request, namespace=''):
         """Serve the OpenAPI spec"""
         if not namespace:
@@ -138,23 +152,47 @@ class OpenAPI:
         index = self.template.render(spec_url=spec_url)
         return html(index)
 
-    async def request_validator(self, request):
-        """Resolve and jsonschema.validate rules given in OpenAPI spec"""
-        namespace = ''
-        if request.path:
-            segments = request.path.split('/')
-            if len(segments) > 1:
-                namespace = segments[1]
+    def compile_validator(self, parameters, request_body, namespace='default', resolved=None):
+        """Resolve $refs and compile jsonschema validators for parameters and request body"""
+        compiled_parameters = []
+        for parameter in parameters:
+            parameter = self.ref_resolver(parameter, namespace, resolved)
+            param_schema = parameter.get('schema') or {}
+            compiled_parameters.append({
+                'in': parameter['in'],
+                'name': parameter['name'],
+                'required': parameter.get('required', False),
+                'type': param_schema.get('type'),
+                'validator': jsrs.JSONSchema(param_schema) if param_schema else None,
+            })
+
+        request_body = self.ref_resolver(request_body, namespace, resolved)
+        json_schema = request_body.get('content', {}).get('application/json', {}).get('schema')
+
+        return {
+            'request_body': request_body,
+            'parameters': compiled_parameters,
+            'body_validator': jsrs.JSONSchema(json_schema) if json_schema else None,
+        }
+
+    def get_validator(self, request):
+        """Get the compiled validator for a request, by route and route parameters"""
+        router_params = request.match_info
+        route_id = (
+            request.route.path if request.route else request.path,
+            request.method,
+            router_params.get('domain'),
+            router_params.get('domain_class'),
+            router_params.get('relation'),
+        )
 
-        if not namespace or namespace == 'api':
-            namespace = 'default'
+        if route_id in self.route_validators:
+            return self.route_validators[route_id]
 
-        router_params = request.match_info
         validator_id = f'{request.path}:{request.method.lower()}'
         validator = self.validators.get(validator_id)
 
-        # hack for accessing the right validator for RESTResolverEngine
-        # TODO: not optimal
+        # generic routes for RESTResolverEngine share a route, but not a validator
         if self.app.name == 'memoriam-domain' and not validator:
             validator_id = ''
             if 'domain' in router_params:
@@ -168,77 +206,92 @@ class OpenAPI:
             validator_id += f':{request.method.lower()}'
             validator = self.validators.get(validator_id)
 
-        if validator:
-            parameters = validator.get('parameters')
-            request_body = validator.get('request_body')
-            content = request_body.get('content', {})
-
-            for parameter in parameters:
-                parameter = self.ref_resolver(parameter, namespace)
-
-                param_source = {}
-                if parameter['in'] == 'path':
-                    param_source = router_params
-                elif parameter['in'] == 'query':
-                    param_source = request.args
-                elif parameter['in'] == 'header':
-                    param_source = request.headers
-
-                param_in = parameter['in'].title()
-                param_name = parameter['name']
-                param_value = param_source.get(param_name)
-                param_schema = parameter.get('schema')
-                param_type = param_schema.get('type')
-
-                if parameter.get('required') and not param_value:
-                    error_msg = f'{param_in} parameter {param_name} required, but not given'
-                    logger.debug(error_msg)
-                    raise InvalidUsage(error_msg, 400)
-
-                if param_value and param_schema:
-                    try:
-                        if param_type == 'integer':
-                            param_value = int(param_value)
-                        elif param_type == 'number':
-                            param_value = Decimal(param_value)
-                        elif param_type == 'boolean':
-                            param_value = param_value in ('true', 'yes', '1')
-                        jsrs.JSONSchema(param_schema).validate(param_value)
-
-                    except ValueError:
-                        error_msg = f"'{param_name}'' is not of type '{param_type}'"
-                        logger.debug(error_msg)
-                        raise InvalidUsage(error_msg, 400) from None
-
-            if request_body.get('required') and not request.body:
-                error_msg = 'Request body required, but not given'
+        # unknown domains or classes are not remembered
+        if validator or not router_params:
+            self.route_validators[route_id] = validator
+
+        return validator
+
+    async def request_validator(self, request):
+        """Validate request parameters and body against compiled OpenAPI spec rules"""
+        validator = self.get_validator(request)
+        if not validator:
+            return
+
+        start = time.perf_counter() * 1000
+        router_params = request.match_info
+
+        for parameter in validator['parameters']:
+            param_source = {}
+            if parameter['in'] == 'path':
+                param_source = router_params
+            elif parameter['in'] == 'query':
+                param_source = request.args
+            elif parameter['in'] == 'header':
+                param_source = request.headers
+
+            param_name = parameter['name']
+            param_type = parameter['type']
+            param_value = param_source.get(param_name)
+
+            if parameter['required'] and not param_value:
+                error_msg = f'{parameter["in"].title()} parameter {param_name} required, but not given'
                 logger.debug(error_msg)
                 raise InvalidUsage(error_msg, 400)
 
-            json_schema = content.get('application/json', {}).get('schema', {})
-            json_schema = self.ref_resolver(json_schema, namespace)
-            if json_schema:
+            if param_value and parameter['validator']:
                 try:
-                    jsrs.JSONSchema(json_schema).validate(request.json)
-                except jsrs.ValidationError as error:
-                    logger.debug(str(error))
-                    raise InvalidUsage(str(error), 400) from None
+                    if param_type == 'integer':
+                        param_value = int(param_value)
+                    elif param_type == 'number':
+                        param_value = Decimal(param_value)
+                    elif param_type == 'boolean':
+                        param_value = param_value in ('true', 'yes', '1')
+                    parameter['validator'].validate(param_value)
+
+                except ValueError:
+                    error_msg = f"'{param_name}'' is not of type '{param_type}'"
+                    logger.debug(error_msg)
+                    raise InvalidUsage(error_msg, 400) from None
 
-    def ref_resolver(self, ref, namespace='default'):
-        """Resolve internal $refs if found in parameter or schema"""
-        if 'items' in ref:
-            ref['items'] = self.ref_resolver(ref['items'], namespace)
+        if validator['request_body'].get('required') and not request.body:
+            error_msg = 'Request body required, but not given'
+            logger.debug(error_msg)
+            raise InvalidUsage(error_msg, 400)
 
-        for poly in ('oneOf', 'allOf', 'anyOf'):
-            if poly in ref:
-                ref[poly] = [self.ref_resolver(item, namespace) for item in ref[poly]]
+        if validator['body_validator']:
+            try:
+                validator['body_validator'].validate(request.json)
+            except jsrs.ValidationError as error:
+                logger.debug(str(error))
+                raise InvalidUsage(str(error), 400) from None
 
-        if '$ref' not in ref:
+        log_perf.debug(f'Request validation time: {(time.perf_counter() * 1000 - start):.2f} ms')
+
+    def ref_resolver(self, ref, namespace='default', resolved=None, stack=()):
+        """Recursively resolve internal $refs in parameter or schema, without modifying the spec.
+           Circular $refs are replaced by an empty schema"""
+        if resolved is None:
+            resolved = {}
+
+        if isinstance(ref, list):
+            return [self.ref_resolver(item, namespace, resolved, stack) for item in ref]
+
+        if not isinstance(ref, dict):
             return ref
 
-        _, *path = ref['$ref'].split('/')
-        data = self.specs[namespace]
-        for item in path:
-            data = data[item]
+        if '$ref' not in ref:
+            return {key: self.ref_resolver(value, namespace, resolved, stack) for key, value in ref.items()}
+
+        pointer = ref['$ref']
+        if pointer in stack:
+            return {}
+
+        if pointer not in resolved:
+            _, *path = pointer.split('/')
+            data = self.specs[namespace]
+            for item in path:
+                data = data[item]
+            resolved[pointer] = self.ref_resolver(data, namespace, resolved, (*stack, pointer))
 
-        return data
+        return resolved[pointer]
@@ -2,6 +2,8 @@ import asyncio
 import time
 import logging
 
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+
 import httpx
 from httpx_ws import aconnect_ws, WebSocketDisconnect
 from websockets.exceptions import ConnectionClosed
@@ -11,47 +13,161 @@ from sanic import Websocket
 from sanic.exceptions import SanicException
 from sanic.response import raw
 
-from memoriam.config import CA_FILE, REQUEST_TIMEOUT, WEBSOCKET_LOOP_TIMEOUT, WEBSOCKET_PING_INTERVAL, WEBSOCKET_PING_TIMEOUT
+from memoriam.compress import get_stream_compressor
+from memoriam.config import CA_FILE, REQUEST_TIMEOUT, COMPRESS_EXECUTOR_MIN_SIZE, WEBSOCKET_LOOP_TIMEOUT, WEBSOCKET_PING_INTERVAL, WEBSOCKET_PING_TIMEOUT
 from memoriam.utils import scrub_headers
 
 
 logger = logging.getLogger('memoriam')
 log_perf = logging.getLogger('memoriam.perf')
 
+_clients = {}
 
-def get_reverse_proxy(base_url, name):
-    """Get a reverse proxy handler for the given base path"""
 
-    async def reverse_proxy(request, path=None):
-        """Reverse proxy handler for requests routed through gateway"""
-        url = f'{base_url}'
-        if path:
-            url += f'/{path}'
-        if request.query_string:
-            url += f'?{request.query_string}'
+def get_proxy_client(base_url, limits=None):
+    """Get the pooled client for the upstream of base_url, one per upstream for the worker's lifetime"""
+    upstream = httpx.URL(base_url).copy_with(path='/', query=None)
+    key = str(upstream)
+
+    if key not in _clients:
+        # cookies are forwarded as headers, never shared between requests
+        cookies = CookieJar(policy=DefaultCookiePolicy(allowed_domains=[]))
+        _clients[key] = httpx.AsyncClient(
+            http2=True,
+            verify=CA_FILE,
+            timeout=REQUEST_TIMEOUT,
+            limits=limits or httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            cookies=cookies
+        )
+
+    return _clients[key]
 
-        pre_proxy = time.perf_counter() * 1000
 
-        async with httpx.AsyncClient(verify=CA_FILE, timeout=REQUEST_TIMEOUT) as client:
-            try:
-                proxy_response = await client.request(
-                    method=request.method,
-                    url=url,
-                    content=request.body,
-                    headers=scrub_headers(request.headers),
-                    cookies=dict(request.cookies)
-                )
-            except httpx.RequestError as e:
-                raise SanicException(f'Error while requesting {e.request.url}: {e}') from None
+async def close_proxy_clients(app=None):
+    """Close all pooled proxy clients"""
+    for client in _clients.values():
+        await client.aclose()
+    _clients.clear()
 
-        log_perf.debug(f'{name} reverse proxy response time: {(time.perf_counter() * 1000 - pre_proxy):.2f} ms')
 
+async def request_content(request):
+    """Read a streamed request body chunk by chunk"""
+    while True:
+        chunk = await request.stream.read()
+        if chunk is None:
+            break
+        yield chunk
+
+
+def build_upstream_request(request, client, url, headers, stream=False):
+    """Build the upstream request, streaming the request body if stream=True"""
+    content = request.body
+
+    if stream:
+        content = None
+        if 'content-length' in request.headers or 'transfer-encoding' in request.headers:
+            content = request_content(request)
+        # passing content-length avoids chunked transfer upstream
+        if 'content-length' in request.headers:
+            headers['content-length'] = request.headers['content-length']
+
+    return client.build_request(
+        method=request.method,
+        url=url,
+        content=content,
+        headers=headers
+    )
+
+
+async def send_downstream(request, proxy_response, name, stream=False, compress=False):
+    """Return the upstream response, or stream it chunk by chunk if stream=True.
+       With compress=True, streamed responses are compressed incrementally (see memoriam.compress)"""
+    if not stream:
         return raw(
             body=proxy_response.content,
             status=proxy_response.status_code,
             headers=dict(scrub_headers(proxy_response.headers))
         )
 
+    try:
+        headers = dict(scrub_headers(proxy_response.headers))
+        chunks = proxy_response.aiter_raw()
+        first_chunk = b''
+        compressor = None
+
+        # the first chunk tells if the payload is already compressed
+        if compress:
+            first_chunk = await anext(chunks, b'')
+            compressor = get_stream_compressor(request, proxy_response.status_code, headers, first_chunk)
+
+        response = await request.respond(status=proxy_response.status_code, headers=headers)
+
+        # response.send waits for the client to drain, applying backpressure upstream
+        if first_chunk:
+            await send_chunk(response, first_chunk, compressor)
+        async for chunk in chunks:
+            await send_chunk(response, chunk, compressor)
+        if compressor:
+            await send_chunk(response, compressor.flush())
+
+        await response.eof()
+    except httpx.StreamError as e:
+        logger.error(f'{name} reverse proxy stream interrupted: {e}')
+    finally:
+        await proxy_response.aclose()
+
+
+async def send_chunk(response, chunk, compressor=None):
+    """Send a chunk of a streamed response, compressing it if given a compressor"""
+    if compressor and len(chunk) >= COMPRESS_EXECUTOR_MIN_SIZE:
+        loop = asyncio.get_running_loop()
+        chunk = await loop.run_in_executor(None, compressor.compress, chunk)
+    elif compressor:
+        chunk = compressor.compress(chunk)
+    if chunk:
+        await response.send(chunk)
+
+
+async def proxy_request(request, client, url, headers, name, stream=False, compress=False):
+    """Send request upstream to url and return the response.
+       With stream=True, request and response bodies are streamed instead of buffered,
+       the route must then be added with stream=True"""
+    pre_proxy = time.perf_counter() * 1000
+
+    upstream_request = build_upstream_request(request, client, url, headers, stream)
+
+    try:
+        proxy_response = await client.send(upstream_request, stream=stream)
+    except httpx.RequestError as e:
+        raise SanicException(f'Error while requesting {e.request.url}: {e}') from None
+
+    log_perf.debug(f'{name} reverse proxy response time: {(time.perf_counter() * 1000 - pre_proxy):.2f} ms')
+
+    response = await send_downstream(request, proxy_response, name, stream, compress)
+
+    if stream:
+        log_perf.debug(f'{name} reverse proxy stream time: {(time.perf_counter() * 1000 - pre_proxy):.2f} ms')
+
+    return response
+
+
+def get_reverse_proxy(base_url, name, stream=False):
+    """Get a reverse proxy handler for the given base path, optionally streaming (see proxy_request).
+       Streamed responses are compressed as they are proxied."""
+
+    async def reverse_proxy(request, path=None):
+        """Reverse proxy handler for requests routed through gateway"""
+        url = f'{base_url}'
+        if path:
+            url += f'/{path}'
+        if request.query_string:
+            url += f'?{request.query_string}'
+
+        client = get_proxy_client(base_url)
+        headers = scrub_headers(request.headers)
+
+        return await proxy_request(request, client, url, headers, name, stream, compress=True)
+
     return reverse_proxy
 
 
@@ -25,7 +25,7 @@ class AccessControlGuard(AuthlyClient):
         if not NO_AC:
             app.add_route(self.resolve, '/system/api/resolve')
 
-    def access_middleware(self, request):
+    async def access_middleware(self, request):
         """"Middleware" for validating against Authly access policies"""
         start = time.perf_counter() * 1000
 
@@ -39,18 +39,23 @@ class AccessControlGuard(AuthlyClient):
         name = request.headers.get('x-authly-entity-id')
         type_ = request.headers.get('x-authly-entity-type')
 
-        response = self.service_request('post', f'{AUTHLY_URL}/service/resource/{resource}/resolve/{eid}/{action}')
+        async def resolve():
+            response = await self.async_service_request('post', f'{AUTHLY_URL}/service/resource/{resource}/resolve/{eid}/{action}')
+            decision = response.json()[0]
+            logger.debug(f'{type_} {name} attempting "{action}" on {resource}... {decision}')
+            return decision == 'ALLOW'
 
-        logger.debug(f'{type_} {name} attempting "{action}" on {resource}... {response.json()[0]}')
+        key = self.decision_key(request, resource, action)
+        allowed = await self.cached_decision(key, resolve)
 
         log_perf.debug(f'Access resolver time: {(time.perf_counter() * 1000 - start):.2f} ms')
 
-        if response.json()[0] == 'ALLOW':
+        if allowed:
             return
         else:
             raise SanicException('Unauthorized', status_code=401)
 
-    def authorize(self, request, resource='', action=''):
+    async def authorize(self, request, resource='', action=''):
         """Authorize action on resource for given request against self"""
         if NO_AUTH or NO_AC:
             return
@@ -61,12 +66,13 @@ class AccessControlGuard(AuthlyClient):
             'x-authly-resource': resource,
             'x-authly-action': action,
         })
-        self.access_middleware(request)
-
-        request.headers = headers
+        try:
+            await self.access_middleware(request)
+        finally:
+            request.headers = headers
 
     async def resolve(self, request):
         """Allows explicitly calling self.access_middleware()"""
-        self.access_middleware(request)
+        await self.access_middleware(request)
 
         return empty(200)
@@ -48,6 +48,14 @@ def init_app():
     app.error_handler = LoggingErrorHandler()
     app.blueprint(api)
 
+    app.ctx.redis = Redis(
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        db=REDIS_DATABASE,
+        password=REDIS_PASSWORD,
+        ssl=REDIS_TLS
+    )
+
     if hasattr(app.ctx, 'init'):
         return app
 
@@ -70,7 +78,15 @@ def init_app():
 
 @api.get('/health')
 async def health(request):
-    return json('Ok')
+    """Health check endpoint, including load balancing state for ArangoDB hosts"""
+    arango_proxy = getattr(request.app.ctx, 'arango_proxy', None)
+    if not arango_proxy:
+        return json('Ok')
+
+    return json({
+        'status': 'Ok',
+        'ArangoDB': arango_proxy.balancer.status(),
+    })
 
 
 @api.get('/redis/health')
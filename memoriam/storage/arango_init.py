@@ -4,7 +4,7 @@ from pathlib import Path
 import ujson as json
 import jsonschema_rs as jsrs
 
-from memoriam.arangodb import get_arangodb, prettify_aql
+from memoriam.arangodb import connect_arangodb, prettify_aql
 from memoriam.config import (
     AUDIT_LOG_DB, ARANGO_HOST, ARANGO_HOSTS, ARANGO_PORT, ARANGO_SCHEME,
     ARANGO_ROOT_USERNAME, ARANGO_ROOT_PASSWORD,
@@ -53,35 +53,35 @@ class ArangoInit:
 
     async def init_arangodb(self, app):
         """Initialize ArangoDB, create database, collections and indexes"""
-        db = await get_arangodb(hosts=self.hosts, auth=self.auth)
+        db = await connect_arangodb(hosts=self.hosts, auth=self.auth)
 
         # init Domain metadata database and collections
-        if not db.has_database(ARANGO_DOMAIN_DB_NAME):
-            db.create_database(ARANGO_DOMAIN_DB_NAME)
+        if not await db.has_database(ARANGO_DOMAIN_DB_NAME):
+            await db.create_database(ARANGO_DOMAIN_DB_NAME)
             logger.info(f'Created database {ARANGO_DOMAIN_DB_NAME}')
 
-        db.db_name = ARANGO_DOMAIN_DB_NAME
+        db = await connect_arangodb(hosts=self.hosts, db_name=ARANGO_DOMAIN_DB_NAME, auth=self.auth)
 
         schema = load_yaml(path=ARANGO_DOMAIN_SCHEMA_PATH)
         db_validation_schema = load_yaml(path=Path(ROOT_PATH, 'data', 'db_schema_validation_schema.yml').resolve())
         jsrs.JSONSchema(db_validation_schema).validate(schema)
 
         for collection in schema['collections']:
-            if not db.has_collection(collection):
-                db.create_collection(collection)
+            if not await db.has_collection(collection):
+                await db.create_collection(collection)
                 logger.info(f'Created collection {collection}')
 
         for collection in schema['edge_collections']:
-            if not db.has_collection(collection):
-                db.create_collection(collection, edge=True)
+            if not await db.has_collection(collection):
+                await db.create_collection(collection, edge=True)
                 logger.info(f'Created edge collection {collection}')
 
         # init main database
-        if not db.has_database(ARANGO_DB_NAME):
-            db.create_database(ARANGO_DB_NAME)
+        if not await db.has_database(ARANGO_DB_NAME):
+            await db.create_database(ARANGO_DB_NAME)
             logger.info(f'Created database {ARANGO_DB_NAME}')
 
-        db.db_name = ARANGO_DB_NAME
+        db = await connect_arangodb(hosts=self.hosts, db_name=ARANGO_DB_NAME, auth=self.auth)
 
         db_schema = load_yaml(path=ARANGO_SCHEMA_PATH)
         jsrs.JSONSchema(db_validation_schema).validate(db_schema)
@@ -96,11 +96,11 @@ class ArangoInit:
 
             db_schema['collections']['audit_log'] = audit_schema['collections']['audit_log']
 
-        def add_indexes(collection, edge=False):
+        async def add_indexes(collection, edge=False):
             logged = False
 
             # get stored indexes
-            indexes = db.list_indexes(collection).get('result', [])
+            indexes = (await db.list_indexes(collection)).get('result', [])
             indexes_by_field = {}
             for index in indexes:
                 for field in index.get('fields'):
@@ -114,7 +114,7 @@ class ArangoInit:
                     'fields': ['_class'],
                     'inBackground': True,
                 }
-                db.create_index(collection, data)
+                await db.create_index(collection, data)
 
             batch = 'collections' if not edge else 'edge_collections'
             fields = index_config.get(batch, {}).get(collection, {})
@@ -137,30 +137,30 @@ class ArangoInit:
 
                     field_spec['fields'] = [field_name]
                     field_spec['inBackground'] = field_spec.get('inBackground', True)  # set default
-                    db.create_index(collection, field_spec)
+                    await db.create_index(collection, field_spec)
 
         # init main database collections and indexes
         for collection in db_schema['collections']:
-            if not db.has_collection(collection):
-                db.create_collection(collection)
+            if not await db.has_collection(collection):
+                await db.create_collection(collection)
                 logger.info(f'Created collection {collection}')
 
         for collection in db_schema['collections']:
-            add_indexes(collection)
+            await add_indexes(collection)
 
         for collection in db_schema['edge_collections']:
-            if not db.has_collection(collection):
-                db.create_collection(collection, edge=True)
+            if not await db.has_collection(collection):
+                await db.create_collection(collection, edge=True)
                 logger.info(f'Created edge collection {collection}')
 
         for collection in db_schema['edge_collections']:
-            add_indexes(collection, edge=True)
+            await add_indexes(collection, edge=True)
 
     async def init_analyzers(self, app):
         """Initialize configured analyzers"""
-        db = await get_arangodb(hosts=self.hosts, auth=self.auth)
+        db = await connect_arangodb(hosts=self.hosts, auth=self.auth)
 
-        analyzers = db.list_analyzers()
+        analyzers = await db.list_analyzers()
         analyzers_dict = {alyz.get('name'): alyz for alyz in analyzers.get('result', [])}
 
         for analyzer in self.analyzers:
@@ -173,18 +173,18 @@ class ArangoInit:
 
                 if not stored_props == analyzer_props:
                     logger.info(f'Analyzer {analyzer_name} is outdated, deleting.')
-                    db.delete_analyzer(analyzer_name)
-                    db.create_analyzer(analyzer)
+                    await db.delete_analyzer(analyzer_name)
+                    await db.create_analyzer(analyzer)
                     logger.info(f'Analyzer {analyzer_name} created.')
             else:
-                db.create_analyzer(analyzer)
+                await db.create_analyzer(analyzer)
                 logger.info(f'Analyzer {analyzer_name} not found, created.')
 
     async def init_search_view(self, app):
         """Initialize or update configured search view"""
-        db = await get_arangodb(hosts=self.hosts, auth=self.auth)
+        db = await connect_arangodb(hosts=self.hosts, auth=self.auth)
 
-        views = db.list_views()
+        views = await db.list_views()
         views_dict = {view.get('name'): view for view in views.get('result', [])}
 
         if self.view_name in views_dict:
@@ -193,10 +193,10 @@ class ArangoInit:
             new_links = self.view_props.get('links', {})
 
             if stored_links.keys() != new_links.keys():
-                db.update_view(self.view_name, self.view_props)
+                await db.update_view(self.view_name, self.view_props)
                 logger.info(f'Search view {self.view_name} updated.')
         else:
-            db.create_view({
+            await db.create_view({
                 'name': self.view_name,
                 'type': 'arangosearch',
                 **self.view_props
@@ -205,7 +205,7 @@ class ArangoInit:
 
     async def run_update_search_indexes(self, app):
         """Run update_search_indexes as a background process"""
-        db = await get_arangodb(hosts=self.hosts, auth=self.auth)
+        db = await connect_arangodb(hosts=self.hosts, auth=self.auth)
 
         logger.info('Updating search indexes...')
         for collection, indexed_fields in self.index_fields.items():
@@ -216,7 +216,7 @@ class ArangoInit:
             bind_vars = {
                 '@collection': collection,
             }
-            results = db.aql(query, bind_vars=bind_vars)
+            results = await db.aql(query, bind_vars=bind_vars)
             results = results['result']
 
             logger.info(f'Updating search indexes for {collection}...')
@@ -233,4 +233,4 @@ class ArangoInit:
                     UPDATE {json.dumps(update)}
                     IN @@collection
                     ''')
-                    db.aql(query, bind_vars=bind_vars)
+                    await db.aql(query, bind_vars=bind_vars)
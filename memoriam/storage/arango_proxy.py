@@ -1,18 +1,17 @@
 import logging
 import time
 from base64 import b64encode
-from itertools import cycle
 
 import httpx
 
 from sanic.exceptions import SanicException, Unauthorized
-from sanic.response import raw
 from memoriam.config import (
     ARANGO_HOST, ARANGO_HOSTS, ARANGO_PORT, ARANGO_SCHEME,
-    ARANGO_USERNAME, ARANGO_PASSWORD,
-    CA_FILE, REQUEST_TIMEOUT
+    ARANGO_USERNAME, ARANGO_PASSWORD, ARANGO_RETRIES,
+    ARANGO_POOL_SIZE, ARANGO_POOL_KEEPALIVE, ARANGO_POOL_KEEPALIVE_EXPIRY
 )
-from memoriam.utils import scrub_headers
+from memoriam.balancer import HostBalancer, RETRY_METHODS, RETRY_STATUS_CODES
+from memoriam.proxy import get_proxy_client, close_proxy_clients, build_upstream_request, send_downstream
 
 
 logger = logging.getLogger('memoriam')
@@ -32,19 +31,24 @@ class ArangoProxy:
             if ARANGO_HOSTS else
             [f'{ARANGO_SCHEME}://{ARANGO_HOST}:{ARANGO_PORT}']
         )
-        self.host_iterator = self.get_host_iterator()
+        self.balancer = HostBalancer(self.hosts)
+        self.limits = httpx.Limits(
+            max_connections=ARANGO_POOL_SIZE,
+            max_keepalive_connections=ARANGO_POOL_KEEPALIVE,
+            keepalive_expiry=ARANGO_POOL_KEEPALIVE_EXPIRY
+        )
 
         app.register_middleware(self.arango_auth_middleware, 'request')
+        app.register_listener(close_proxy_clients, 'after_server_stop')
 
-        methods = ['GET', 'POST', 'PUT', 'PATCH', 'DELETE']
-        app.add_route(self.arango_proxy, '/_db/<path:path>', methods=methods)
-        app.add_route(self.arango_proxy, '/_api/<path:path>', methods=methods)
-        app.add_route(self.arango_proxy, '/_admin/<path:path>', methods=methods)
+        # stream routes are flagged on the handler, which a bound method does not allow
+        async def arango_proxy(request, path):
+            return await self.arango_proxy(request, path)
 
-    def get_host_iterator(self):
-        """Return an iterator that cycles through the hosts in self.hosts"""
-        for host in cycle(self.hosts):
-            yield host
+        methods = ['GET', 'POST', 'PUT', 'PATCH', 'DELETE']
+        app.add_route(arango_proxy, '/_db/<path:path>', methods=methods, stream=True)
+        app.add_route(arango_proxy, '/_api/<path:path>', methods=methods, stream=True)
+        app.add_route(arango_proxy, '/_admin/<path:path>', methods=methods, stream=True)
 
     async def arango_auth_middleware(self, request):
         """Request middleware storing Authly credentials and replacing with ArangoDB authentication"""
@@ -62,30 +66,45 @@ class ArangoProxy:
                 request.headers['authorization'] = f'Basic {base64_auth}'
 
     async def arango_proxy(self, request, path):
-        """Reverse proxy for requests to ArangoDB"""
-        host = next(self.host_iterator)
-
+        """Streaming reverse proxy for requests to ArangoDB, pooling connections per host.
+           Idempotent requests are retried on another host on connection errors or unavailability."""
         request_headers = dict(request.headers)
         request_headers.pop('host', None)
+        request_headers.pop('content-length', None)
+
+        url = request.path + (f'?{request.query_string}' if request.query_string else '')
+        retries = ARANGO_RETRIES if request.method in RETRY_METHODS else 0
+        tried = []
 
         pre_proxy = time.perf_counter() * 1000
 
-        try:
-            proxy_response = httpx.request(
-                method=request.method,
-                url=(host + request.path + (f'?{request.query_string}' if request.query_string else '')),
-                content=request.body,
-                headers=request_headers,
-                timeout=REQUEST_TIMEOUT,
-                verify=CA_FILE
-            )
-        except httpx.RequestError as e:
-            raise SanicException(f'Error while requesting {e.request.url}: {e}') from None
+        while True:
+            host = self.balancer.acquire(exclude=tried)
+            client = get_proxy_client(host, self.limits)
+            upstream_request = build_upstream_request(request, client, host + url, dict(request_headers), stream=True)
+            start = time.perf_counter()
+
+            try:
+                proxy_response = await client.send(upstream_request, stream=True)
+            except httpx.RequestError as e:
+                self.balancer.release(host, time.perf_counter() - start, failed=True)
+                if len(tried) < retries:
+                    logger.warning(f'Retrying on another host after error while requesting {e.request.url}: {e}')
+                    tried.append(host)
+                    continue
+                raise SanicException(f'Error while requesting {e.request.url}: {e}') from None
+
+            failed = proxy_response.status_code in RETRY_STATUS_CODES
+            self.balancer.release(host, time.perf_counter() - start, failed=failed)
+
+            if failed and len(tried) < retries:
+                logger.warning(f'Retrying on another host after {proxy_response.status_code} from {host}')
+                await proxy_response.aclose()
+                tried.append(host)
+                continue
+
+            break
 
         log_perf.debug(f'ArangoDB reverse proxy response time: {(time.perf_counter() * 1000 - pre_proxy):.2f} ms')
 
-        return raw(
-            body=proxy_response.content,
-            status=proxy_response.status_code,
-            headers=dict(scrub_headers(proxy_response.headers))
-        )
+        return await send_downstream(request, proxy_response, 'ArangoDB', stream=True)
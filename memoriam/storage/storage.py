@@ -33,7 +33,7 @@ def get_minio_client():
 
 async def list_buckets(request):
     """List all buckets"""
-    request.app.ctx.authorize(request, 'storage', 'read_buckets')
+    await request.app.ctx.authorize(request, 'storage', 'read_buckets')
 
     minio = get_minio_client()
 
@@ -52,7 +52,7 @@ async def list_buckets(request):
 
 async def post_bucket(request):
     """Add new bucket"""
-    request.app.ctx.authorize(request, 'storage', 'create_bucket')
+    await request.app.ctx.authorize(request, 'storage', 'create_bucket')
 
     minio = get_minio_client()
     bucket_name = request.json.get('bucket_name')
@@ -68,7 +68,7 @@ async def post_bucket(request):
 
 async def get_bucket(request, bucket_name):
     """List contents of bucket"""
-    request.app.ctx.authorize(request, 'storage', 'read_bucket')
+    await request.app.ctx.authorize(request, 'storage', 'read_bucket')
 
     minio = get_minio_client()
 
@@ -91,7 +91,7 @@ async def get_bucket(request, bucket_name):
 
 async def post_object(request, bucket_name, object_name):
     """Add new object to bucket"""
-    request.app.ctx.authorize(request, 'storage', 'create_object')
+    await request.app.ctx.authorize(request, 'storage', 'create_object')
 
     minio = get_minio_client()
 
@@ -202,7 +202,7 @@ async def post_object(request, bucket_name, object_name):
 
 async def get_object(request, bucket_name, object_name):
     """Get object from bucket"""
-    request.app.ctx.authorize(request, 'storage', 'read_object')
+    await request.app.ctx.authorize(request, 'storage', 'read_object')
 
     minio = get_minio_client()
 
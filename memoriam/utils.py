@@ -1,4 +1,5 @@
 import asyncio
+import hashlib
 import logging
 import re
 
@@ -12,6 +13,7 @@ from sanic.exceptions import SanicException
 from sanic.handlers import ErrorHandler
 from sanic.compat import Header
 
+import ujson as json
 import yaml
 
 try:  # pragma: no cover
@@ -24,6 +26,11 @@ logger = logging.getLogger('memoriam')
 log_error = logging.getLogger('memoriam.error')
 
 
+def fingerprint(*objs):
+    """Get a sha256 fingerprint of JSON serializable objects, independent of key order"""
+    return hashlib.sha256(json.dumps(objs, sort_keys=True).encode()).hexdigest()
+
+
 def trueish(value):
     """Return True if value is true-ish"""
     return value in (True, 'True', 'true', 'yes', 'on', '1', 1)
@@ -110,6 +117,44 @@ def task_handler(task):
         raise SanicException(str(e)) from None
 
 
+class BatchLoader:
+    """Collects keys loaded within one event loop iteration and resolves them in one batch,
+       given an async function taking a list of keys and returning a dict of results by key"""
+
+    def __init__(self, batch_fn, default=None):
+        self.batch_fn = batch_fn
+        self.default = default
+        self.pending = {}
+
+    def load(self, key):
+        """Get a future for the result of the given key"""
+        if key in self.pending:
+            return self.pending[key]
+
+        loop = asyncio.get_running_loop()
+        if not self.pending:
+            loop.call_soon(lambda: loop.create_task(self.dispatch()))
+
+        self.pending[key] = loop.create_future()
+        return self.pending[key]
+
+    async def dispatch(self):
+        """Resolve all pending keys with a single call to batch_fn"""
+        pending, self.pending = self.pending, {}
+
+        try:
+            results = await self.batch_fn(list(pending))
+        except Exception as e:
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for key, future in pending.items():
+            if not future.done():
+                future.set_result(results.get(key, self.default))
+
+
 class LoggingErrorHandler(ErrorHandler):
     """Sanic ErrorHandler that logs exceptions and 5xx errors before returning"""
     def default(self, request, exception):
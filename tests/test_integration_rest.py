@@ -161,6 +161,7 @@ def test_list_domain_objects(clean_db, backend_data, http_client):
         'skip': 0,
         'limit': 100,
         'results_total': 3,
+        'next_cursor': None,
         'results': [
             {'name': 'test c'},
             {'name': 'test b'},
@@ -400,6 +401,7 @@ def test_list_domain_objects(clean_db, backend_data, http_client):
         'skip': 0,
         'limit': 100,
         'results_total': 3,
+        'next_cursor': None,
         'results': [
             {
                 'name': 'test a',
@@ -442,6 +444,7 @@ def test_list_domain_objects(clean_db, backend_data, http_client):
         'skip': 0,
         'limit': 100,
         'results_total': 3,
+        'next_cursor': None,
         'results': [
             {
                 'name': 'test a',
@@ -491,6 +494,7 @@ def test_list_domain_objects(clean_db, backend_data, http_client):
         'skip': 0,
         'limit': 100,
         'results_total': 3,
+        'next_cursor': None,
         'results': [
             {'_class': 'dataset', '_key': '3', 'name': 'test c', 'description': 'gamma'},
             {'_class': 'dataset', '_key': '2', 'name': 'test b', 'description': 'beta'},
@@ -873,6 +877,7 @@ def test_patch_domain_object(clean_db, backend_data, http_client):
 
     assert results_total == 2
     assert len(results) == 2
+    assert response.json()['next_cursor'] is None
     assert results[0]['operation'] == 'update'
     assert results[0]['pre'] == {}
     assert results[0]['post'] == {} # groups is a writeOnly attribute
@@ -960,6 +965,45 @@ def test_list_relations(clean_db, backend_data, http_client):
     }
 
 
+def test_list_with_cursor(clean_db, backend_data, http_client):
+    params = {'field': ['name'], 'sort': ['name'], 'limit': 2}
+    response = http_client.get(f'{domain_url}/infoflow/api/dataset', params=params)
+    assert response.status_code == 200, response.json()
+    body = response.json()
+    assert body['results'] == [{'name': 'test a'}, {'name': 'test b'}]
+    assert body['next_cursor']
+
+    # the next page continues after the last result, and is the last page
+    params['cursor'] = body['next_cursor']
+    response = http_client.get(f'{domain_url}/infoflow/api/dataset', params=params)
+    assert response.status_code == 200, response.json()
+    assert response.json() == {
+        'skip': 0,
+        'limit': 2,
+        'results_total': 1,
+        'results': [{'name': 'test c'}],
+        'next_cursor': None,
+    }
+
+    # cursors are only valid for the sort they were returned for
+    params['sort'] = ['-name']
+    response = http_client.get(f'{domain_url}/infoflow/api/dataset', params=params)
+    assert response.status_code == 400, response.json()
+
+    params = {'sort': ['name'], 'limit': 1}
+    response = http_client.get(f'{domain_url}/infoflow/api/dataset/3/objects', params=params)
+    assert response.status_code == 200, response.json()
+    body = response.json()
+    assert [result['name'] for result in body['results']] == ['test a']
+    assert body['next_cursor']
+
+    params['cursor'] = body['next_cursor']
+    response = http_client.get(f'{domain_url}/infoflow/api/dataset/3/objects', params=params)
+    assert response.status_code == 200, response.json()
+    body = response.json()
+    assert [result['name'] for result in body['results']] == ['test b']
+
+
 def test_list_relations_with_search_filter(clean_db, backend_data, http_client):
     url = f'{domain_url}/infoflow/api/dataset/3/objects'
 
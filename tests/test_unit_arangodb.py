@@ -1,11 +1,100 @@
+import copy
+import time
+import logging
 
+import httpx
 import pytest
+from unittest.mock import MagicMock, AsyncMock
 
-from sanic.exceptions import InvalidUsage
+from sanic.exceptions import InvalidUsage, SanicException
+from sanic.request import RequestParameters
 
+import memoriam.arangodb
 from memoriam.arangodb import *
 
 
+log_perf = logging.getLogger('memoriam.perf')
+
+
+@pytest.mark.asyncio
+async def test_get_arangodb_pooled():
+    await close_arangodb()
+
+    db = await get_arangodb()
+    assert await get_arangodb() is db
+    assert await get_arangodb(db_name=ARANGO_DB_NAME) is db
+    assert await get_arangodb(db_name='other') is not db
+    assert await get_arangodb(hosts=['http://other:8529']) is not db
+    assert await get_arangodb(auth=('user', 'pass')) is not db
+
+    db.ping = AsyncMock()
+    assert await connect_arangodb() is db
+    db.ping.assert_awaited_once()
+
+    await close_arangodb()
+    assert await get_arangodb() is not db
+    await close_arangodb()
+
+
+@pytest.mark.asyncio
+async def test_aql_cursor():
+    client = MagicMock()
+    client.db_name = 'test'
+    client._request = AsyncMock(return_value={'result': [3, 4], 'hasMore': False})
+
+    cursor = AQLCursor(client, {'id': '1', 'result': [1, 2], 'hasMore': True, 'extra': {'stats': {'fullCount': 4}}})
+    assert cursor.total == 4
+    assert [result async for result in cursor] == [1, 2, 3, 4]
+    client._request.assert_awaited_once_with('post', '_db/test/_api/cursor/1')
+
+    await cursor.close()
+    client._request.assert_awaited_once()
+
+    client._request = AsyncMock(return_value={'result': [3, 4], 'hasMore': True})
+    cursor = AQLCursor(client, {'id': '2', 'result': [1, 2], 'hasMore': True})
+    async with cursor:
+        batches = cursor.batches()
+        assert await batches.__anext__() == [1, 2]
+        await batches.aclose()
+    client._request.assert_awaited_once_with('delete', '_db/test/_api/cursor/2')
+
+
+def test_is_read_only():
+    assert is_read_only('FOR object IN entity FILTER object.field == @value RETURN object')
+    assert not is_read_only('FOR object IN @data INSERT object INTO entity RETURN NEW')
+    assert not is_read_only('for object in entity update object with {a: 1} in entity')
+    assert not is_read_only('UPSERT {_key: @key} INSERT {} UPDATE {} IN entity')
+
+
+@pytest.mark.asyncio
+async def test_aql_retries(monkeypatch):
+    monkeypatch.setattr(memoriam.arangodb, 'ARANGO_RETRIES', 1)
+    client = AsyncArangoHTTPClient(hosts=['http://test1:8529', 'http://test2:8529'], db_name='test')
+    response = MagicMock(status_code=201)
+    response.json.return_value = {'result': [1], 'hasMore': False}
+    error = httpx.ConnectError('failed', request=httpx.Request('POST', 'http://test1:8529'))
+
+    # read-only queries are retried on another host
+    client.client.request = AsyncMock(side_effect=[error, response])
+    result = await client.aql('FOR object IN entity RETURN object')
+    assert result['result'] == [1]
+    hosts = [call.args[1].split('/_db')[0] for call in client.client.request.await_args_list]
+    assert hosts == ['http://test1:8529', 'http://test2:8529']
+
+    # writes and queries in stream transactions are not
+    for query, kwargs in [('FOR object IN @data INSERT object INTO entity', {}),
+                          ('FOR object IN entity RETURN object', {'trx_id': '1'})]:
+        client.client.request = AsyncMock(side_effect=[error, response])
+        with pytest.raises(SanicException):
+            await client.aql(query, **kwargs)
+        assert client.client.request.await_count == 1
+
+    client.client.request = AsyncMock(side_effect=[error, response])
+    assert (await client.cursor('FOR object IN entity RETURN object')).batch == [1]
+
+    await client.close()
+
+
 def test_get_all_collections():
     schema = {}
     assert get_all_collections(schema) == ''
@@ -285,6 +374,50 @@ def test_get_sort_string():
         result = get_sort_string(sort_query, attributes)
 
 
+def test_get_keyset():
+    attributes = {
+        'field_a': 'field_x',
+        'field_b': 'field_y',
+    }
+    assert get_keyset([], attributes) == ('', None)
+
+    cursor_filter, cursor_values = get_keyset(['-field_b', 'field_a'], attributes)
+    assert cursor_filter == ''
+    assert cursor_values == '[object.field_y, object.field_x, object._key]'
+
+    cursor_filter, cursor_values = get_keyset(['-field_b', 'field_a'], attributes, cursor=True)
+    assert cursor_filter == (
+        'FILTER object.field_y <= @object_cursor_0\n'
+        'FILTER (object.field_y < @object_cursor_0) || '
+        '(object.field_y == @object_cursor_0 && object.field_x > @object_cursor_1) || '
+        '(object.field_y == @object_cursor_0 && object.field_x == @object_cursor_1 && object._key > @object_cursor_2)'
+    )
+
+    cursor_filter, _ = get_keyset(['_key'], attributes, cursor=True)
+    assert cursor_filter == 'FILTER (object._key > @object_cursor_0)'
+
+
+def test_keyset_cursors():
+    results = [{'_key': '1', '_cursor': ['a', '1']}, {'_key': '2', '_cursor': ['b', '2']}]
+    values = pop_cursor_values(results)
+    assert values == ['b', '2']
+    assert results == [{'_key': '1'}, {'_key': '2'}]
+
+    assert get_next_cursor(['field_a'], values, 2, 3) is None
+    assert get_next_cursor([], values, 2, 2) is None
+    cursor = get_next_cursor(['field_a'], values, 2, 2)
+    assert cursor == encode_cursor(['field_a'], values)
+
+    assert with_cursor('object', '[object._key]') == 'MERGE(object, {_cursor: [object._key]})'
+    assert get_cursor_bind_vars(cursor, ['field_a']) == {'object_cursor_0': 'b', 'object_cursor_1': '2'}
+
+    with pytest.raises(InvalidUsage):
+        get_cursor_bind_vars(cursor, ['-field_a'])
+
+    with pytest.raises(GraphQLError):
+        get_cursor_bind_vars('invalid', ['field_a'], ctx='GraphQL')
+
+
 @pytest.fixture()
 def ast_dict():
     return {
@@ -728,6 +861,59 @@ def test_get_dotted_queries():
     assert result == ['c == "something"']
 
 
+def test_get_plan_args():
+    args = RequestParameters({
+        'filter': ['name == "a b"', 'rel.count IN [1, 2]', 'invalid'],
+        'search': ['needle'],
+        'field': ['name'],
+    })
+    shape, values = get_plan_args(args, ('search', 'filter', 'edge_filter', 'field'))
+    assert shape == {
+        'search': [PLAN_SLOT],
+        'filter': ['name == "\\u0000slot:0"', 'rel.count IN "\\u0000slot:1"', 'invalid'],
+        'field': ['name'],
+    }
+    assert values == ['"a b"', '[1, 2]']
+
+    bind_vars = {}
+    get_filter_strings(shape['filter'][:1], {'name': 'name'}, bind_vars)
+    plan = {'bind_vars': {**bind_vars, 'search': PLAN_SLOT, 'edge_collection': 'edge'}}
+    assert bind_plan_values(plan, values, args) == {'object_name_comp_1': 'a b', 'search': 'needle', 'edge_collection': 'edge'}
+
+
+def test_get_relation_tree():
+    kwargs = RequestParameters({
+        'relation': ['rel_a', 'rel_a.rel_b', 'rel_a.rel_b.rel_c', 'other.rel_b', 'unknown'],
+        'field': ['name', 'rel_a.name', 'rel_a.rel_b.label', 'other.rel_b.label'],
+    })
+    tree = get_relation_tree(kwargs, ['rel_a'])
+    assert list(tree) == ['rel_a']
+    assert tree['rel_a'].fields == ['name']
+    assert list(tree['rel_a'].relations) == ['rel_b']
+    # fields and relations are matched by full relation path
+    assert tree['rel_a'].relations['rel_b'].fields == ['label']
+    assert list(tree['rel_a'].relations['rel_b'].relations) == ['rel_c']
+
+
+def test_translate_relations():
+    translators = get_translators({
+        'a': {'attributes': {'name_a': 'name'}},
+        'b': {'attributes': {'name_b': 'name'}},
+    })
+    kwargs = RequestParameters({'relation': ['rel', 'rel.sub']})
+    results = [
+        {'_key': f'{i}', 'rel': [{'_key': 'r', '_class': 'a', 'name': 'x', 'sub': {'_key': 's', '_class': 'b', 'name': 'y'}}]}
+        for i in range(3)
+    ]
+    results = translate_relations(results, translators, get_relation_tree(kwargs, ['rel']))
+    assert results[-1]['rel'] == [{'_key': 'r', '_class': 'a', 'name_a': 'x', 'sub': [{'_key': 's', '_class': 'b', 'name_b': 'y'}]}]
+
+    # relations with selected fields are only stripped of _class
+    kwargs = RequestParameters({'relation': ['rel'], 'field': ['rel.name']})
+    results = translate_relations([{'rel': [{'_class': 'a', 'name': 'x'}]}], translators, get_relation_tree(kwargs, ['rel']))
+    assert results == [{'rel': [{'name': 'x'}]}]
+
+
 def test_get_diffs():
     pre = {
         '_id': 'test/1',
@@ -806,14 +992,14 @@ def test_translate_input():
         'field_b': 'data',
         'field_c': 'hidden',
     }
-    result = translate_input(data, obj)
+    result = translate_input(data, Translator(obj))
     assert result == {
         'field_x': 'test',
         'field_y': 'data',
     }
 
     obj['permissive'] = 'input'  # type: ignore
-    result = translate_input(data, obj)
+    result = translate_input(data, Translator(obj))
     assert result == {
         'field_x': 'test',
         'field_y': 'data',
@@ -839,7 +1025,7 @@ def test_translate_output():
             'edge_field': 'test'
         }
     }
-    result = translate_output(data, obj)
+    result = translate_output(data, Translator(obj))
     assert result == {
         '_key': '1',
         '_class': 'test',
@@ -848,7 +1034,7 @@ def test_translate_output():
     }
 
     obj['permissive'] = 'output'  # type: ignore
-    result = translate_output(data, obj)
+    result = translate_output(data, Translator(obj))
     assert result == {
         '_key': '1',
         '_class': 'test',
@@ -859,3 +1045,107 @@ def test_translate_output():
             'edge_field': 'test'
         }
     }
+
+
+def test_translator():
+    db_schema = {
+        'collections': {
+            'entity': {
+                'properties': {
+                    'field_x': {'type': 'string'},
+                    'secret': {'type': 'string', 'writeOnly': True},
+                }
+            }
+        }
+    }
+    klass = {
+        'resolver': 'entity',
+        'attributes': {
+            'field_a': 'field_x',
+            'password': 'secret',
+        },
+        'constants': {'kind': 'test'},
+        'permissive': 'both',
+    }
+    translator = Translator(klass, db_schema)
+
+    assert translator.input({'_key': '1', 'field_a': 'test', 'password': 'pw', 'extra': 1}) == {
+        'field_x': 'test',
+        'secret': 'pw',
+        'extra': 1,
+    }
+    # write-only fields are never output, not even as permissive fields
+    assert translator.output({'_key': '1', '_class': 'test', 'field_x': 'test', 'secret': 'pw', 'extra': 1, 'rel': []}, ['rel']) == {
+        '_key': '1',
+        '_class': 'test',
+        'kind': 'test',
+        'field_a': 'test',
+        'extra': 1,
+        'rel': [],
+    }
+    assert get_translators({'test': klass}, db_schema)['test'].write_only == {'secret'}
+
+
+def test_translator_benchmark():
+    rows = 1000
+
+    def translate(size):
+        db_schema = {'collections': {'entity': {'properties': {f'field_{i}': {'type': 'string'} for i in range(size)}}}}
+        klass = {
+            'resolver': 'entity',
+            'attributes': {f'domain_field_{i}': f'field_{i}' for i in range(size)},
+            'permissive': 'output',
+        }
+        spec = copy.deepcopy(klass)
+        data = [{'_key': f'{i}', '_class': 'test', **{f'field_{j}': j for j in range(size)}, 'extra': i} for i in range(rows)]
+
+        start = time.perf_counter()
+        translator = Translator(klass, db_schema)
+        results = [translator.output(row) for row in data]
+        duration = time.perf_counter() - start
+
+        assert results[-1][f'domain_field_{size - 1}'] == size - 1
+        assert results[-1]['extra'] == rows - 1
+        assert f'field_{size - 1}' not in results[-1]
+        # compiled translators leave the (cached) class spec as it is
+        assert klass == spec
+        return duration
+
+    small = min(translate(20) for _ in range(3))
+    large = min(translate(200) for _ in range(3))
+    log_perf.debug(f'Translator output: {rows / large:.0f} rows/s with 200 attributes')
+
+    # linear in the number of attributes per row, previously quadratic
+    assert large / small < 30, f'10x attributes took {large / small:.1f}x longer'
+
+
+def test_parse_query():
+    query = '''
+    query {
+        first: MitreAttck(_key: "1") { name }
+        second: MitreAttck(_key: "2") { ...Fields }
+        TacticList { results { name } }
+    }
+    fragment Fields on MitreAttck { name description }
+    '''
+    parsed = parse_query(query)
+    assert parse_query(query) is parsed
+
+    assert get_ast_arguments(parsed.subtree('first', 'MitreAttck'), {}) == {'_key': '1'}
+    assert get_ast_arguments(parsed.subtree('second', 'MitreAttck'), {}) == {'_key': '2'}
+    assert get_ast_fields(parsed.subtree('second', 'MitreAttck')) == ['name', 'description']
+    assert get_ast_fields(parsed.subtree('TacticList', 'TacticList')) == ['name']
+
+
+def test_prefix_bind_vars():
+    query = 'FOR object IN @@collection FILTER object.a == @a AND object.b == @b RETURN @a'
+    assert prefix_bind_vars(query, {'a': 1}, 'root0_') == 'FOR object IN @@collection FILTER object.a == @root0_a AND object.b == @b RETURN @root0_a'
+
+
+def test_get_projection():
+    attributes = {'domain_field': 'field'}
+    assert get_projection(['domain_field', 'other'], attributes) == 'KEEP(object, ["_class","_id","_key","field","other"])'
+    assert get_projection(['domain_field', '_all'], attributes) == 'object'
+    assert get_projection(['domain_field', None], attributes, obj_name='subobject') == 'subobject'
+    assert get_projection([], attributes) == 'object'
+    assert get_return_spec([], projection='KEEP(object, ["_key"])') == 'KEEP(object, ["_key"])'
@@ -1,6 +1,10 @@
 from unittest.mock import MagicMock
 
+import httpx
+import pytest
+from sanic import Sanic
 
+import memoriam.proxy
 import memoriam.storage.arango_proxy
 from memoriam.storage.arango_proxy import *
 
@@ -14,12 +18,47 @@ def test_get_arangodb_host():
 
     arango_proxy = PatchedArangoProxy(MagicMock())
 
-    assert next(arango_proxy.host_iterator) == 'test1'
-    assert next(arango_proxy.host_iterator) == 'test2'
-    assert next(arango_proxy.host_iterator) == 'test3'
-    assert next(arango_proxy.host_iterator) == 'test1'
-    assert next(arango_proxy.host_iterator) == 'test2'
-    assert next(arango_proxy.host_iterator) == 'test3'
-    assert next(arango_proxy.host_iterator) == 'test1'
-    assert next(arango_proxy.host_iterator) == 'test2'
-    assert next(arango_proxy.host_iterator) == 'test3'
+    # round-robin while all hosts are idle
+    for host in ['test1', 'test2', 'test3', 'test1', 'test2', 'test3']:
+        assert arango_proxy.balancer.acquire() == host
+        arango_proxy.balancer.release(host, .01)
+
+
+@pytest.fixture()
+def non_mocked_hosts():
+    return ['mockserver']  # sanic asgi client
+
+
+@pytest.mark.asyncio
+async def test_arango_proxy(httpx_mock, monkeypatch):
+    monkeypatch.setattr(memoriam.storage.arango_proxy, 'ARANGO_HOSTS', 'http://test1:8529,http://test2:8529')
+    monkeypatch.setattr(memoriam.storage.arango_proxy, 'ARANGO_USERNAME', None)
+
+    app = Sanic('test_unit_arangodb_proxy')
+    app.config.AUTO_EXTEND = False
+    ArangoProxy(app)
+
+    async def cursor(request):
+        assert await request.aread() == b'{"query": "RETURN 1"}'
+        return httpx.Response(201, json={'result': [1]})
+
+    httpx_mock.add_callback(cursor, url='http://test1:8529/_db/test/_api/cursor')
+    httpx_mock.add_response(url='http://test2:8529/_api/version', json={'version': '3.11'})
+
+    _, response = await app.asgi_client.post('/_db/test/_api/cursor', content=b'{"query": "RETURN 1"}')
+    assert response.status == 201
+    assert response.json == {'result': [1]}
+
+    _, response = await app.asgi_client.get('/_api/version')
+    assert response.json == {'version': '3.11'}
+
+    # idempotent requests are retried on another host
+    httpx_mock.add_exception(httpx.ConnectError('Connection refused'), url='http://test1:8529/_api/version')
+    httpx_mock.add_response(url='http://test2:8529/_api/version', json={'version': '3.11'})
+
+    _, response = await app.asgi_client.get('/_api/version')
+    assert response.json == {'version': '3.11'}
+    assert app.ctx.arango_proxy.balancer.status()['http://test1:8529']['errors'] == 1
+
+    # pooled clients are closed with the server
+    assert not memoriam.proxy._clients
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+from sanic import Sanic
+
+import memoriam.domain.artifacts
+from memoriam.domain.artifacts import SchemaArtifacts
+
+
+class FakeRedis:
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value if isinstance(value, bytes) else str(value).encode()
+        return True
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+
+@pytest.fixture()
+def app():
+    app = Sanic('test_unit_artifacts')
+    app.ctx.redis = FakeRedis()
+    return app
+
+
+@pytest.mark.asyncio
+async def test_schema_artifacts(app, monkeypatch):
+    monkeypatch.setattr(memoriam.domain.artifacts, 'POLL_INTERVAL', .001)
+    builder = SchemaArtifacts(app, 'test', {'db': 'schema'})
+    worker = SchemaArtifacts(app, 'test', {'db': 'schema'})
+
+    # the first worker acquires the build lock, others wait for the artifact
+    assert await builder.acquire('fingerprint') is None
+    waiting = asyncio.create_task(worker.acquire('fingerprint'))
+    await asyncio.sleep(.01)
+    assert not waiting.done()
+
+    await builder.store('fingerprint', {'sdl': 'type Query { version: String }'})
+    assert await waiting == {'sdl': 'type Query { version: String }'}
+    assert await worker.acquire('fingerprint') == {'sdl': 'type Query { version: String }'}
+    assert builder.key('fingerprint') + ':lock' not in app.ctx.redis.data
+
+    # artifacts are not shared between different configurations
+    other = SchemaArtifacts(app, 'test', {'db': 'other'})
+    assert other.key('fingerprint') != builder.key('fingerprint')
+    assert await other.acquire('fingerprint') is None
+
+
+@pytest.mark.asyncio
+async def test_schema_artifacts_timeout(app, monkeypatch):
+    monkeypatch.setattr(memoriam.domain.artifacts, 'POLL_INTERVAL', .001)
+    monkeypatch.setattr(memoriam.domain.artifacts, 'SCHEMA_BUILD_TIMEOUT', .01)
+    artifacts = SchemaArtifacts(app, 'test')
+
+    assert await artifacts.acquire('fingerprint') is None
+    # the build lock is held, but no artifact is stored in time
+    assert await artifacts.acquire('fingerprint') is None
@@ -1,10 +1,18 @@
+import time
+import base64
+from unittest.mock import MagicMock, AsyncMock
+
 import pytest
+import ujson
 
+from sanic.compat import Header
 from sanic.response import empty
 from sanic_testing import TestManager
 
 import memoriam.gateway.app
+import memoriam.gateway.auth
 from memoriam.gateway.app import init_app
+from memoriam.gateway.auth import get_session_middleware, session_cache_key, session_cache_ttl
 
 pytestmark = pytest.mark.filterwarnings('ignore::DeprecationWarning')
 
@@ -12,7 +20,7 @@ pytestmark = pytest.mark.filterwarnings('ignore::DeprecationWarning')
 @pytest.fixture(scope='module')
 def app():
     reverse_proxy = lambda request, path: empty(200)
-    memoriam.gateway.app.get_reverse_proxy = lambda base_url, name: reverse_proxy
+    memoriam.gateway.app.get_reverse_proxy = lambda base_url, name, **kwargs: reverse_proxy
 
     app = init_app()
     app.config.AUTO_EXTEND = False
@@ -60,3 +68,36 @@ def test_disallowed_paths(app):
 
     _, response = app.test_client.get('/_api/version', debug=True, server_kwargs=kwargs)
     assert response.status == 401
+
+
+def test_session_cache_ttl(monkeypatch):
+    monkeypatch.setattr(memoriam.gateway.auth, 'SESSION_CACHE_TTL', 30)
+
+    claims = base64.urlsafe_b64encode(ujson.dumps({'exp': time.time() + 10}).encode()).decode().rstrip('=')
+    request = MagicMock(headers={'authorization': f'Bearer header.{claims}.signature'}, cookies={})
+    assert 8 <= session_cache_ttl(request) <= 10
+
+    request = MagicMock(headers={}, cookies={'session-cookie': 'opaque'})
+    assert session_cache_ttl(request) == 30
+
+    other_request = MagicMock(headers={}, cookies={'session-cookie': 'other'})
+    assert session_cache_key(request) != session_cache_key(other_request)
+    assert session_cache_key(request).startswith('memoriam_session:')
+
+
+@pytest.mark.asyncio
+async def test_session_middleware_cached(monkeypatch):
+    monkeypatch.setattr(memoriam.gateway.auth, 'NO_AUTH', False)
+
+    request = MagicMock(path='/system/api/domain', headers=Header({'authorization': 'Bearer token'}), cookies={})
+    request.app.ctx.redis.get = AsyncMock(return_value=ujson.dumps({
+        'x-authly-eid': '1',
+        'x-authly-entity-type': 'User',
+        'x-authly-entity-id': 'user',
+    }))
+
+    session_middleware = get_session_middleware('https://authly/api')
+    await session_middleware(request)
+
+    request.app.ctx.redis.get.assert_awaited_once_with(session_cache_key(request))
+    assert request.headers['x-authly-entity-id'] == 'user'
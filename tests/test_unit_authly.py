@@ -0,0 +1,159 @@
+import asyncio
+from unittest.mock import MagicMock, AsyncMock
+
+import ujson as json
+
+import pytest
+from sanic import Sanic
+from sanic.exceptions import SanicException
+
+import memoriam.authly
+from memoriam.authly import AuthlyClient, AUTH_EVENTS_CHANNEL, invalidate_authorization
+
+
+@pytest.fixture()
+def authly():
+    app = Sanic('test_unit_authly')
+    app.ctx.redis = AsyncMock()
+    app.ctx.redis.get = AsyncMock(return_value=None)
+
+    async def scan_iter(match=None):
+        for key in ['memoriam_authz:1:User:user:test:read']:
+            yield key
+
+    app.ctx.redis.scan_iter = scan_iter
+    return AuthlyClient(app)
+
+
+@pytest.fixture()
+def request_():
+    request = MagicMock()
+    request.headers = {
+        'x-authly-eid': '1',
+        'x-authly-entity-type': 'User',
+        'x-authly-entity-id': 'user',
+    }
+    return request
+
+
+@pytest.mark.asyncio
+async def test_cached_decision(authly, request_):
+    key = authly.decision_key(request_, 'test', 'read')
+    assert key == 'memoriam_authz:1:User:user:test:read'
+
+    resolve = AsyncMock(return_value=True)
+    assert await authly.cached_decision(key, resolve) is True
+    assert await authly.cached_decision(key, resolve) is True
+    resolve.assert_awaited_once()
+    authly.app.ctx.redis.set.assert_awaited_once_with(key, b'1', ex=memoriam.authly.AUTH_CACHE_TTL)
+    assert authly.decision_stats == {'hits': 1, 'misses': 1}
+
+    # shared decisions from other workers
+    other_key = authly.decision_key(request_, 'test', 'delete')
+    authly.app.ctx.redis.get = AsyncMock(return_value=b'0')
+    assert await authly.cached_decision(other_key, resolve) is False
+    resolve.assert_awaited_once()
+
+    # indefinite decisions are denied, but not cached
+    error_key = authly.decision_key(request_, 'test', 'update')
+    authly.app.ctx.redis.get = AsyncMock(return_value=None)
+    assert await authly.cached_decision(error_key, AsyncMock(return_value=None)) is False
+    assert error_key not in authly.decisions
+
+    await authly.invalidate_authorization('1')
+    assert key not in authly.decisions
+    authly.app.ctx.redis.delete.assert_awaited_once_with(key)
+    channel, event = authly.app.ctx.redis.publish.await_args.args
+    assert channel == AUTH_EVENTS_CHANNEL
+    assert json.loads(event)['eid'] == '1'
+
+
+@pytest.mark.asyncio
+async def test_cached_decision_lru(authly, request_, monkeypatch):
+    monkeypatch.setattr(memoriam.authly, 'AUTH_CACHE_SIZE', 2)
+
+    for action in ['create', 'read', 'update']:
+        key = authly.decision_key(request_, 'test', action)
+        await authly.cached_decision(key, AsyncMock(return_value=True))
+
+    assert list(authly.decisions) == [
+        'memoriam_authz:1:User:user:test:read',
+        'memoriam_authz:1:User:user:test:update',
+    ]
+
+
+@pytest.mark.asyncio
+async def test_authorize(authly, request_, monkeypatch):
+    monkeypatch.setattr(memoriam.authly, 'NO_AUTH', False)
+    monkeypatch.setattr(memoriam.authly, 'NO_AC', False)
+
+    authly._async_request = AsyncMock(return_value=MagicMock(status_code=200))
+    await authly.authorize(request_, 'test', 'read')
+    await authly.authorize(request_, 'test', 'read')
+    authly._async_request.assert_awaited_once()
+
+    authly._async_request = AsyncMock(return_value=MagicMock(status_code=401))
+    with pytest.raises(SanicException):
+        await authly.authorize(request_, 'test', 'delete')
+
+
+@pytest.mark.asyncio
+async def test_authorization_events_listen(authly, request_):
+    for eid in ['1', '2']:
+        request_.headers['x-authly-eid'] = eid
+        key = authly.decision_key(request_, 'test', 'read')
+        await authly.cached_decision(key, AsyncMock(return_value=True))
+
+    async def listen():
+        yield {'type': 'subscribe', 'data': 1}
+        yield {'type': 'message', 'data': json.dumps({'eid': '1'})}
+
+    pubsub = MagicMock()
+    pubsub.__aenter__ = AsyncMock(return_value=pubsub)
+    pubsub.__aexit__ = AsyncMock(return_value=False)
+    pubsub.subscribe = AsyncMock()
+    pubsub.listen = listen
+    authly.app.ctx.redis.pubsub = MagicMock(return_value=pubsub)
+
+    await authly.subscribe(authly.app)
+    await asyncio.sleep(0.01)
+    await authly.unsubscribe(authly.app)
+
+    pubsub.subscribe.assert_awaited_with(AUTH_EVENTS_CHANNEL)
+    assert list(authly.decisions) == ['memoriam_authz:2:User:user:test:read']
+
+
+@pytest.mark.asyncio
+async def test_invalidate_authorization_endpoint(authly, request_):
+    request_.app = authly.app
+    request_.json = {'eid': '1'}
+    authly.app.ctx.authorize = AsyncMock()
+    authly.app.ctx.invalidate_authorization = AsyncMock()
+
+    response = await invalidate_authorization(request_)
+    assert response.status == 204
+    authly.app.ctx.authorize.assert_awaited_once_with(request_, 'authorization', 'invalidate')
+    authly.app.ctx.invalidate_authorization.assert_awaited_once_with('1')
+
+    authly.app.ctx.authorize = AsyncMock(side_effect=SanicException('Unauthorized', status_code=401))
+    with pytest.raises(SanicException):
+        await invalidate_authorization(request_)
+    authly.app.ctx.invalidate_authorization.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_async_service_request_reauthenticates(authly):
+    session = MagicMock(status_code=200)
+    session.json.return_value = {'token': 'token'}
+    authly._async_request = AsyncMock(side_effect=[
+        MagicMock(status_code=401), session, MagicMock(status_code=200)
+    ])
+
+    response = await authly.async_service_request('post', 'https://authly/resolve')
+    assert response.status_code == 200
+    assert authly.headers == {'Authorization': 'Bearer token'}
+
+    method, url, data = authly._async_request.await_args_list[1].args
+    assert (method, url) == ('POST', f'{memoriam.authly.AUTHLY_URL}/auth/authenticate')
+    assert 'Authorization' not in authly._async_request.await_args_list[1].kwargs['headers']
+    assert authly._async_request.await_args_list[2].args[3] == {'Authorization': 'Bearer token'}
@@ -0,0 +1,63 @@
+import memoriam.balancer
+from memoriam.balancer import HostBalancer
+
+
+def test_least_outstanding():
+    balancer = HostBalancer(['test1', 'test2', 'test3'])
+
+    assert balancer.acquire() == 'test1'
+    assert balancer.acquire() == 'test2'
+    balancer.release('test1', .01)
+
+    # test2 is busy, test3 and test1 are tied
+    assert balancer.acquire() == 'test3'
+    assert balancer.acquire() == 'test1'
+    assert balancer.acquire(exclude=['test2', 'test3']) == 'test1'
+
+
+def test_ejection(monkeypatch):
+    monkeypatch.setattr(memoriam.balancer, 'ARANGO_EJECT_FAILURES', 2)
+    monkeypatch.setattr(memoriam.balancer, 'ARANGO_EJECT_BACKOFF', 10)
+
+    balancer = HostBalancer(['test1', 'test2'])
+
+    for _ in range(2):
+        host = balancer.acquire(exclude=['test2'])
+        balancer.release(host, .01, failed=True)
+
+    assert balancer.status()['test1']['ejected']
+    assert balancer.status()['test1']['error_rate'] == 1
+    assert balancer.acquire() == 'test2'
+    assert balancer.acquire() == 'test2'
+
+    # ejected hosts are used if no others are available
+    assert balancer.acquire(exclude=['test2']) == 'test1'
+
+    # backoff doubles on repeated ejections
+    before = balancer.state['test1']['ejected_until']
+    balancer.release('test1', .01, failed=True)
+    balancer.release('test1', .01, failed=True)
+    assert balancer.state['test1']['ejected_until'] - before > 10
+
+    # ejections are reset on success
+    balancer.release('test1', .01)
+    assert balancer.state['test1']['ejections'] == 0
+
+
+def test_status():
+    balancer = HostBalancer(['test1'])
+    assert balancer.status() == {
+        'test1': {
+            'ejected': False,
+            'outstanding': 0,
+            'requests': 0,
+            'errors': 0,
+            'error_rate': 0.,
+            'latency_ms': None,
+        }
+    }
+
+    balancer.release(balancer.acquire(), .01)
+    balancer.release(balancer.acquire(), .02)
+    assert balancer.status()['test1']['latency_ms'] == 12.
+    assert balancer.status()['test1']['requests'] == 2
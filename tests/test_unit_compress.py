@@ -0,0 +1,82 @@
+import gzip
+from unittest.mock import MagicMock
+
+import brotli
+import pytest
+import zstandard
+from sanic.response import json, raw
+
+import memoriam.compress
+from memoriam.compress import Compress, StreamCompressor, get_stream_compressor
+
+
+@pytest.fixture()
+def compress():
+    return Compress(MagicMock())
+
+
+def request_(accept_encoding):
+    return MagicMock(headers={'accept-encoding': accept_encoding})
+
+
+@pytest.mark.asyncio
+async def test_compression_middleware(compress, monkeypatch):
+    monkeypatch.setattr(memoriam.compress, 'ENCODINGS', ['br', 'gzip'])
+    data = [{'test': i} for i in range(100)]
+
+    response = await compress.compression_middleware(request_('gzip, deflate, br'), json(data))
+    assert response.headers['content-encoding'] == 'br'
+    assert response.headers['vary'] == 'Accept-Encoding'
+    assert brotli.decompress(response.body) == json(data).body
+
+    # compressed in executor
+    monkeypatch.setattr(memoriam.compress, 'COMPRESS_EXECUTOR_MIN_SIZE', 1)
+    response = await compress.compression_middleware(request_('gzip;q=1.0'), json(data))
+    assert response.headers['content-encoding'] == 'gzip'
+    assert gzip.decompress(response.body) == json(data).body
+
+    # already compressed
+    body = gzip.compress(b'test' * 100)
+    response = await compress.compression_middleware(request_('gzip'), raw(body))
+    assert 'content-encoding' not in response.headers
+    assert response.body == body
+
+    response = await compress.compression_middleware(request_('identity'), json(data))
+    assert 'content-encoding' not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_compression_middleware_zstd(compress):
+    data = [{'test': i} for i in range(100)]
+
+    # zstd is preferred when accepted
+    response = await compress.compression_middleware(request_('gzip, br, zstd'), json(data))
+    assert response.headers['content-encoding'] == 'zstd'
+    assert zstandard.ZstdDecompressor().decompress(response.body) == json(data).body
+
+    # already compressed
+    body = zstandard.ZstdCompressor().compress(b'test' * 100)
+    response = await compress.compression_middleware(request_('zstd'), raw(body))
+    assert 'content-encoding' not in response.headers
+
+    headers = {'content-type': 'application/json'}
+    compressor = get_stream_compressor(request_('zstd'), 200, headers, b'{"test"')
+    body = b''.join(compressor.compress(b'test' * 250) for _ in range(4)) + compressor.flush()
+    assert zstandard.ZstdDecompressor().decompressobj().decompress(body) == b'test' * 1000
+    assert headers['content-encoding'] == 'zstd'
+
+
+def test_stream_compressor():
+    compressor = StreamCompressor('gzip')
+    body = b''.join(compressor.compress(b'test' * 100) for _ in range(10)) + compressor.flush()
+    assert gzip.decompress(body) == b'test' * 1000
+
+    headers = {'content-type': 'application/json', 'content-length': '1000'}
+    compressor = get_stream_compressor(request_('br'), 200, headers, b'{"test"')
+    body = compressor.compress(b'test' * 250) + compressor.flush()
+    assert brotli.decompress(body) == b'test' * 250
+    assert headers == {'content-type': 'application/json', 'content-encoding': 'br', 'vary': 'Accept-Encoding'}
+
+    headers = {'content-type': 'application/octet-stream'}
+    assert not get_stream_compressor(request_('br'), 200, headers, b'\x89PNG\r\n')
+    assert not get_stream_compressor(request_('br'), 404, {'content-type': 'application/json'})
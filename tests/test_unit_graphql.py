@@ -1,12 +1,25 @@
+import copy
+import time
+import asyncio
+import hashlib
+import logging
+from functools import partial
 from unittest.mock import MagicMock, AsyncMock
 
 import pytest
+import ujson as json
 from sanic import Sanic
+from ariadne import ObjectType, make_executable_schema
 from graphql import GraphQLError
 
 import memoriam.config
+from memoriam.config import ARANGO_DEFAULT_LIMIT
 import memoriam.domain.graphql
-from memoriam.domain.graphql import GraphQLResolverEngine
+from memoriam.arangodb import encode_cursor, parse_query, get_root_plan_args, get_ast_variables, PLAN_SLOT
+from memoriam.domain.graphql import GraphQLResolverEngine, AllFieldsExtension
+
+
+log_perf = logging.getLogger('memoriam.perf')
 
 
 @pytest.fixture()
@@ -19,7 +32,7 @@ def app():
     app.ctx.search.build_search_index = MagicMock(return_value='')  # type: ignore
     app.ctx.cache = AsyncMock()
     app.ctx.redis = AsyncMock()
-    app.ctx.authorize = MagicMock()
+    app.ctx.authorize = AsyncMock()
 
     async def get(name, default):
         return default
@@ -32,10 +45,10 @@ def app():
 @pytest.fixture()
 def engine(app):
     domain_db = MagicMock()
-    domain_db.aql = MagicMock(return_value={'result': []})
+    domain_db.aql = AsyncMock(return_value={'result': []})
 
     def set_domains(self, domains):
-        domain_db.aql = MagicMock(return_value={'result': domains})
+        domain_db.aql = AsyncMock(return_value={'result': domains})
 
     GraphQLResolverEngine.set_domains = set_domains  # type: ignore
 
@@ -69,7 +82,7 @@ def engine(app):
             }
 
     db = MagicMock()
-    db.aql = MagicMock(side_effect=aql_result)
+    db.aql = AsyncMock(side_effect=aql_result)
 
     async def get_arangodb(db_name=None):
         return domain_db if db_name else db
@@ -183,6 +196,49 @@ async def test_graphqlengine_rebuild_schema(app, engine):
     assert engine.schemas['test_domain'].type_map.get('TestAb')
     assert engine.schemas['test_domain'].type_map.get('TestAc')
 
+    # unchanged domains are reused, changed domains rebuilt, inactive domains removed
+    schema = engine.schemas['test_domain']
+    assert engine.rebuild_stats['rebuilt'] == ['test_domain']
+
+    engine.set_domains([{**domains[0], '_rev': '2'}])
+    await engine.rebuild_schema(app)
+    assert engine.schemas['test_domain'] is schema
+    assert engine.rebuild_stats['rebuilt'] == []
+    assert engine.rebuild_stats['reused'] == 1
+
+    engine.set_domains([{**domains[0], 'description': 'Changed'}])
+    await engine.rebuild_schema(app)
+    assert engine.schemas['test_domain'] is not schema
+    assert engine.rebuild_stats['rebuilt'] == ['test_domain']
+
+    engine.set_domains([])
+    await engine.rebuild_schema(app)
+    assert 'test_domain' not in engine.schemas
+    assert 'test_domain' not in engine.domain_cache
+
+    # artifacts built by another worker are loaded instead of built
+    stored = {}
+
+    async def store(domain_fingerprint, artifact):
+        stored[domain_fingerprint] = json.loads(json.dumps(artifact))
+
+    engine.artifacts.acquire = AsyncMock(return_value=None)
+    engine.artifacts.store = store
+    engine.set_domains(domains)
+    await engine.rebuild_schema(app)
+    assert len(stored) == 1
+
+    engine.set_domains([])
+    await engine.rebuild_schema(app)
+
+    engine.artifacts.acquire = AsyncMock(side_effect=lambda domain_fingerprint: stored[domain_fingerprint])
+    engine.template = MagicMock()
+    engine.set_domains(domains)
+    await engine.rebuild_schema(app)
+    assert engine.rebuild_stats['shared'] == ['test_domain']
+    engine.template.render.assert_not_called()
+    assert engine.schemas['test_domain'].type_map.get('TestDomainClass')
+
 
 def test_graphqlengine_get_field_type(app, engine):
     engine.db_schema = {
@@ -229,7 +285,7 @@ async def test_graphqlengine_get_object_resolver(app, engine):
         'total': 0,
         'result': [],
     }
-    db.aql = MagicMock(return_value=result)
+    db.aql = AsyncMock(return_value=result)
     memoriam.domain.graphql.get_arangodb = AsyncMock(return_value=db)
     info = MagicMock()
     info.context = MagicMock()
@@ -252,7 +308,7 @@ async def test_graphqlengine_get_object_resolver(app, engine):
     assert db.aql.call_count == 1
 
     result = await resolver(None, info)
-    assert result == {'results_total': 0, 'results': []}
+    assert result == {'results_total': 0, 'results': [], 'next_cursor': None}
     assert db.aql.call_count == 2
 
     data = [{
@@ -264,28 +320,29 @@ async def test_graphqlengine_get_object_resolver(app, engine):
         'total': 1,
         'result': data,
     }
-    db.aql = MagicMock(return_value=result)
+    db.aql = AsyncMock(return_value=result)
     result = await resolver(None, info, _key='test')
     assert result == data[0]
     assert db.aql.call_count == 1
     assert 'RETURN object' in db.aql.call_args.args[0]
 
     result = await resolver(None, info)
-    assert result == {'results_total': 1, 'results': data}
+    assert result == {'results_total': 1, 'results': data, 'next_cursor': None}
     assert db.aql.call_count == 2
     assert 'FILTER object._class' in db.aql.call_args.args[0]
-    assert 'LIMIT 0, %s' % memoriam.config.ARANGO_DEFAULT_LIMIT in db.aql.call_args.args[0]
+    assert 'LIMIT @skip, @limit' in db.aql.call_args.args[0]
+    assert db.aql.call_args.kwargs['bind_vars'] == {'skip': 0, 'limit': memoriam.config.ARANGO_DEFAULT_LIMIT}
 
     result = await resolver(None, info, skip=20, limit=10)
-    assert result == {'results_total': 1, 'results': data}
+    assert result == {'results_total': 1, 'results': data, 'next_cursor': None}
     assert db.aql.call_count == 3
-    assert 'LIMIT 20, 10' in db.aql.call_args.args[0]
+    assert db.aql.call_args.kwargs['bind_vars'] == {'skip': 20, 'limit': 10}
 
     with pytest.raises(GraphQLError):
         result = await resolver(None, info, filter=['test == "a"'])
 
     result = await resolver(None, info, filter=['domain_field == "a"'])
-    assert result == {'results_total': 1, 'results': data}
+    assert result == {'results_total': 1, 'results': data, 'next_cursor': None}
     assert db.aql.call_count == 4
     assert 'FILTER object.field == @object_field_comp_1' in db.aql.call_args.args[0]
 
@@ -293,16 +350,195 @@ async def test_graphqlengine_get_object_resolver(app, engine):
         result = await resolver(None, info, sort=['test'])
 
     result = await resolver(None, info, sort=['domain_field'])
-    assert result == {'results_total': 1, 'results': data}
+    assert result == {'results_total': 1, 'results': data, 'next_cursor': None}
     assert db.aql.call_count == 5
     assert 'SORT object.field, object._key' in db.aql.call_args.args[0]
 
     result = await resolver(None, info, sort=['-domain_field'])
-    assert result == {'results_total': 1, 'results': data}
+    assert result == {'results_total': 1, 'results': data, 'next_cursor': None}
     assert db.aql.call_count == 6
     assert db.aql.call_args.args[0]
     assert 'SORT object.field DESC, object._key' in db.aql.call_args.args[0]
 
+    # sorted results continue after the cursor of the last result of a full page
+    db.aql = AsyncMock(return_value={'total': 1, 'result': [{'_key': 'test', '_class': 'class', '_cursor': ['a', 'test']}]})
+    result = await resolver(None, info, sort=['domain_field'], limit=1)
+    assert result['next_cursor'] == encode_cursor(['domain_field'], ['a', 'test'])
+    assert '_cursor: [object.field, object._key]' in db.aql.call_args.args[0]
+
+    await resolver(None, info, sort=['domain_field'], limit=1, cursor=result['next_cursor'])
+    assert 'FILTER object.field >= @object_cursor_0' in db.aql.call_args.args[0]
+    assert db.aql.call_args.kwargs['bind_vars'] == {'object_cursor_0': 'a', 'object_cursor_1': 'test', 'skip': 0, 'limit': 1}
+
+    with pytest.raises(GraphQLError):
+        await resolver(None, info, sort=['-domain_field'], cursor=result['next_cursor'])
+
+
+@pytest.mark.asyncio
+async def test_graphqlengine_get_object_resolver_combined(app, engine):
+    db = MagicMock()
+    data = [{'_key': 'test', '_class': 'class'}]
+    db.aql = AsyncMock(return_value={'result': [[{'result': data, 'total': None}, {'result': data, 'total': 1}]]})
+    memoriam.domain.graphql.get_arangodb = AsyncMock(return_value=db)
+
+    request = MagicMock()
+    request.app = app
+    request.json = {'query': '{ one: Test(_key: "test") { _key } many: Test(filter: ["domain_field == \\"a\\""]) { results_total results { _key } } }'}
+    request.ctx.aql_plans = {}
+    request.ctx.root_queries = {}
+    request.ctx.root_loader = memoriam.domain.graphql.BatchLoader(partial(engine.load_roots, request.ctx.root_queries))
+
+    def get_info(key):
+        info = MagicMock()
+        info.context = request
+        info.path.key = key
+        info.field_name = 'Test'
+        return info
+
+    domain_spec = {
+        'test': {
+            'resolver': 'entity',
+            'attributes': {
+                'domain_field': 'field'
+            }
+        }
+    }
+    resolver = engine.get_object_resolver(domain_spec, 'test', domain_spec['test'])
+
+    one, many = await asyncio.gather(
+        resolver(None, get_info('one'), _key='test'),
+        resolver(None, get_info('many'), filter=['domain_field == "a"']),
+    )
+    assert one == data[0]
+    assert many == {'results_total': 1, 'results': data, 'next_cursor': None}
+
+    # both root fields are resolved in one query, with prefixed bind vars
+    assert db.aql.call_count == 1
+    query = db.aql.call_args.args[0]
+    assert 'LET root0 = (' in query
+    assert 'DOCUMENT(@root0__id)' in query
+    assert 'FILTER object.field == @root1_object_field_comp_1' in query
+    assert 'LET root1_total = FIRST(' in query
+    assert query.count('RETURN KEEP(object, ["_class","_id","_key"])') == 2
+    assert 'LIMIT @root1_skip, @root1_limit' in query
+    assert db.aql.call_args.kwargs['bind_vars'] == {
+        'root0__id': 'entity/test', 'root1_object_field_comp_1': 'a', 'root1_skip': 0, 'root1_limit': ARANGO_DEFAULT_LIMIT
+    }
+    assert not request.ctx.root_queries
+
+    # AQL plans are cached with the operation by argument shape, values are bound on execution
+    assert len(request.ctx.aql_plans) == 2
+    db.aql = AsyncMock(return_value={'result': [[{'result': data, 'total': None}, {'result': data, 'total': 2}]]})
+    await asyncio.gather(
+        resolver(None, get_info('one'), _key='other'),
+        resolver(None, get_info('many'), filter=['domain_field == "b"'], skip=10, limit=5),
+    )
+    assert len(request.ctx.aql_plans) == 2
+    assert db.aql.call_args.kwargs['bind_vars'] == {
+        'root0__id': 'entity/other', 'root1_object_field_comp_1': 'b', 'root1_skip': 10, 'root1_limit': 5
+    }
+
+
+def test_get_root_plan_args():
+    shape, values, args = get_root_plan_args({'_key': 'test', 'search': 'text', 'skip': 1, 'limit': 2, 'sort': ['name']})
+    assert shape == {'_key': PLAN_SLOT, 'search': PLAN_SLOT, 'sort': ['name']}
+    assert values == []
+    assert args.get('search') == 'text'
+
+    shape, values, _ = get_root_plan_args({'filter': ['name == "a"', 'size > 2']})
+    assert shape == {'filter': [f'name == {json.dumps(PLAN_SLOT + "0")}', f'size > {json.dumps(PLAN_SLOT + "1")}']}
+    assert values == ['"a"', '2']
+
+    ast = parse_query('query ($key: String, $limit: Int) { Test(_key: $key) { related(limit: $limit) { _key } } }').subtree('Test')
+    assert get_ast_variables(ast, {'key': 'test', 'limit': 2}) == {'limit': 2}
+
+
+@pytest.mark.asyncio
+async def test_graphqlengine_get_object_resolver_plan_cache_size(app, engine, monkeypatch):
+    monkeypatch.setattr(memoriam.domain.graphql, 'GRAPHQL_PLAN_CACHE_SIZE', 2)
+    db = MagicMock()
+    db.aql = AsyncMock(return_value={'result': [[{'result': [], 'total': None}]]})
+    memoriam.domain.graphql.get_arangodb = AsyncMock(return_value=db)
+
+    request = MagicMock()
+    request.app = app
+    request.json = {'query': '{ many: Test { results { _key } } }'}
+    request.ctx.aql_plans = {}
+    request.ctx.root_queries = {}
+    request.ctx.root_loader = memoriam.domain.graphql.BatchLoader(partial(engine.load_roots, request.ctx.root_queries))
+
+    info = MagicMock()
+    info.context = request
+    info.path.key = 'many'
+    info.field_name = 'Test'
+
+    domain_spec = {'test': {'resolver': 'entity', 'attributes': {'domain_field': 'field'}}}
+    resolver = engine.get_object_resolver(domain_spec, 'test', domain_spec['test'])
+
+    for sort in (['domain_field'], ['-domain_field'], ['_key']):
+        await resolver(None, info, sort=sort)
+
+    assert [json.loads(key[1]) for key in request.ctx.aql_plans] == [{'sort': ['-domain_field']}, {'sort': ['_key']}]
+
+
+@pytest.mark.asyncio
+async def test_graphqlengine_get_object_resolver_count(app, engine):
+    db = MagicMock()
+    data = [{'_key': 'test', '_class': 'class'}]
+    memoriam.domain.graphql.get_arangodb = AsyncMock(return_value=db)
+    cached = {}
+
+    async def get(name, default=None):
+        return cached.get(name, default)
+
+    async def set(name, value, expire=None):
+        cached[name] = value
+
+    app.ctx.cache.get = get
+    app.ctx.cache.set = set
+
+    request = MagicMock()
+    request.app = app
+    request.json = {'query': '{ many: Test { results_total results { _key } } }'}
+    request.ctx.aql_plans = {}
+    request.ctx.root_queries = {}
+    request.ctx.root_loader = memoriam.domain.graphql.BatchLoader(partial(engine.load_roots, request.ctx.root_queries))
+
+    info = MagicMock()
+    info.context = request
+    info.path.key = 'many'
+    info.field_name = 'Test'
+
+    domain_spec = {
+        'test': {
+            'resolver': 'entity',
+            'attributes': {
+                'domain_field': 'field'
+            }
+        }
+    }
+    resolver = engine.get_object_resolver(domain_spec, 'test', domain_spec['test'])
+
+    # the count subquery is skipped without a count
+    db.aql = AsyncMock(return_value={'result': [[{'result': data, 'total': None}]]})
+    result = await resolver(None, info, count='none')
+    assert result['results_total'] is None
+    assert 'root0_total' not in db.aql.call_args.args[0]
+
+    # cached totals are counted once, then reused
+    db.aql = AsyncMock(return_value={'result': [[{'result': data, 'total': 5}]]})
+    result = await resolver(None, info, count='cached')
+    assert result['results_total'] == 5
+    assert 'LET root0_total = FIRST(' in db.aql.call_args.args[0]
+
+    db.aql = AsyncMock(return_value={'result': [[{'result': data, 'total': None}]]})
+    result = await resolver(None, info, count='cached')
+    assert result['results_total'] == 5
+    assert 'root0_total' not in db.aql.call_args.args[0]
+
+    # the count mode does not change the AQL plan
+    assert len(request.ctx.aql_plans) == 1
+
 
 @pytest.mark.asyncio
 async def test_graphqlengine_get_field_resolver(app, engine):
@@ -322,16 +558,17 @@ async def test_graphqlengine_get_field_resolver(app, engine):
 async def test_graphqlengine_get_edge_resolver(app, engine):
     data = {'random': 'data'}
     db = MagicMock()
-    result = {
-        'total': 1,
-        'result': [data],
-    }
-    db.aql = MagicMock(return_value=result)
+
+    async def aql(query, bind_vars=None, **kwargs):
+        return {'result': [{'_id': _id, 'total': 1, 'results': [data]} for _id in bind_vars['_ids']]}
+
+    db.aql = AsyncMock(side_effect=aql)
     memoriam.domain.graphql.get_arangodb = AsyncMock(return_value=db)
     info = MagicMock()
     info.context = MagicMock()
     info.context.app = app
     info.context.app.ctx.authorize = app.ctx.authorize
+    info.context.ctx.edge_loaders = {}
     domain_spec = {
         'test': {
             'resolver': 'entity',
@@ -356,6 +593,18 @@ async def test_graphqlengine_get_edge_resolver(app, engine):
     result = await resolver(obj, info)
     assert result == {'results_total': 1, 'results': [data]}
 
+    # sibling objects are batched in one query
+    db.aql.reset_mock()
+    results = await asyncio.gather(*[resolver({'_id': f'test/{i}'}, info) for i in range(10)])
+    assert results == [{'results_total': 1, 'results': [data]}] * 10
+    db.aql.assert_awaited_once()
+    assert db.aql.await_args.kwargs['bind_vars']['_ids'] == [f'test/{i}' for i in range(10)]
+
+    # different arguments are batched separately
+    db.aql.reset_mock()
+    await asyncio.gather(resolver({'_id': 'test/1'}, info, limit=1), resolver({'_id': 'test/2'}, info, limit=2))
+    assert db.aql.await_count == 2
+
 
 @pytest.mark.asyncio
 async def test_graphqlengine_get_mutation_resolver(app, engine):
@@ -374,7 +623,7 @@ async def test_graphqlengine_get_mutation_resolver(app, engine):
         'total': 0,
         'result': [wrapped_data],
     }
-    db.aql = MagicMock(return_value=result)
+    db.aql = AsyncMock(return_value=result)
     memoriam.domain.graphql.get_arangodb = AsyncMock(return_value=db)
     info = MagicMock()
     info.context = MagicMock()
@@ -429,7 +678,7 @@ async def test_graphqlengine_get_edge_mutation_resolver(app, engine):
         'total': 0,
         'result': [wrapped_data],
     }
-    db.aql = MagicMock(return_value=result)
+    db.aql = AsyncMock(return_value=result)
     memoriam.domain.graphql.get_arangodb = AsyncMock(return_value=db)
 
     info = MagicMock()
@@ -478,3 +727,173 @@ async def test_graphqlengine_graphql_server(app, engine, engine_cache):
     data = {'query': '{ version }'}
     request, response = await app.asgi_client.post('/test_domain/graphql', json=data)
     assert response.status == 404, response.text
+
+
+@pytest.mark.asyncio
+async def test_graphqlengine_persisted_queries(app, engine):
+    engine.set_domains([{
+        'label': 'TestDomain',
+        'description': '',
+        'active': True,
+        'schema': 'test_class: {description: "", resolver: entity, attributes: {}, relations: {}}'
+    }])
+
+    persisted = {}
+    expiry = {}
+
+    async def redis_set(key, value, ex=None):
+        persisted[key] = value.encode()
+        expiry[key] = ex
+
+    async def redis_getex(key, ex=None):
+        if key in persisted:
+            expiry[key] = ex
+        return persisted.get(key)
+
+    app.ctx.redis.set = redis_set
+    app.ctx.redis.getex = redis_getex
+
+    text = '{ version }'
+    query_hash = hashlib.sha256(text.encode()).hexdigest()
+    extensions = {'persistedQuery': {'version': 1, 'sha256Hash': query_hash}}
+
+    _, response = await app.asgi_client.post('/test_domain/graphql', json={'extensions': extensions})
+    assert response.status == 400, response.text
+    assert response.json['errors'][0]['extensions']['code'] == 'PERSISTED_QUERY_NOT_FOUND'
+
+    _, response = await app.asgi_client.post('/test_domain/graphql', json={'query': '{ other }', 'extensions': extensions})
+    assert response.status == 400, response.text
+    assert response.json['errors'][0]['extensions']['code'] == 'PERSISTED_QUERY_HASH_MISMATCH'
+
+    _, response = await app.asgi_client.post('/test_domain/graphql', json={'query': text, 'extensions': extensions})
+    assert response.status == 200, response.text
+    assert response.json == {'data': {'version': None}}
+
+    key = f'memoriam_graphql_query:{query_hash}'
+    assert expiry[key] == memoriam.domain.graphql.PERSISTED_QUERY_TTL
+
+    # registered queries are resolved by hash, refreshing their expiry
+    expiry[key] = None
+    _, response = await app.asgi_client.post('/test_domain/graphql', json={'extensions': extensions})
+    assert response.status == 200, response.text
+    assert response.json == {'data': {'version': None}}
+    assert expiry[key] == memoriam.domain.graphql.PERSISTED_QUERY_TTL
+
+    # invalid queries are not cached, and reported by ariadne
+    _, response = await app.asgi_client.post('/test_domain/graphql', json={'query': '{ other }'})
+    assert response.status == 400, response.text
+    assert 'other' in response.json['errors'][0]['message']
+
+
+def test_graphqlengine_get_operation(engine):
+    query = ObjectType('Query')
+    schema = make_executable_schema('type Query { version: String }', query)
+
+    operation = engine.get_operation('test_domain', schema, '{ version }')
+    assert operation['document'].definitions
+    assert operation['aql_plans'] == {}
+    assert engine.get_operation('test_domain', schema, '{ version }') is operation
+
+    assert engine.get_operation('test_domain', schema, '{ other }') is None
+    assert engine.get_operation('test_domain', schema, '{ version') is None
+    assert len(engine.operations) == 1
+
+
+@pytest.mark.asyncio
+async def test_graphqlengine_bulk_mutations(app, engine):
+    engine.set_domains([{
+        'label': 'TestDomain',
+        'description': '',
+        'active': True,
+        'schema': 'test_class: {description: "", resolver: entity, attributes: {test_field: data}, relations: {}}'
+    }])
+
+    db = await memoriam.domain.graphql.get_arangodb()
+    created = {'_id': 'entity/1', '_key': '1', '_class': 'test_class', 'data': 'a'}
+    updated = {'_id': 'entity/2', '_key': '2', '_class': 'test_class', 'data': 'c'}
+    db.bulk_create = AsyncMock(return_value=[
+        {'new': created},
+        {'error': True, 'errorNum': 1210, 'errorMessage': 'unique constraint violated'},
+    ])
+    db.bulk_update = AsyncMock(return_value=[{'old': updated, 'new': updated}])
+
+    # sibling mutations of the same type are coalesced into one bulk write
+    query = '''
+    mutation {
+        a: createTestClass(input: {test_field: "a"}) { _key }
+        b: createTestClass(input: {test_field: "b"}) { _key }
+        c: updateTestClass(_key: "2", input: {test_field: "c"}) { _key }
+    }
+    '''
+    request, response = await app.asgi_client.post('/test_domain/graphql', json={'query': query})
+    assert response.json['data'] == {'a': {'_key': '1'}, 'b': None, 'c': {'_key': 'test'}}
+    assert response.json['errors'][0]['message'] == 'unique constraint violated'
+    assert response.json['errors'][0]['path'] == ['b']
+    assert db.bulk_create.await_count == 1
+    collection, data = db.bulk_create.call_args.args
+    assert collection == 'entity'
+    assert [item['data'] for item in data] == ['a', 'b']
+    assert db.bulk_update.await_count == 0
+    assert 'UPDATE' in db.aql.call_args.args[0]
+
+    # list input mutations are written in one bulk write
+    query = '''
+    mutation {
+        updateTestClassBatch(mergeObjects: true, inputs: [{_key: "2", input: {test_field: "c"}}]) { _key test_field }
+    }
+    '''
+    request, response = await app.asgi_client.post('/test_domain/graphql', json={'query': query})
+    assert response.json['data'] == {'updateTestClassBatch': [{'_key': '2', 'test_field': 'c'}]}
+    collection, data = db.bulk_update.call_args.args
+    assert data == [{'data': 'c', '_key': '2'}]
+    assert db.bulk_update.call_args.kwargs['merge'] is True
+
+
+def test_allfields_post_process():
+    domain_cache = {'test_domain': {'TestClass': {'resolver': 'entity', 'attributes': {'test_field': 'data'}}}}
+    raw_obj = {'_id': 'entity/1', '_key': '1', '__typename': 'TestClass', 'data': 'a', 'extra': 'x'}
+    result = {
+        'data': {'TestClassList': {'results': [{'_key': '1', '_all': raw_obj, 'test_field': 'b'}, None]}},
+        'extensions': {'all_fields': [['TestClassList', 'results', 0, '_all'], ['TestClassList', 'results', 1, '_all']]},
+    }
+
+    result = AllFieldsExtension.post_process(result, 'test_domain', domain_cache)
+    assert result == {'data': {'TestClassList': {'results': [
+        {'_key': '1', 'test_field': 'b', 'extra': 'x', '__typename': 'TestClass'}, None
+    ]}}}
+
+    # cached class specs and resolved objects are left untouched
+    assert 'permissive' not in domain_cache['test_domain']['TestClass']
+    assert raw_obj['__typename'] == 'TestClass'
+
+
+def test_allfields_post_process_benchmark():
+    domain_cache = {'test_domain': {'TestClass': {'resolver': 'entity', 'attributes': {'test_field': 'data'}}}}
+    spec = copy.deepcopy(domain_cache)
+
+    def post_process(size):
+        result = {
+            'data': {'TestClassList': {'results': [
+                {'_key': f'{i}', 'test_field': 'a', '_all': {'_key': f'{i}', '__typename': 'TestClass', 'data': 'a', 'extra': i}}
+                for i in range(size)
+            ]}},
+            'extensions': {'all_fields': [['TestClassList', 'results', i, '_all'] for i in range(size)]},
+        }
+
+        start = time.perf_counter()
+        result = AllFieldsExtension.post_process(result, 'test_domain', domain_cache)
+        duration = time.perf_counter() - start
+
+        assert result['data']['TestClassList']['results'][-1] == {
+            '_key': f'{size - 1}', 'extra': size - 1, '__typename': 'TestClass', 'test_field': 'a'
+        }
+        # cached class specs are not made permissive
+        assert domain_cache == spec
+        return duration
+
+    small = min(post_process(2000) for _ in range(3))
+    large = min(post_process(20000) for _ in range(3))
+    log_perf.debug(f'AllFields post_process: {20000 / large:.0f} objects/s')
+
+    # a single linear pass, previously quadratic in the number of `_all` fields
+    assert large / small < 30, f'10x `_all` fields took {large / small:.1f}x longer'
@@ -45,6 +45,8 @@ def test_init_openapi(app, api):
     assert api.validators
     assert api.validators['/api/data:get']
     assert api.validators['/api/data:post']
+    assert api.validators['/api/data:post']['body_validator']
+    assert api.validators['/api/data/<_key>:get']['parameters'][0]['validator']
 
 
 @pytest.mark.asyncio
@@ -72,6 +74,20 @@ def test_ref_resolver(app, api):
     resolved = api.ref_resolver(test_ref)
     assert resolved == api.specs['default']['components']['schemas']['data']
 
+    # nested refs are resolved without modifying the spec
+    test_ref = {'type': 'array', 'items': {'$ref': '#/components/schemas/data'}}
+    resolved = api.ref_resolver(test_ref)
+    assert resolved['items'] == api.specs['default']['components']['schemas']['data']
+    assert test_ref['items'] == {'$ref': '#/components/schemas/data'}
+
+    # circular refs
+    api.specs['default']['components']['schemas']['node'] = {
+        'type': 'object',
+        'properties': {'child': {'$ref': '#/components/schemas/node'}}
+    }
+    resolved = api.ref_resolver({'$ref': '#/components/schemas/node'})
+    assert resolved == {'type': 'object', 'properties': {'child': {}}}
+
 
 async def list_data(request):
     return response.json({'status': 'ok'})
@@ -141,3 +157,6 @@ async def test_openapi_endpoints(app, api):
     assert response.json
     assert response.json['status'] == 'ok'
     assert response.json['_key'] == '123'
+
+    assert len(api.route_validators) == 2
+    assert api.route_validators[('api/data', 'POST', None, None, None)] is api.validators['/api/data:post']
@@ -0,0 +1,57 @@
+import httpx
+import pytest
+
+from sanic import Sanic
+
+import memoriam.proxy
+from memoriam.proxy import get_reverse_proxy, get_proxy_client, close_proxy_clients
+
+
+@pytest.fixture()
+def non_mocked_hosts():
+    return ['mockserver']  # sanic asgi client
+
+
+@pytest.fixture()
+def app():
+    app = Sanic('test_unit_proxy')
+    app.config.AUTO_EXTEND = False
+    app.add_route(get_reverse_proxy('http://upstream/buffered', 'Test'), '/buffered/<path:path>', methods=['GET', 'POST'], name='buffered')
+    app.add_route(get_reverse_proxy('http://upstream/streamed', 'Test', stream=True), '/streamed/<path:path>', methods=['GET', 'POST'], stream=True, name='streamed')
+    return app
+
+
+@pytest.mark.asyncio
+async def test_get_proxy_client():
+    client = get_proxy_client('http://upstream/a')
+    assert get_proxy_client('http://upstream/b') is client
+    assert get_proxy_client('http://other/a') is not client
+
+    await close_proxy_clients()
+    assert not memoriam.proxy._clients
+
+
+@pytest.mark.asyncio
+async def test_reverse_proxy(app, httpx_mock):
+    httpx_mock.add_response(url='http://upstream/buffered/test?a=1', content=b'buffered')
+    _, response = await app.asgi_client.get('/buffered/test?a=1')
+    assert response.status == 200
+    assert response.body == b'buffered'
+
+    async def upload(request):
+        assert request.headers['content-length'] == '6'
+        assert await request.aread() == b'upload'
+        return httpx.Response(201, content=b'streamed' * 1000)
+
+    httpx_mock.add_callback(upload, url='http://upstream/streamed/test')
+    _, response = await app.asgi_client.post('/streamed/test', content=b'upload')
+    assert response.status == 201
+    assert response.body == b'streamed' * 1000
+
+    # streamed responses are compressed incrementally
+    httpx_mock.add_response(url='http://upstream/streamed/test', json=[{'test': i} for i in range(100)])
+    _, response = await app.asgi_client.get('/streamed/test', headers={'accept-encoding': 'gzip'})
+    assert response.headers['content-encoding'] == 'gzip'
+    assert response.json == [{'test': i} for i in range(100)]
+
+    await close_proxy_clients()
@@ -6,10 +6,11 @@ from unittest.mock import MagicMock, AsyncMock
 import pytest
 from sanic import Sanic
 from sanic.request import RequestParameters
-from sanic.exceptions import SanicException
+from sanic.exceptions import SanicException, InvalidUsage
 
 import memoriam.config
 import memoriam.domain.rest
+from memoriam.arangodb import AQLCursor, encode_cursor
 from memoriam.openapi import OpenAPI
 from memoriam.domain.rest import RESTResolverEngine
 
@@ -23,7 +24,7 @@ def app():
     app.ctx.search.build_search_index = MagicMock(return_value='')  # type: ignore
     app.ctx.cache = AsyncMock()
     app.ctx.redis = AsyncMock()
-    app.ctx.authorize = MagicMock()
+    app.ctx.authorize = AsyncMock()
 
     async def get(name, default=None):
         if name == 'rest_schema_rebuilt':
@@ -76,7 +77,7 @@ def engine(app, openapi, db_mock):
 @pytest.fixture()
 def db_mock():
     domain_db = MagicMock()
-    domain_db.aql = MagicMock(return_value={'result': []})
+    domain_db.aql = AsyncMock(return_value={'result': []})
 
     test_obj = {'_id': 'test/test', '_rev': '1', '_key': 'test', '_class': 'test', 'field': 'data'}
 
@@ -113,7 +114,7 @@ def db_mock():
             }
 
     db = MagicMock()
-    db.aql = MagicMock(side_effect=aql_result)
+    db.aql = AsyncMock(side_effect=aql_result)
 
     async def get_arangodb(db_name=None):
         return domain_db if db_name else db
@@ -138,6 +139,46 @@ async def test_openapiengine_rebuild_schema(app, engine, db_mock):
     spec = await engine.rebuild_schema(app)
 
 
+@pytest.mark.asyncio
+async def test_openapiengine_rebuild_schema_incremental(app, engine, db_mock):
+    domain = {
+        'label': 'Test domain',
+        'description': 'Test description',
+        'active': True,
+        'schema': 'test_name: {description: "", resolver: entity, attributes: {test_field: field}, relations: {}}'
+    }
+    domain_db = MagicMock()
+    domain_db.aql = AsyncMock(return_value={'result': [domain]})
+
+    async def get_arangodb(db_name=None):
+        return domain_db if db_name else db_mock
+
+    memoriam.domain.rest.get_arangodb = get_arangodb
+    engine.openapi.init_spec = MagicMock()
+
+    await engine.rebuild_schema(app)
+    assert engine.rebuild_stats['rebuilt'] == ['test_domain']
+    assert engine.openapi.init_spec.call_count == 1
+    assert engine.search_translators['test_name'] is engine.translators['test_domain']['test_name']
+
+    # unchanged domains are reused
+    domain_db.aql = AsyncMock(return_value={'result': [{**domain, '_rev': '2'}]})
+    await engine.rebuild_schema(app)
+    assert engine.rebuild_stats['rebuilt'] == []
+    assert engine.openapi.init_spec.call_count == 1
+
+    domain_db.aql = AsyncMock(return_value={'result': [{**domain, 'description': 'Changed'}]})
+    await engine.rebuild_schema(app)
+    assert engine.rebuild_stats['rebuilt'] == ['test_domain']
+    assert engine.openapi.init_spec.call_count == 2
+
+    domain_db.aql = AsyncMock(return_value={'result': []})
+    await engine.rebuild_schema(app)
+    assert 'test_domain' not in engine.domain_cache
+    assert engine.search_translators == {}
+    assert 'test_domain' not in engine.openapi.specs
+
+
 @pytest.mark.asyncio
 async def test_domain_obj_list_resolver(app, engine, db_mock):
     request = MagicMock()
@@ -161,7 +202,188 @@ async def test_domain_obj_list_resolver(app, engine, db_mock):
     result = await engine.domain_obj_list_resolver(request, **kwargs)
 
     assert result.status == 200
-    assert result.body == b'{"skip":10,"limit":10,"results_total":0,"results":[]}'
+    assert result.body == b'{"skip":10,"limit":10,"results_total":0,"results":[],"next_cursor":null}'
+
+
+@pytest.mark.asyncio
+async def test_domain_obj_list_resolver_stream(app, engine, db_mock):
+    client = MagicMock()
+    client._request = AsyncMock(side_effect=lambda *args: {'result': [{'_class': 'test', 'test_field': 2}], 'hasMore': False})
+    db_mock.cursor = AsyncMock(side_effect=lambda *args, **kwargs: AQLCursor(client, {
+        'id': '1',
+        'result': [{'_class': 'test', 'test_field': 1}],
+        'hasMore': True,
+        'extra': {'stats': {'fullCount': 2}}
+    }))
+
+    request = MagicMock()
+    request.app = app
+    request.args = RequestParameters({
+        'field': ['test_field'],
+        'stream': ['json'],
+    })
+    kwargs = {
+        'domain': 'test_domain',
+        'domain_class': 'test_name',
+    }
+
+    stream = MagicMock()
+    stream.write = AsyncMock()
+
+    result = await engine.domain_obj_list_resolver(request, **kwargs)
+    assert result.headers['x-results-total'] == '2'
+    await result.streaming_fn(stream)
+    body = ''.join(call.args[0] for call in stream.write.call_args_list)
+    assert json.loads(body) == {
+        'skip': 0,
+        'limit': 100,
+        'results_total': 2,
+        'results': [{'test_field': 1}, {'test_field': 2}],
+    }
+
+    request.args = RequestParameters({
+        'field': ['test_field'],
+        'stream': ['ndjson'],
+    })
+    stream.write = AsyncMock()
+
+    result = await engine.domain_obj_list_resolver(request, **kwargs)
+    assert result.content_type == 'application/x-ndjson'
+    await result.streaming_fn(stream)
+    body = ''.join(call.args[0] for call in stream.write.call_args_list)
+    assert body == '{"test_field":1}\n{"test_field":2}\n'
+
+
+@pytest.mark.asyncio
+async def test_domain_obj_list_resolver_cursor(app, engine, db_mock):
+    db_mock.aql = AsyncMock(return_value={
+        'total': 3,
+        'result': [
+            {'_key': '1', '_class': 'test_name', 'field': 'a', '_cursor': ['a', '1']},
+            {'_key': '2', '_class': 'test_name', 'field': 'b', '_cursor': ['b', '2']},
+        ]
+    })
+    request = MagicMock()
+    request.app = app
+    request.args = RequestParameters({'sort': ['test_field'], 'limit': ['2']})
+    kwargs = {
+        'domain': 'test_domain',
+        'domain_class': 'test_name',
+    }
+
+    result = await engine.domain_obj_list_resolver(request, **kwargs)
+    body = json.loads(result.body)
+    assert body['results'][-1] == {'_key': '2', '_class': 'test_name', 'test_field': 'b'}
+    assert body['next_cursor'] == encode_cursor(['test_field'], ['b', '2'])
+
+    # the next page continues after the sort values of the last result
+    request.args = RequestParameters({'sort': ['test_field'], 'limit': ['2'], 'cursor': [body['next_cursor']]})
+    await engine.domain_obj_list_resolver(request, **kwargs)
+    query = db_mock.aql.call_args.args[0]
+    bind_vars = db_mock.aql.call_args.kwargs['bind_vars']
+    assert 'FILTER object.field >= @object_cursor_0' in query
+    assert 'LIMIT @skip, @limit' in query
+    assert bind_vars['limit'] == 2
+    assert bind_vars['object_cursor_0'] == 'b'
+    assert bind_vars['object_cursor_1'] == '2'
+
+    # cursors are only valid for the sort they were returned for
+    request.args = RequestParameters({'sort': ['-test_field'], 'cursor': [body['next_cursor']]})
+    with pytest.raises(InvalidUsage):
+        await engine.domain_obj_list_resolver(request, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_domain_obj_list_resolver_count(app, engine, db_mock):
+    db_mock.aql = AsyncMock(return_value={'total': 3, 'result': []})
+    cached = {}
+
+    async def get(name, default=None):
+        return cached.get(name, default)
+
+    async def set(name, value, expire=None):
+        cached[name] = value
+
+    app.ctx.cache.get = get
+    app.ctx.cache.set = set
+
+    request = MagicMock()
+    request.app = app
+    kwargs = {
+        'domain': 'test_domain',
+        'domain_class': 'test_name',
+    }
+
+    # fullCount is not requested without a count
+    request.args = RequestParameters({'count': ['none']})
+    result = await engine.domain_obj_list_resolver(request, **kwargs)
+    assert json.loads(result.body)['results_total'] is None
+    assert db_mock.aql.call_args.kwargs['total'] is False
+
+    request.args = RequestParameters({'count': ['exact']})
+    result = await engine.domain_obj_list_resolver(request, **kwargs)
+    assert json.loads(result.body)['results_total'] == 3
+    assert db_mock.aql.call_args.kwargs['total'] is True
+
+    # cached totals are counted once, then reused for the same filters
+    request.args = RequestParameters({'count': ['cached']})
+    result = await engine.domain_obj_list_resolver(request, **kwargs)
+    assert json.loads(result.body)['results_total'] == 3
+    assert db_mock.aql.call_args.kwargs['total'] is True
+
+    db_mock.aql = AsyncMock(return_value={'total': 0, 'result': []})
+    request.args = RequestParameters({'count': ['cached'], 'skip': ['10']})
+    result = await engine.domain_obj_list_resolver(request, **kwargs)
+    assert json.loads(result.body)['results_total'] == 3
+    assert db_mock.aql.call_args.kwargs['total'] is False
+
+    request.args = RequestParameters({'count': ['cached'], 'filter': ['test_field == "test"']})
+    result = await engine.domain_obj_list_resolver(request, **kwargs)
+    assert json.loads(result.body)['results_total'] == 0
+    assert db_mock.aql.call_args.kwargs['total'] is True
+
+    request.args = RequestParameters({'count': ['all']})
+    with pytest.raises(InvalidUsage):
+        await engine.domain_obj_list_resolver(request, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_domain_obj_list_resolver_query_plans(app, engine, db_mock):
+    request = MagicMock()
+    request.app = app
+    kwargs = {
+        'domain': 'test_domain',
+        'domain_class': 'test_name',
+    }
+
+    request.args = RequestParameters({'filter': ['test_field == "a"'], 'sort': ['test_field'], 'skip': ['10']})
+    await engine.domain_obj_list_resolver(request, **kwargs)
+    query = db_mock.aql.call_args.args[0]
+    assert db_mock.aql.call_args.kwargs['bind_vars'] == {'object_field_comp_1': 'a', 'skip': 10, 'limit': 100}
+
+    # the same query shape reuses the query, binding its values
+    request.args = RequestParameters({'filter': ['test_field == ["b", "c"]'], 'sort': ['test_field'], 'limit': ['5']})
+    await engine.domain_obj_list_resolver(request, **kwargs)
+    assert db_mock.aql.call_args.args[0] is query
+    assert db_mock.aql.call_args.kwargs['bind_vars'] == {'object_field_comp_1': ['b', 'c'], 'skip': 0, 'limit': 5}
+    assert len(engine.query_plans) == 1
+
+    request.args = RequestParameters({'filter': ['test_field != "a"'], 'sort': ['test_field']})
+    await engine.domain_obj_list_resolver(request, **kwargs)
+    assert db_mock.aql.call_args.args[0] != query
+    assert len(engine.query_plans) == 2
+
+    request.args = RequestParameters({'filter': ['test_field == invalid'], 'sort': ['test_field']})
+    with pytest.raises(InvalidUsage):
+        await engine.domain_obj_list_resolver(request, **kwargs)
+
+    request.args = RequestParameters({'filter': ['unknown == "a"']})
+    with pytest.raises(InvalidUsage):
+        await engine.domain_obj_list_resolver(request, **kwargs)
+
+    # plans of rebuilt domains are removed
+    engine.remove_query_plans('test_domain')
+    assert not engine.query_plans
 
 
 @pytest.mark.asyncio
@@ -261,7 +483,29 @@ async def test_relation_list_resolver(app, engine, db_mock):
     result = await engine.relation_list_resolver(request, **kwargs)
 
     assert result.status == 200
-    assert result.body == b'{"skip":10,"limit":10,"results_total":0,"results":[]}'
+    assert result.body == b'{"skip":10,"limit":10,"results_total":0,"results":[],"next_cursor":null}'
+
+
+@pytest.mark.asyncio
+async def test_relation_list_resolver_query_plans(app, engine, db_mock):
+    engine.domain_cache['test_domain']['test_name']['relations']['list'] = ['test_name', 'origin', 'outbound']
+
+    request = MagicMock()
+    request.app = app
+    request.args = RequestParameters({})
+    kwargs = {
+        'domain': 'test_domain',
+        'domain_class': 'test_name',
+    }
+
+    await engine.domain_obj_list_resolver(request, **kwargs)
+    list_query = db_mock.aql.call_args.args[0]
+
+    # a relation named `list` does not share the plan of the class listing
+    await engine.relation_list_resolver(request, **kwargs, _key='test', relation='list')
+    assert db_mock.aql.call_args.args[0] != list_query
+    assert 'origin' in db_mock.aql.call_args.args[0]
+    assert len(engine.query_plans) == 2
 
 
 @pytest.mark.asyncio
@@ -432,6 +676,7 @@ async def test_changes_resolver(app, engine, db_mock):
     request.app.ctx.cache = app.ctx.cache
     request.app.ctx.authorize = app.ctx.authorize
     request.app.add_task = MagicMock()
+    request.args = RequestParameters({})
     kwargs = {
         'domain': 'test_domain',
         'domain_class': 'test_name',
@@ -0,0 +1,81 @@
+import asyncio
+from unittest.mock import MagicMock, AsyncMock
+
+import pytest
+import ujson as json
+from sanic import Sanic
+
+from memoriam.domain.schema_events import SchemaEvents, publish_schema_change, SCHEMA_EVENTS_CHANNEL
+
+
+@pytest.fixture()
+def app():
+    app = Sanic('test_unit_schema_events')
+    app.ctx.redis = AsyncMock()
+    app.ctx.rest_engine = MagicMock()
+    app.ctx.rest_engine.rebuild_schema = AsyncMock()
+    app.ctx.graphql_engine = MagicMock()
+    app.ctx.graphql_engine.rebuild_schema = AsyncMock()
+    return app
+
+
+@pytest.mark.asyncio
+async def test_publish_schema_change(app):
+    await publish_schema_change(app.ctx.redis, 'test_domain')
+    channel, event = app.ctx.redis.publish.call_args.args
+    assert channel == SCHEMA_EVENTS_CHANNEL
+    assert json.loads(event)['domain'] == 'test_domain'
+
+
+@pytest.mark.asyncio
+async def test_schema_events_rebuild(app):
+    schema_events = SchemaEvents(app)
+
+    # events during a rebuild are coalesced into one more rebuild
+    schema_events.rebuild()
+    schema_events.rebuild()
+    schema_events.rebuild()
+    await schema_events.rebuilding
+    assert app.ctx.rest_engine.rebuild_schema.await_count == 1
+    assert app.ctx.graphql_engine.rebuild_schema.await_count == 1
+
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def slow_rebuild(app):
+        started.set()
+        await release.wait()
+
+    app.ctx.rest_engine.rebuild_schema = AsyncMock(side_effect=slow_rebuild)
+    schema_events.rebuild()
+    await started.wait()
+    schema_events.rebuild()
+    schema_events.rebuild()
+    release.set()
+    await schema_events.rebuilding
+    assert app.ctx.rest_engine.rebuild_schema.await_count == 2
+    assert app.ctx.graphql_engine.rebuild_schema.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_schema_events_listen(app):
+    schema_events = SchemaEvents(app)
+    schema_events.rebuild = MagicMock()
+
+    async def listen():
+        yield {'type': 'subscribe', 'data': 1}
+        yield {'type': 'message', 'data': json.dumps({'domain': 'test_domain'})}
+
+    pubsub = MagicMock()
+    pubsub.__aenter__ = AsyncMock(return_value=pubsub)
+    pubsub.__aexit__ = AsyncMock(return_value=False)
+    pubsub.subscribe = AsyncMock()
+    pubsub.listen = listen
+    app.ctx.redis.pubsub = MagicMock(return_value=pubsub)
+
+    await schema_events.subscribe(app)
+    await asyncio.sleep(0.01)
+    await schema_events.unsubscribe(app)
+
+    pubsub.subscribe.assert_awaited_with(SCHEMA_EVENTS_CHANNEL)
+    assert schema_events.rebuild.call_count >= 1
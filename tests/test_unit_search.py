@@ -1,8 +1,15 @@
+from unittest.mock import MagicMock, AsyncMock
+
 import pytest
+import ujson as json
 from sanic import Sanic
+from sanic.request import RequestParameters
 
 import memoriam.config
-from memoriam.domain.search import ArangoSearch
+import memoriam.domain.search
+from memoriam.arangodb import get_translators
+from memoriam.domain.search import ArangoSearch, cross_domain_search
+from memoriam.utils import load_yaml
 
 
 @pytest.fixture()
@@ -59,3 +66,29 @@ def test_build_search_index(search):
     }
     _index = search.build_search_index(collection, obj)
     assert _index == 'some data more data'
+
+
+@pytest.mark.asyncio
+async def test_cross_domain_search_count(app, search, monkeypatch):
+    db = MagicMock()
+    db.aql = AsyncMock(return_value={'total': 0, 'result': [{'_key': '1', '_class': 'test', 'field': 'a'}]})
+    monkeypatch.setattr(memoriam.domain.search, 'get_arangodb', AsyncMock(return_value=db))
+
+    domain_cache = {'test_domain': {'test': {'resolver': 'entity', 'attributes': {'test_field': 'field'}}}}
+    app.ctx.rest_engine = MagicMock()
+    app.ctx.rest_engine.db_schema = load_yaml(path=memoriam.config.ARANGO_SCHEMA_PATH)
+    app.ctx.rest_engine.domain_cache = domain_cache
+    app.ctx.rest_engine.search_translators = get_translators(domain_cache['test_domain'])
+
+    request = MagicMock()
+    request.app = app
+    request.args = RequestParameters({'search': ['needle'], 'count': ['none']})
+
+    result = await cross_domain_search(request)
+    assert json.loads(result.body) == {
+        'skip': 0,
+        'limit': 100,
+        'results_total': None,
+        'results': [{'_key': '1', '_class': 'test', 'test_field': 'a'}],
+    }
+    assert db.aql.call_args.kwargs['total'] is False
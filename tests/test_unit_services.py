@@ -1,4 +1,4 @@
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, AsyncMock
 
 import pytest
 from cashews import cache
@@ -21,7 +21,7 @@ async def test_register_service():
 
     request = MagicMock()
     request.app.ctx.cache = cache
-    request.app.ctx.authorize = MagicMock()
+    request.app.ctx.authorize = AsyncMock()
     request.json = {}
 
     with pytest.raises(InvalidUsage):
@@ -30,7 +30,7 @@ async def test_register_service():
 
     request = MagicMock()
     request.app.ctx.cache = cache
-    request.app.ctx.authorize = MagicMock()
+    request.app.ctx.authorize = AsyncMock()
 
     request.json = {
         'name': 'Test Service',
@@ -51,7 +51,7 @@ async def test_service_status():
 
     request = MagicMock()
     request.app.ctx.cache = cache
-    request.app.ctx.authorize = MagicMock()
+    request.app.ctx.authorize = AsyncMock()
 
     result = await service_status(request)
     assert result.status == 200
@@ -65,7 +65,7 @@ async def test_service_api_proxy():
 
     request = MagicMock()
     request.app.ctx.cache = cache
-    request.app.ctx.authorize = MagicMock()
+    request.app.ctx.authorize = AsyncMock()
 
     name = 'no_service'
     path = 'no_path'
@@ -80,7 +80,7 @@ async def test_service_api_proxy():
     memoriam.domain.services.raw = MagicMock()
     request = MagicMock()
     request.app.ctx.cache = cache
-    request.app.ctx.authorize = MagicMock()
+    request.app.ctx.authorize = AsyncMock()
 
     request.method = 'GET'
     request.query_string = 'test=1'
@@ -107,7 +107,7 @@ async def test_unregister_service():
 
     request = MagicMock()
     request.app.ctx.cache = cache
-    request.app.ctx.authorize = MagicMock()
+    request.app.ctx.authorize = AsyncMock()
 
     with pytest.raises(NotFound):
         result = await unregister_service(request, 'no_service')
@@ -115,7 +115,7 @@ async def test_unregister_service():
 
     request = MagicMock()
     request.app.ctx.cache = cache
-    request.app.ctx.authorize = MagicMock()
+    request.app.ctx.authorize = AsyncMock()
 
     result = await unregister_service(request, 'test_service')
     assert result.status == 204
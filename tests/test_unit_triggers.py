@@ -53,8 +53,8 @@ async def test_audit():
     result = {
         'result': [{'_id': 'audit_log/1', 'changed_id': 'test/1'}]
     }
-    db.aql = MagicMock(return_value=result)
-    db.ping = MagicMock()
+    db.aql = AsyncMock(return_value=result)
+    db.ping = AsyncMock()
 
     memoriam.domain.triggers.get_arangodb = AsyncMock(return_value=db)
 
@@ -101,3 +101,37 @@ async def test_audit():
 
     assert 'UPDATE "1"' in query
     assert '"_version": "audit_log/1"' in query
+
+
+@pytest.mark.asyncio
+async def test_audit_batch():
+    db = MagicMock()
+    db.bulk_create = AsyncMock(side_effect=lambda collection, data: [
+        {'new': {**audit_log, '_id': f'audit_log/{i}'}} for i, audit_log in enumerate(data)
+    ])
+    db.bulk_update = AsyncMock()
+
+    memoriam.domain.triggers.get_arangodb = AsyncMock(return_value=db)
+    memoriam.domain.triggers.AUDIT_LOG_DB = True
+    memoriam.domain.triggers.AUDIT_VERSIONING = True
+    request = MagicMock(Request)
+    request.headers = {'x-authly-entity-id': 'test'}
+
+    changes = [
+        ({}, {'_id': 'test/1', 'test': 'a'}, None),
+        ({'_id': 'test/2', 'test': 'b'}, {'_id': 'test/2', 'test': 'c'}, 'note'),
+        ({'_id': 'other/3', 'test': 'd'}, {'_id': 'other/3', 'test': 'e'}, None),
+        ({'_id': 'test/4'}, {'_id': 'test/4'}, None),
+    ]
+    audit_logs = await audit_batch(changes, request)
+
+    # unchanged objects are not audited, changes are written in one bulk write
+    assert db.bulk_create.await_count == 1
+    assert [audit_log['operation'] for audit_log in audit_logs] == ['create', 'update', 'update']
+    assert audit_logs[1]['note'] == 'note'
+
+    # versions are updated with one bulk update per collection
+    assert db.bulk_update.await_count == 2
+    collection, data = db.bulk_update.call_args_list[0].args
+    assert collection == 'test'
+    assert data == [{'_key': '1', '_version': 'audit_log/0'}, {'_key': '2', '_version': 'audit_log/1'}]